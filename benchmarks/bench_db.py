@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scamp_db import ScampDB
+from synthetic_db import create_synthetic_db
+
+# Micro-benchmark: per-call latency of the old open/format/query/close pattern
+# against the pooled read-only connection with parameterized statements.
+
+ITERATIONS = 2000
+BOX = (40.0, 40.5, -76.5, -76.0)
+
+
+def old_by_name(db_file, name):
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM rv_park where name = '" + name + "'")
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def old_in_box(db_file, box):
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("SELECT name,longitude,latitude,city,st FROM rv_park where latitude>={:.4f} and latitude <={:.4f} "
+                   "and longitude>={:.4f} and longitude<={:.4f}".format(*box))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def time_call(label, fn):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    per_call = (time.perf_counter() - start) / ITERATIONS * 1e6
+    print(f"{label:40s} {per_call:9.1f} us/call")
+    return per_call
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = create_synthetic_db(os.path.join(tmp, "scamp.db"))
+        db = ScampDB(db_file)
+        before = time_call("by name: connect per call", lambda: old_by_name(db_file, "RV Park 500"))
+        after = time_call("by name: pooled + prepared", lambda: db.query("SELECT * FROM rv_park where name = ?", ("RV Park 500",)))
+        print(f"{'speed up':40s} {before / after:9.1f} x")
+        before = time_call("box scan: connect per call", lambda: old_in_box(db_file, BOX))
+        after = time_call("box scan: pooled + prepared", lambda: db.query(
+            "SELECT name,longitude,latitude,city,st FROM rv_park where latitude>=? and latitude <=? "
+            "and longitude>=? and longitude<=?", BOX))
+        print(f"{'speed up':40s} {before / after:9.1f} x")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
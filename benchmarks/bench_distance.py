@@ -0,0 +1,58 @@
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from geo import distance_matrix_miles, haversine_miles
+
+# Compares the original per-row distance_between_points loop with the
+# vectorized haversine in geo.py at 1k, 100k and 1M park coordinates.
+
+SIZES = [1_000, 100_000, 1_000_000]
+ORIGIN = (40.5, -77.5)
+
+
+def scalar_distance(lat1, lon1, lat2, lon2):
+    # The original implementation from mcpScamp.py
+    earth_radius = 6371
+    lat1 = math.radians(lat1)
+    lon1 = math.radians(lon1)
+    lat2 = math.radians(lat2)
+    lon2 = math.radians(lon2)
+    diff_lat = lat2 - lat1
+    diff_lon = lon2 - lon1
+    a = math.sin(diff_lat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(diff_lon / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return earth_radius * c * 0.62
+
+
+def best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(1)
+    print(f"{'points':>10s} {'loop ms':>10s} {'numpy ms':>10s} {'speed up':>9s} {'10 origins ms':>14s}")
+    for size in SIZES:
+        lats = rng.uniform(39.7, 42.3, size)
+        lons = rng.uniform(-80.5, -74.7, size)
+        lat_list, lon_list = lats.tolist(), lons.tolist()
+        loop = best_of(lambda: [scalar_distance(ORIGIN[0], ORIGIN[1], la, lo) for la, lo in zip(lat_list, lon_list)],
+                       repeat=1 if size >= 1_000_000 else 3)
+        vector = best_of(lambda: haversine_miles(ORIGIN[0], ORIGIN[1], lats, lons))
+        origins = rng.uniform(39.7, 42.3, 10), rng.uniform(-80.5, -74.7, 10)
+        multi = best_of(lambda: distance_matrix_miles(origins[0], origins[1], lats, lons))
+        print(f"{size:>10d} {loop * 1000:>10.2f} {vector * 1000:>10.2f} {loop / vector:>8.1f}x {multi * 1000:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_suite import percentile, prepare, print_summary, rss_mb, run_clients, summarize
+from scamp_delta import apply_delta
+from synthetic_gps import ORIGIN
+
+# Zero-downtime snapshot swaps: the in-process load of bench_suite.py (concurrent
+# clients calling every tool) runs while --deltas delta packages are applied to
+# the synthetic scamp.db with scamp_delta.py, one every --interval seconds. Each
+# renames and moves, deletes and inserts --changes RV parks and inserts places.
+# No call may fail, the parks and places of the last delta must then be found by
+# name, and the index updates (patched, rebuilt or unchanged) are reported with
+# the latency under swaps.
+#
+#   python benchmarks/bench_hot_swap.py --rv-parks 100000 --places 1000000 --deltas 5
+
+
+def random_delta(db_file, number, changes, rng):
+    """A delta on the current version of db_file moving, renaming, deleting and inserting RV parks, inserting places."""
+    conn = sqlite3.connect(db_file)
+    try:
+        base = conn.execute("PRAGMA user_version").fetchone()[0]
+        rowids = [row[0] for row in conn.execute("SELECT rowid FROM rv_park")]
+        picked = rng.sample(rowids, 2 * changes)
+        moved = conn.execute("SELECT rowid, latitude, longitude FROM rv_park WHERE rowid IN "
+                             f"({','.join('?' * changes)})", picked[:changes]).fetchall()
+    finally:
+        conn.close()
+
+    def near():
+        return round(ORIGIN[0] + rng.uniform(-0.5, 0.5), 5), round(ORIGIN[1] + rng.uniform(-0.5, 0.5), 5)
+
+    updates = [{"rowid": rowid, "Name": f"Renamed Park {number} {i}", "latitude": latitude + rng.uniform(-0.05, 0.05),
+                "longitude": longitude + rng.uniform(-0.05, 0.05)} for i, (rowid, latitude, longitude) in enumerate(moved)]
+    inserts = [dict(zip(("latitude", "longitude"), near()), Name=f"New Park {number} {i}", St="PA", Rating=4.0)
+               for i in range(changes)]
+    places = [dict(zip(("latitude", "longitude"), near()), name=f"newplace {number} {i}", state="PA")
+              for i in range(changes)]
+    return {"base": base, "version": base + 1,
+            "tables": {"rv_park": {"insert": inserts, "update": updates, "delete": picked[changes:]},
+                       "US": {"insert": places}}}
+
+
+async def run(db_file, sizes, clients, calls, deltas, changes, interval):
+    import mcpScamp
+    mcpScamp.warm_up().join()
+    tool_names = [tool.name for tool in await mcpScamp.mcp.list_tools()]
+
+    async def call(client, name, args):
+        await mcpScamp.mcp.call_tool(name, args)
+        return True
+
+    applied = []
+
+    def swap():
+        rng = random.Random(3)
+        for number in range(deltas):
+            time.sleep(interval)
+            delta = random_delta(db_file, number, changes, rng)
+            start = time.perf_counter()
+            counts = apply_delta(db_file, delta)
+            applied.append((delta["version"], counts, time.perf_counter() - start))
+
+    swapper = threading.Thread(target=swap, name="swapper")
+    swapper.start()
+    # Rounds of calls until every delta has been applied (and one more round on the last)
+    latencies, errors, wall = {}, {}, 0.0
+    while True:
+        done = not swapper.is_alive()
+        round_latencies, round_errors, round_wall = await run_clients(call, tool_names, sizes, clients, calls)
+        for name, values in round_latencies.items():
+            latencies.setdefault(name, []).extend(values)
+        for name, count in round_errors.items():
+            errors[name] = errors.get(name, 0) + count
+        wall += round_wall
+        if done:
+            break
+    swapper.join()
+
+    found = {}
+    last = deltas - 1
+    for name, args, expected in (
+            ("get_rv_parks_details_by_name", {"name": f"Renamed Park {last} 0"}, f"Renamed Park {last} 0"),
+            ("get_rv_parks_details_by_name", {"name": f"New Park {last} 0"}, f"New Park {last} 0"),
+            ("get_location_by_name", {"name": f"newplace {last} 0", "state": "PA"}, "latitude")):
+        result = await mcpScamp.mcp.call_tool(name, args)
+        found[args["name"]] = expected in str(result)
+    summary = summarize(latencies, errors, wall)
+    summary["rssMB"], summary["peakRssMB"] = rss_mb()
+    return summary, applied, found, mcpScamp.server_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tool calls while scamp.db deltas are swapped in")
+    parser.add_argument("--rv-parks", type=int, default=20000)
+    parser.add_argument("--state-parks", type=int, default=120)
+    parser.add_argument("--places", type=int, default=200000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--calls", type=int, default=100, help="calls per client per round")
+    parser.add_argument("--deltas", type=int, default=5)
+    parser.add_argument("--changes", type=int, default=50, help="RV parks moved, deleted and inserted per delta")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between deltas")
+    args = parser.parse_args()
+    sizes = {"rv_parks": args.rv_parks, "state_parks": args.state_parks, "places": args.places}
+    with tempfile.TemporaryDirectory() as tmp:
+        config = prepare(tmp, sizes, seed=1, built=True)
+        os.chdir(tmp)  # mcpScamp reads config.json from the working directory
+        summary, applied, found, stats = asyncio.run(run(config["scamp_db"], sizes, args.clients, args.calls,
+                                                         args.deltas, args.changes, args.interval))
+    print_summary("calls during swaps", summary)
+    print(f"\n{len(applied)} deltas applied, p50 {percentile([t for _, _, t in applied], 50) * 1000:.0f} ms: "
+          f"{[counts for _, counts, _ in applied]}")
+    print(f"database version {stats['database']['version']}, index updates {stats['database']['indexUpdates']}")
+    print(f"found after the last swap: {found}")
+    failed = summary["tools"]["all"]["errors"]
+    if failed or not all(found.values()) or stats["database"]["version"] != applied[-1][0]:
+        raise SystemExit(f"hot swap failed: {failed} errors, found {found}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from functools import reduce
+from operator import xor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from nmea_stream import NmeaFramer, parse_gga, parse_rmc
+
+# Replays a recorded NMEA capture (raw bytes as read from the receiver, e.g.
+# "cat /dev/ttyACM0 > capture.nmea") through the old readline/decode/pynmea2
+# loop and the streaming framer in nmea_stream.py. Without a capture file a
+# synthetic 10 Hz multi-constellation capture with some line noise is used.
+
+# Bytes handed to the parser per read, roughly what ser.read(ser.in_waiting) returns at 115200 baud
+CHUNK = 512
+
+
+def _sentence(body):
+    return f"${body}*{reduce(xor, body.encode('ascii'), 0):02X}\r\n"
+
+
+def write_synthetic_capture(path, seconds=600, rate_hz=10, talker="GN", seed=1):
+    """Write a capture of RMC/GGA plus GSA/GSV/VTG sentences, with some corrupted bytes."""
+    rng = random.Random(seed)
+    start = datetime(2025, 6, 1, 12, tzinfo=timezone.utc)
+    lat, lon = 40.5, -77.5
+    with open(path, "wb") as f:
+        for i in range(seconds * rate_hz):
+            t = start + timedelta(seconds=i / rate_hz)
+            lat += 0.00001
+            hhmmss = t.strftime("%H%M%S") + f".{t.microsecond // 10000:02d}"
+            ddmmyy = t.strftime("%d%m%y")
+            lat_field = f"{int(lat):02d}{(lat % 1) * 60:08.5f}"
+            lon_field = f"{int(-lon):03d}{(-lon % 1) * 60:08.5f}"
+            lines = [
+                _sentence(f"{talker}RMC,{hhmmss},A,{lat_field},N,{lon_field},W,30.5,12.3,{ddmmyy},,,A"),
+                _sentence(f"{talker}VTG,12.3,T,,M,30.5,N,56.5,K,A"),
+                _sentence(f"{talker}GGA,{hhmmss},{lat_field},N,{lon_field},W,1,12,0.9,101.5,M,-34.0,M,,"),
+                _sentence(f"{talker}GSA,A,3,01,03,06,09,12,17,19,22,,,,,1.6,0.9,1.3"),
+                _sentence("GPGSV,3,1,12,01,45,120,38,03,30,060,35,06,20,300,30,09,60,200,40"),
+                _sentence("GLGSV,2,1,07,65,40,100,33,66,25,160,29,72,55,250,36,81,10,020,22"),
+            ]
+            data = "".join(lines).encode("ascii")
+            if rng.random() < 0.01:
+                pos = rng.randrange(len(data))
+                data = data[:pos] + bytes([rng.randrange(256)]) + data[pos + 1:]
+            f.write(data)
+    return path
+
+
+def old_loop(data):
+    # The original gpsLogger.py loop (only $GPGGA/$GPRMC, decode errors abort the read)
+    import pynmea2
+    fixes = 0
+    errors = 0
+    for raw in io.BytesIO(data):
+        try:
+            line = raw.decode('utf-8').strip()
+            if line.startswith('$GPGGA'):
+                pynmea2.parse(line)
+            if line.startswith('$GPRMC'):
+                msg = pynmea2.parse(line)
+                if msg.latitude != 0 and msg.longitude != 0 and msg.datetime:
+                    fixes += 1
+        except (pynmea2.nmea.ParseError, UnicodeDecodeError, TypeError):
+            errors += 1
+    return fixes, errors
+
+
+def new_loop(data):
+    framer = NmeaFramer()
+    fixes = 0
+    for start in range(0, len(data), CHUNK):
+        for sentence_type, fields in framer.feed(data[start:start + CHUNK]):
+            if sentence_type == "GGA":
+                parse_gga(fields)
+            elif parse_rmc(fields):
+                fixes += 1
+    return fixes, framer.bad
+
+
+def replay(data):
+    lines = data.count(b"\n")
+    print(f"capture: {len(data)} bytes, {lines} lines")
+    for name, loop in (("readline + pynmea2", old_loop), ("NmeaFramer", new_loop)):
+        try:
+            start = time.process_time()
+            fixes, errors = loop(data)
+            elapsed = time.process_time() - start
+        except ImportError as e:
+            print(f"{name:>20s}: skipped ({e})")
+            continue
+        print(f"{name:>20s}: {elapsed * 1000:8.1f} ms CPU, {elapsed / lines * 1e6:6.2f} us/line, "
+              f"{fixes} fixes, {errors} bad/errors")
+
+
+def main():
+    if len(sys.argv) > 2:
+        print("Usage: python benchmarks/bench_nmea.py [capture_file]")
+        sys.exit(1)
+    if len(sys.argv) == 2:
+        with open(sys.argv[1], "rb") as f:
+            replay(f.read())
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        for talker in ("GP", "GN"):
+            print(f"synthetic 10 Hz {talker} talker capture, 600 seconds")
+            capture = write_synthetic_capture(os.path.join(tmp, "capture.nmea"), talker=talker)
+            with open(capture, "rb") as f:
+                replay(f.read())
+
+
+if __name__ == '__main__':
+    main()
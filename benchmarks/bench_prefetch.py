@@ -0,0 +1,74 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from build_db import build_db
+from geo import destination_point
+from prefetch import POLL_SECONDS, Prefetcher
+from scamp_db import ScampDB
+from scamp_schema import SUMMARY_COLUMNS
+from spatial_index import SpatialIndex
+from synthetic_db import create_synthetic_db
+from synthetic_gps import ORIGIN
+
+# "Near me" searches during a simulated drive (straight line heading east at
+# --mph, one fix a second) with and without the Prefetcher keeping the regions
+# ahead warm. Every QUERY_EVERY seconds of the drive an RV park search of
+# --miles around the vehicle is timed, against the in-memory grid and against
+# the R*Tree of a build_db.py database (large table mode).
+#
+#   python benchmarks/bench_prefetch.py --rv-parks 200000 --minutes 60
+
+QUERY_EVERY = 30
+
+
+def drive(index, minutes, mph, miles, prefetch):
+    fix = {}
+    prefetcher = Prefetcher(lambda: fix, [index]) if prefetch else None
+    start = datetime(2025, 6, 1, 12, tzinfo=timezone.utc)
+    times = []
+    for second in range(minutes * 60):
+        latitude, longitude = destination_point(*ORIGIN, 90.0, mph * second / 3600)
+        fix.update(latitude=latitude, longitude=longitude, timestamp=str(start + timedelta(seconds=second)))
+        if prefetcher is not None and second % POLL_SECONDS == 0:
+            prefetcher.step()
+        if second % QUERY_EVERY == 0:
+            began = time.perf_counter()
+            index.within(latitude, longitude, miles)
+            times.append(time.perf_counter() - began)
+    times.sort()
+    return times[len(times) // 2] * 1000, times[int(len(times) * 0.95)] * 1000, index.region_hits, len(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch of the parks ahead while driving")
+    parser.add_argument("--rv-parks", type=int, default=50000)
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--mph", type=float, default=60)
+    parser.add_argument("--miles", type=float, default=25)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = create_synthetic_db(os.path.join(tmp, "scamp.db"), args.rv_parks, 10, 10)
+        build_db(db_file, {}, from_db=db_file)
+        db = ScampDB(db_file)
+        print(f"{args.rv_parks} RV parks, {args.minutes} minute drive at {args.mph} mph, {args.miles} mile searches")
+        print(f"{'index':<10s} {'prefetch':<9s} {'p50 ms':>8s} {'p95 ms':>8s} {'region hits':>12s}")
+        for mode, max_memory_rows in (("grid", None), ("R*Tree", 0)):
+            for prefetch in (False, True):
+                index = SpatialIndex(db, "rv_park", SUMMARY_COLUMNS["rv_park"])
+                if max_memory_rows is not None:
+                    index.max_memory_rows = max_memory_rows
+                index.build()
+                p50, p95, hits, searches = drive(index, args.minutes, args.mph, args.miles, prefetch)
+                print(f"{mode:<10s} {'on' if prefetch else 'off':<9s} {p50:>8.2f} {p95:>8.2f} "
+                      f"{hits:>6d}/{searches:<5d}")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from response_format import columnar, encode, shape_parks
+from scamp_db import ScampDB
+from synthetic_db import create_synthetic_db
+
+# Response size and encode time of a 1,000 park includeDetails=true result:
+# the original json.dumps of full row dicts against field projection, text
+# truncation and the compact columnar encoding (encoded with orjson).
+
+PARKS = 1000
+FIELDS = ["Name", "City", "St", "Phone", "Amenities", "Rating", "Web"]
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ScampDB(create_synthetic_db(os.path.join(tmp, "scamp.db"), PARKS, 0, 0))
+        parks = [dict(row) for row in db.query("SELECT * FROM rv_park")]
+        db.close()
+    for park in parks:
+        park["distance"] = 12.34
+
+    cases = [
+        ("json.dumps full rows (before)", lambda: json.dumps(parks)),
+        ("encode full rows", lambda: encode(shape_parks(parks, None, 0))),
+        ("encode, text cut to 200", lambda: encode(shape_parks(parks, None, 200))),
+        ("encode compact, text cut to 200", lambda: encode(columnar(shape_parks(parks, None, 200)))),
+        (f"encode compact, fields={len(FIELDS)}", lambda: encode(columnar(shape_parks(parks, FIELDS)))),
+    ]
+    print(f"{PARKS} parks with details")
+    print(f"{'response':<40s} {'bytes':>10s} {'encode ms':>10s}")
+    for label, fn in cases:
+        print(f"{label:<40s} {len(fn()):>10d} {best_of(fn) * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
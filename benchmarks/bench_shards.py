@@ -0,0 +1,100 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from build_db import add_search_tables, build_shards, finish_build, load_rows, open_build
+from park_dataset import ParkDataset
+from scamp_db import ScampDB
+from scamp_schema import SUMMARY_COLUMNS
+
+# State park searches on a synthetic national dataset: one table of every park
+# against the per-state shard files of build_db.py --sharded-state-parks. The
+# country is cut into a grid of GRID_ROWS x GRID_COLUMNS synthetic "states".
+# Local searches of --miles around random points of one state are timed from a
+# cold start (the first search builds the indexes it needs) and warm, and the
+# shards opened are counted.
+#
+#   python benchmarks/bench_shards.py --parks 200000 --searches 200
+
+# Rough bounding box of the lower 48 states
+US_BOX = (24.5, 49.0, -124.7, -67.0)
+GRID_ROWS = 6
+GRID_COLUMNS = 8
+HEADER = ["name", "state", "address", "city", "zip", "latitude", "longitude", "hasRVCamping", "hasOvernight",
+          "hasPavilion", "overview", "url"]
+
+
+def write_csv(csv_file, parks, seed):
+    rng = random.Random(seed)
+    min_lat, max_lat, min_lon, max_lon = US_BOX
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(parks):
+            lat, lon = rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)
+            row = int((lat - min_lat) / (max_lat - min_lat) * GRID_ROWS)
+            column = int((lon - min_lon) / (max_lon - min_lon) * GRID_COLUMNS)
+            writer.writerow([f"State Park {i}", f"S{row}{column}", f"{i} Park Rd", f"Town {i % 500}", 15000 + i % 80000,
+                             round(lat, 5), round(lon, 5), rng.randint(0, 1), rng.randint(0, 1), rng.randint(0, 1),
+                             "Forest and lake. " * 30, f"http://statepark{i}.example"])
+
+
+def build_single(db_file, csv_file):
+    """The whole CSV as the state_park table of one database, built like a shard."""
+    conn = open_build(db_file + ".build", 4096)
+    with open(csv_file, newline="") as f:
+        reader = csv.reader(f)
+        load_rows(conn, "state_park", next(reader), reader)
+    add_search_tables(conn, "state_park")
+    finish_build(conn, db_file + ".build", db_file)
+
+
+def run(make_dataset, points, miles):
+    started = time.perf_counter()
+    dataset = make_dataset()
+    first = len(dataset.within(*points[0], miles))
+    cold = time.perf_counter() - started
+    times = []
+    found = first
+    for point in points[1:]:
+        began = time.perf_counter()
+        found += len(dataset.within(*point, miles))
+        times.append(time.perf_counter() - began)
+    times.sort()
+    return cold * 1000, times[len(times) // 2] * 1000, found, dataset.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded against single table state park searches")
+    parser.add_argument("--parks", type=int, default=100000)
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--miles", type=float, default=25)
+    args = parser.parse_args()
+    rng = random.Random(2)
+    # Searches around one synthetic state (the one holding Pennsylvania)
+    points = [(rng.uniform(40.0, 41.5), rng.uniform(-80.0, -76.0)) for _ in range(args.searches)]
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, "state_parks.csv")
+        write_csv(csv_file, args.parks, seed=1)
+        single_file = os.path.join(tmp, "single.db")
+        build_single(single_file, csv_file)
+        shards_dir = os.path.join(tmp, "shards")
+        build_shards(shards_dir, csv_file)
+        columns = SUMMARY_COLUMNS["state_park"]
+        print(f"{args.parks} state parks, {args.searches} searches of {args.miles} miles")
+        print(f"{'layout':<8s} {'cold ms':>9s} {'p50 ms':>8s} {'found':>8s}  shards")
+        for layout, make_dataset in (
+                ("single", lambda: ParkDataset(ScampDB(single_file), "state_park", columns)),
+                ("sharded", lambda: ParkDataset(None, "state_park", columns, shards_dir))):
+            cold, p50, found, stats = run(make_dataset, points, args.miles)
+            print(f"{layout:<8s} {cold:>9.1f} {p50:>8.2f} {found:>8d}  {stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+from bench_suite import PORT, REPO, prepare, wait_for_port
+from synthetic_gps import ORIGIN
+
+# Cold start of mcpScamp.py as under systemd: starts the server on a synthetic
+# scamp.db and measures the time to the port opening, the first answered tool
+# call and the end of the background warm-up, then prints the server's own
+# startup steps (startupMs of /stats). The first start saves the index
+# snapshots, the following starts map them.
+#
+#   python benchmarks/bench_startup.py --rv-parks 20000 --places 2000000 --starts 3
+
+
+def stats():
+    with urllib.request.urlopen(f"http://127.0.0.1:{PORT}/stats", timeout=10) as response:
+        return json.load(response)
+
+
+async def first_call():
+    async with streamablehttp_client(f"http://127.0.0.1:{PORT}/mcp") as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            result = await session.call_tool("get_rv_parks_by_distance_from_any_location",
+                                             {"latitude": ORIGIN[0], "longitude": ORIGIN[1], "miles": 25})
+            if result.isError:
+                raise RuntimeError(result.content)
+
+
+def start_once(tmp, timeout):
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.abspath(REPO), "mcpScamp.py")],
+                              cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(PORT, timeout)
+        listening = time.perf_counter() - started
+        asyncio.run(first_call())
+        answered = time.perf_counter() - started
+        deadline = time.monotonic() + timeout
+        while "location_name_index" not in stats()["startupMs"]:
+            if time.monotonic() > deadline:
+                raise TimeoutError("warm-up did not finish")
+            time.sleep(0.05)
+        warm = time.perf_counter() - started
+        return listening, answered, warm, stats()["startupMs"]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mcpScamp cold start benchmark")
+    parser.add_argument("--rv-parks", type=int, default=1000)
+    parser.add_argument("--state-parks", type=int, default=120)
+    parser.add_argument("--places", type=int, default=200000)
+    parser.add_argument("--starts", type=int, default=3)
+    parser.add_argument("--no-snapshots", action="store_true", help="rebuild the indexes on every start")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+    sizes = {"rv_parks": args.rv_parks, "state_parks": args.state_parks, "places": args.places}
+    with tempfile.TemporaryDirectory() as tmp:
+        config = prepare(tmp, sizes, seed=1)
+        if not args.no_snapshots:
+            config["index_snapshot_dir"] = os.path.join(tmp, "index_snapshots")
+        config["log_level"] = "INFO"
+        with open(os.path.join(tmp, "config.json"), "w") as f:
+            json.dump(config, f)
+        for start in range(args.starts):
+            listening, answered, warm, steps = start_once(tmp, args.timeout)
+            print(f"\nstart {start + 1}: listening {listening * 1000:.0f} ms, first call answered "
+                  f"{answered * 1000:.0f} ms, warmed up {warm * 1000:.0f} ms")
+            print("  server steps (ms from process start): " +
+                  ", ".join(f"{step} {ms:.0f}" for step, ms in steps.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+from build_db import build_db
+from synthetic_db import create_synthetic_db
+from synthetic_gps import ORIGIN, FakeGpsFeed, write_gps_json, write_track_history
+
+# Benchmark suite: builds a synthetic scamp.db (configurable table sizes), a
+# fake GPS feed and track history, then drives every @mcp.tool from
+# concurrent clients, in-process (FastMCP.call_tool) and/or over the
+# streamable-HTTP transport against a mcpScamp.py server. Reports throughput,
+# p50/p95/p99 latency per tool and server RSS, and writes them to a JSON
+# file so runs can be compared.
+#
+#   python benchmarks/bench_suite.py --rv-parks 100000 --places 2000000 --output after.json
+#   python benchmarks/bench_suite.py --url http://piai.local:8100/mcp
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PORT = 8100
+
+
+def tool_arguments(rng, sizes):
+    """Argument generators for every tool. A tool without an entry is reported and skipped."""
+    def near():
+        return {"latitude": ORIGIN[0] + rng.uniform(-0.5, 0.5), "longitude": ORIGIN[1] + rng.uniform(-0.5, 0.5)}
+
+    def misspelled(name):
+        # Every other lookup drops a letter so the fuzzy fallback is exercised too
+        if rng.random() < 0.5:
+            i = rng.randrange(1, len(name))
+            return name[:i - 1] + name[i:]
+        return name
+
+    return {
+        "get_my_location": lambda: {},
+        "get_recent_track": lambda: {"minutes": rng.choice([10, 60, 24 * 60])},
+        "get_state_parks_details_by_name": lambda: {"name": misspelled(f"State Park {rng.randrange(sizes['state_parks'])}")},
+        "get_state_parks_by_distance_from_my_location": lambda: {"miles": rng.choice([10, 25, 50])},
+        "get_state_parks_by_distance_from_any_location": lambda: {**near(), "miles": 25, "rvOnly": rng.random() < 0.5},
+        "get_rv_parks_by_distance_from_my_location": lambda: {"miles": rng.choice([10, 25]), "limit": 10,
+                                                              "sortByDistance": True},
+        "get_rv_parks_by_distance_from_any_location": lambda: {**near(), "miles": 25,
+                                                               "includeDetails": rng.random() < 0.3},
+        "get_rv_parks_details_by_name": lambda: {"name": misspelled(f"RV Park {rng.randrange(sizes['rv_parks'])}")},
+        "get_location_by_name": lambda: {"name": misspelled(f"place {rng.randrange(sizes['places'])}"), "state": "PA"},
+        "get_UTC_time": lambda: {},
+        "get_local_time": lambda: {},
+        "get_local_time_at": near,
+        "get_wikipedia_url": lambda: {"topic": "model context protocol"},
+        "get_wikihow_url": lambda: {"topic": "level an rv"},
+        "get_server_stats": lambda: {},
+        "get_parks_near_locations": lambda: {"locations": [f"{near()['latitude']},{near()['longitude']}" for _ in range(4)]
+                                                          + [f"place {rng.randrange(sizes['places'])}, PA"],
+                                             "miles": 15, "dataset": rng.choice(["rv_park", "pa_state_park"])},
+        "get_nearest_places": lambda: {**near(), "k": rng.choice([1, 5])},
+        "get_nearest_places_from_my_location": lambda: {},
+        "get_rv_parks_along_route": lambda: {"route": [f"place {rng.randrange(sizes['places'])}, PA"],
+                                             "fromMyLocation": True, "miles": rng.choice([2, 5]), "limit": 20},
+        "get_state_parks_along_route": lambda: {"route": [f"{ORIGIN[0]},{ORIGIN[1]}", "42.13,-80.08"],
+                                                "miles": 10, "rvOnly": rng.random() < 0.5},
+    }
+
+
+async def run_clients(call, tool_names, sizes, clients, calls):
+    """Run clients concurrently, each making calls round-robin over the tools. Returns (latencies, errors, wall)."""
+    latencies = {}
+    errors = {}
+    known = tool_arguments(random.Random(), sizes)
+    for name in tool_names:
+        if name not in known:
+            print(f"no arguments for tool {name}, skipped")
+    tool_names = [name for name in tool_names if name in known]
+
+    async def client(seed):
+        rng = random.Random(seed)
+        arguments = tool_arguments(rng, sizes)
+        names = list(tool_names)
+        rng.shuffle(names)
+        for i in range(calls):
+            name = names[i % len(names)]
+            args = arguments[name]()
+            start = time.perf_counter()
+            try:
+                ok = await call(seed, name, args)
+            except Exception:
+                ok = False
+            latencies.setdefault(name, []).append(time.perf_counter() - start)
+            if not ok:
+                errors[name] = errors.get(name, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(seed) for seed in range(clients)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(latencies, errors, wall):
+    every = [v for values in latencies.values() for v in values]
+    summary = {"wallSeconds": round(wall, 3), "tools": {}}
+    for name, values in sorted(latencies.items()) + [("all", every)]:
+        summary["tools"][name] = {
+            "calls": len(values),
+            "errors": errors.get(name, 0) if name != "all" else sum(errors.values()),
+            "callsPerSecond": round(len(values) / wall, 1),
+            "p50Ms": round(percentile(values, 50) * 1000, 2),
+            "p95Ms": round(percentile(values, 95) * 1000, 2),
+            "p99Ms": round(percentile(values, 99) * 1000, 2),
+        }
+    return summary
+
+
+def print_summary(mode, summary):
+    print(f"\n{mode}: {summary['tools']['all']['calls']} calls in {summary['wallSeconds']:.1f} s, "
+          f"RSS {summary.get('rssMB')} MB (peak {summary.get('peakRssMB')} MB)")
+    print(f"{'tool':<48s} {'calls':>6s} {'errors':>6s} {'calls/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for name, t in summary["tools"].items():
+        print(f"{name:<48s} {t['calls']:>6d} {t['errors']:>6d} {t['callsPerSecond']:>8.1f} "
+              f"{t['p50Ms']:>8.1f} {t['p95Ms']:>8.1f} {t['p99Ms']:>8.1f}")
+
+
+def rss_mb(pid="self"):
+    """(current, peak) resident set size in MB of a process, from /proc (Linux)."""
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, kb = line.split()[:2]
+                values[key] = round(int(kb) / 1024, 1)
+    return values.get("VmRSS:"), values.get("VmHWM:")
+
+
+def prepare(tmp, sizes, seed, built=False):
+    """Create the synthetic database (optionally through build_db.py), GPS files and config.json in tmp."""
+    start = time.perf_counter()
+    db_file = create_synthetic_db(os.path.join(tmp, "scamp.db"), sizes["rv_parks"], sizes["state_parks"],
+                                  sizes["places"], seed=seed)
+    if built:
+        build_db(db_file, {}, from_db=db_file)
+    write_track_history(os.path.join(tmp, "track.db"))
+    print(f"synthetic data built in {time.perf_counter() - start:.1f} s: {sizes}")
+    config = {"gps_file": write_gps_json(os.path.join(tmp, "gps.json")),
+              "gps_fix_file": os.path.join(tmp, "gps.fix"),
+              "track_db": os.path.join(tmp, "track.db"),
+              "scamp_db": db_file}
+    with open(os.path.join(tmp, "config.json"), "w") as f:
+        json.dump(config, f)
+    return config
+
+
+async def run_in_process(tmp, sizes, clients, calls):
+    os.chdir(tmp)  # mcpScamp reads config.json from the working directory
+    import mcpScamp
+    mcpScamp.warm_up().join()
+    tool_names = [tool.name for tool in await mcpScamp.mcp.list_tools()]
+
+    async def call(client, name, args):
+        await mcpScamp.mcp.call_tool(name, args)
+        return True
+
+    summary = summarize(*await run_clients(call, tool_names, sizes, clients, calls))
+    summary["rssMB"], summary["peakRssMB"] = rss_mb()
+    return summary
+
+
+async def run_http(url, sizes, clients, calls, server_pid=None):
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            tool_names = [tool.name for tool in (await session.list_tools()).tools]
+
+    # One MCP session per client, opened before the clock starts
+    async with contextlib.AsyncExitStack() as stack:
+        sessions = []
+        for _ in range(clients):
+            read, write, _ = await stack.enter_async_context(streamablehttp_client(url))
+            session = await stack.enter_async_context(ClientSession(read, write))
+            await session.initialize()
+            sessions.append(session)
+
+        async def call(client, name, args):
+            result = await sessions[client].call_tool(name, args)
+            return not result.isError
+
+        summary = summarize(*await run_clients(call, tool_names, sizes, clients, calls))
+    if server_pid is not None:
+        summary["rssMB"], summary["peakRssMB"] = rss_mb(server_pid)
+    return summary
+
+
+def wait_for_port(port, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise TimeoutError(f"server did not start on port {port}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mcpScamp benchmark suite")
+    parser.add_argument("--mode", choices=["in-process", "http", "both"], default="both")
+    parser.add_argument("--url", help="benchmark a running server over HTTP instead (e.g. http://localhost:8100/mcp)")
+    parser.add_argument("--rv-parks", type=int, default=1000)
+    parser.add_argument("--state-parks", type=int, default=120)
+    parser.add_argument("--places", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=50, help="calls per client")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--build-db", action="store_true", help="add the R*Tree and indexes of build_db.py")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    sizes = {"rv_parks": args.rv_parks, "state_parks": args.state_parks, "places": args.places}
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "sizes": sizes,
+        "buildDb": args.build_db,
+        "clients": args.clients,
+        "callsPerClient": args.calls,
+        "modes": {},
+    }
+
+    if args.url:
+        summary = asyncio.run(run_http(args.url, sizes, args.clients, args.calls))
+        results["modes"]["http"] = summary
+        print_summary("http", summary)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            prepare(tmp, sizes, args.seed, args.build_db)
+            feed = FakeGpsFeed(os.path.join(tmp, "gps.fix"), os.path.join(tmp, "gps.json")).start()
+            try:
+                if args.mode in ("http", "both"):
+                    server = subprocess.Popen([sys.executable, os.path.join(os.path.abspath(REPO), "mcpScamp.py")],
+                                              cwd=tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                    try:
+                        wait_for_port(PORT)
+                        summary = asyncio.run(run_http(f"http://127.0.0.1:{PORT}/mcp", sizes, args.clients,
+                                                       args.calls, server.pid))
+                    finally:
+                        server.terminate()
+                        server.wait()
+                    results["modes"]["http"] = summary
+                    print_summary("http", summary)
+                if args.mode in ("in-process", "both"):
+                    summary = asyncio.run(run_in_process(tmp, sizes, args.clients, args.calls))
+                    results["modes"]["in-process"] = summary
+                    print_summary("in-process", summary)
+            finally:
+                feed.stop()
+                os.chdir(REPO)
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from title_index import TitleIndex, build_title_index
+
+# Title lookups of get_wikipedia_url / get_wikihow_url against a title index
+# built from a synthetic title list (random multi-word titles plus FIXTURE), no
+# Kiwix server needed. FIXTURE topics are checked to find their article, then
+# exact, prefix and missing topics are timed from a cold (just mapped) and warm index.
+#
+#   python benchmarks/bench_titles.py --titles 6000000
+
+# (path<TAB>title line, topic, path expected first)
+FIXTURE = [
+    ("Pittsburgh", "pittsburgh", "Pittsburgh"),
+    ("Pittsburgh_Pirates", "Pittsburgh Pirat", "Pittsburgh_Pirates"),
+    ("Zürich", "zurich", "Zürich"),
+    ("AC/DC", "ac dc", "AC/DC"),
+    ("Apple", "Apple", "Apple"),
+    ("APPLE", "APPLE", "APPLE"),
+    ("Tie-a-Tie\tHow to Tie a Tie", "tie a tie", "Tie-a-Tie"),
+    ("Change-a-Tire\tHow to Change a Tire", "How to change a tire", "Change-a-Tire"),
+]
+WORDS = ["river", "lake", "county", "state", "park", "mountain", "battle", "of", "the", "john", "saint", "north",
+         "railway", "station", "school", "church", "album", "song", "film", "island", "bridge", "valley"]
+
+
+def write_titles(titles_file, count, seed):
+    rng = random.Random(seed)
+    with open(titles_file, "w", encoding="utf-8") as f:
+        for line, _, _ in FIXTURE:
+            f.write(line + "\n")
+        for i in range(count):
+            words = [rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 4))]
+            f.write("_".join(words) + f"_{i}\n")
+
+
+def timed(index, topics):
+    times = []
+    for topic in topics:
+        began = time.perf_counter()
+        index.lookup(topic)
+        times.append(time.perf_counter() - began)
+    times.sort()
+    return times[len(times) // 2] * 1e6, times[int(len(times) * 0.99)] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Title index lookups")
+    parser.add_argument("--titles", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(2)
+    with tempfile.TemporaryDirectory() as tmp:
+        titles_file = os.path.join(tmp, "titles.txt")
+        write_titles(titles_file, args.titles, seed=1)
+        path = os.path.join(tmp, "book.titles")
+        start = time.perf_counter()
+        keys = build_title_index(titles_file, path)
+        print(f"{args.titles + len(FIXTURE)} titles, {keys} keys indexed in {time.perf_counter() - start:.1f} s, "
+              f"{sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 1e6:.0f} MB")
+
+        index = TitleIndex(path)
+        for _, topic, expected in FIXTURE:
+            found = index.lookup(topic)
+            if not found or found[0][0] != expected:
+                raise AssertionError(f"{topic!r}: expected {expected!r} first, found {found}")
+        print(f"{len(FIXTURE)} fixture topics found")
+
+        exact = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))) + f" {rng.randrange(args.titles)}"
+                 for _ in range(args.lookups)]
+        prefix = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 2))) for _ in range(args.lookups)]
+        missing = [f"no such article {i}" for i in range(args.lookups)]
+        print(f"{'topics':<10s} {'p50 us':>8s} {'p99 us':>8s}")
+        for name, topics in (("cold", exact[:1]), ("exact", exact), ("prefix", prefix), ("missing", missing)):
+            index = TitleIndex(path) if name == "cold" else index
+            p50, p99 = timed(index, topics)
+            print(f"{name:<10s} {p50:>8.1f} {p99:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
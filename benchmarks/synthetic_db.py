@@ -0,0 +1,70 @@
+import random
+import sqlite3
+import sys
+
+# Rough bounding box of Pennsylvania, used to place synthetic parks
+PA_BOX = (39.72, 42.27, -80.52, -74.69)
+
+RV_PARK_COLUMNS = ["UID", "Name", "Est", "Address", "City", "St", "zip", "Phone", "latitude", "longitude",
+                   "Amenities", "RecordID", "Web", "Booking", "Comments", "Rating", "Reviews"]
+STATE_PARK_COLUMNS = ["name", "address", "city", "zip", "latitude", "longitude", "hasRVCamping",
+                      "hasOvernight", "hasPavilion", "overview", "url"]
+US_COLUMNS = ["U", "name", "state", "latitude", "longitude"]
+
+
+def _random_point(rng, box):
+    min_lat, max_lat, min_lon, max_lon = box
+    return round(rng.uniform(min_lat, max_lat), 5), round(rng.uniform(min_lon, max_lon), 5)
+
+
+def create_synthetic_db(db_file, rv_parks=1000, state_parks=120, places=2000, box=PA_BOX, seed=1):
+    """
+    Create a scamp.db shaped database filled with random parks and places.
+    Names are unique and deterministic for a given seed so benchmarks can look them up.
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_file)
+    conn.execute("DROP TABLE IF EXISTS rv_park")
+    conn.execute("DROP TABLE IF EXISTS pa_state_park")
+    conn.execute("DROP TABLE IF EXISTS US")
+    conn.execute("CREATE TABLE rv_park (UID INTEGER, Name TEXT, Est TEXT, Address TEXT, City TEXT, St TEXT, zip TEXT, "
+                 "Phone TEXT, latitude REAL, longitude REAL, Amenities TEXT, RecordID INTEGER, Web TEXT, Booking TEXT, "
+                 "Comments TEXT, Rating REAL, Reviews TEXT)")
+    conn.execute("CREATE TABLE pa_state_park (name TEXT, address TEXT, city TEXT, zip INTEGER, latitude REAL, "
+                 "longitude REAL, hasRVCamping INTEGER, hasOvernight INTEGER, hasPavilion INTEGER, overview TEXT, url TEXT)")
+    conn.execute("CREATE TABLE US (U INTEGER, name TEXT, state TEXT, latitude REAL, longitude REAL)")
+
+    # Rows are generated lazily so millions of rows never sit in memory at once
+    def rv_rows():
+        for i in range(rv_parks):
+            lat, lon = _random_point(rng, box)
+            yield (i, f"RV Park {i}", "1990", f"{i} Main St", f"Town {i % 500}", "PA", f"{15000 + i % 4000}",
+                   "555-0100", lat, lon, "$$ Full hookups, WiFi", i, f"http://rvpark{i}.example",
+                   "", "Quiet park. " * 20, round(rng.uniform(1, 5), 1), "Nice stay. " * 40)
+    conn.executemany(f"INSERT INTO rv_park VALUES ({','.join('?' * len(RV_PARK_COLUMNS))})", rv_rows())
+
+    def state_rows():
+        for i in range(state_parks):
+            lat, lon = _random_point(rng, box)
+            yield (f"State Park {i}", f"{i} Park Rd", f"Town {i % 500}", 15000 + i, lat, lon,
+                   rng.randint(0, 1), rng.randint(0, 1), rng.randint(0, 1),
+                   "Forest and lake. " * 30, f"http://statepark{i}.example")
+    conn.executemany(f"INSERT INTO pa_state_park VALUES ({','.join('?' * len(STATE_PARK_COLUMNS))})", state_rows())
+
+    def place_rows():
+        for i in range(places):
+            lat, lon = _random_point(rng, box)
+            yield (i, f"place {i}", "PA", lat, lon)
+    conn.executemany(f"INSERT INTO US VALUES ({','.join('?' * len(US_COLUMNS))})", place_rows())
+
+    conn.commit()
+    conn.close()
+    return db_file
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 5):
+        print("Usage: python benchmarks/synthetic_db.py <db_file> [<rv_parks> <state_parks> <places>]")
+        sys.exit(1)
+    sizes = [int(size) for size in sys.argv[2:]]
+    create_synthetic_db(sys.argv[1], *sizes)
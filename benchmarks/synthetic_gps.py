@@ -0,0 +1,85 @@
+import json
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gps_fix import GpsFixWriter
+from track_store import TrackWriter
+
+# Middle of the synthetic parks box (Pennsylvania)
+ORIGIN = (41.0, -77.6)
+
+
+def write_gps_json(gps_file, latitude=ORIGIN[0], longitude=ORIGIN[1], altitude=100.0, timestamp=None):
+    """Write a gps.json like gpsLogger.py does (temporary file and rename)."""
+    timestamp = timestamp or datetime.now(timezone.utc)
+    with open(gps_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"timestamp": str(timestamp), "latitude": latitude, "longitude": longitude,
+                   "altitude": altitude}, f)
+    os.replace(gps_file + ".tmp", gps_file)
+    return gps_file
+
+
+def write_track_history(track_db, hours=24, rate_hz=1, origin=ORIGIN, mph=30.0, end=None):
+    """Fill a track database with a drive heading north-east at mph, ending now (or at end)."""
+    end = end or datetime.now(timezone.utc)
+    writer = TrackWriter(track_db, batch_size=10_000)
+    step_miles = mph / 3600 / rate_hz
+    for i in range(int(hours * 3600 * rate_hz)):
+        latitude, longitude = _position(origin, i * step_miles)
+        writer.add(end - timedelta(seconds=hours * 3600 - i / rate_hz), latitude, longitude, 100.0, mph / 1.15078,
+                   45.0, 10, 1)
+    writer.close()
+    return track_db
+
+
+def _position(origin, miles):
+    # Heading north-east, about 69 miles per degree of latitude
+    degrees = miles / 69.0 / math.sqrt(2)
+    return origin[0] + degrees, origin[1] + degrees / math.cos(math.radians(origin[0]))
+
+
+class FakeGpsFeed:
+    """
+    Stands in for gpsLogger.py: publishes a moving fix to the shared fix file
+    (and gps.json) at rate_hz from a background thread.
+    """
+
+    def __init__(self, fix_file, gps_file=None, rate_hz=1.0, origin=ORIGIN, mph=0.0):
+        self.fix_file = fix_file
+        self.gps_file = gps_file
+        self.rate_hz = rate_hz
+        self.origin = origin
+        self.mph = mph
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        writer = GpsFixWriter(self.fix_file)
+        self._publish(writer, 0)
+        self._thread = threading.Thread(target=self._run, args=(writer,), name="fake-gps", daemon=True)
+        self._thread.start()
+        return self
+
+    def _publish(self, writer, seconds):
+        latitude, longitude = _position(self.origin, self.mph * seconds / 3600)
+        now = datetime.now(timezone.utc)
+        writer.publish(latitude, longitude, 100.0, now)
+        if self.gps_file:
+            write_gps_json(self.gps_file, latitude, longitude, 100.0, now)
+
+    def _run(self, writer):
+        start = time.monotonic()
+        while not self._stop.wait(1 / self.rate_hz):
+            self._publish(writer, time.monotonic() - start)
+        writer.close()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,362 @@
+import argparse
+import csv
+import json
+import math
+import os
+import shutil
+import sqlite3
+import time
+
+from name_index import normalize_name
+from scamp_schema import (COLUMN_TYPES, DIRECTORY_FILE, GEOMETRY_COLUMNS, MANIFEST_FILE, NAME_COLUMNS,
+                          SHARDED_TABLES, SUMMARY_COLUMNS, name_key_table, park_id, rtree_table)
+
+# Builds scamp.db offline from source CSVs (and/or the tables of an existing
+# scamp.db), then adds what the server uses for fast lookups:
+#   <table>_rtree     R*Tree over the points, holding the precomputed geometry
+#                     and the summary columns so radius searches never read full rows
+#   <table>_name_key  normalized names for case and punctuation insensitive exact lookups
+#   covering indexes  over the summary columns and the columns the fuzzy name
+#                     indexes load, so loading them never reads full rows
+# The database is written to a temporary file, synced to disk and renamed over the
+# output when complete, so a running server switches to it on its next query. Its version
+# (PRAGMA user_version) is the build time, deltas are applied to it with scamp_delta.py.
+#
+#   python build_db.py scamp.db --rv-parks rv_park.csv --state-parks pa_state_park.csv --places US.csv
+#   python build_db.py /home/pi/mcpScamp/scamp.db --from-db /home/pi/mcpScamp/scamp.db
+#
+# With --sharded-state-parks the output is a directory of per-state shard files
+# instead (see build_shards and park_dataset.py):
+#
+#   python build_db.py /home/pi/mcpScamp/state_parks --sharded-state-parks state_parks.csv
+
+# 4 KB pages match the SD card / ext4 block size, so each page read is one block read
+PAGE_SIZE = 4096
+# Rows per executemany batch when loading CSVs
+BATCH_ROWS = 10_000
+
+
+def declared_columns(conn, table):
+    """Lower case -> declared column name of a table."""
+    return {row[1].lower(): row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def load_csv(conn, table, csv_file):
+    """Create table from the CSV header (types from COLUMN_TYPES) and load its rows. Empty fields become NULL."""
+    with open(csv_file, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        load_rows(conn, table, header, reader)
+
+
+def load_rows(conn, table, header, records):
+    """Create table with the columns named by header (types from COLUMN_TYPES) and insert the records."""
+    types = {name.lower(): declared for name, declared in COLUMN_TYPES.get(table, {}).items()}
+    columns = ", ".join(f'"{name}" {types.get(name.lower(), "")}'.rstrip() for name in header)
+    conn.execute(f'CREATE TABLE "{table}" ({columns})')
+    insert = f'INSERT INTO "{table}" VALUES ({",".join("?" * len(header))})'
+    batch = []
+    for record in records:
+        batch.append([value if value != "" else None for value in record])
+        if len(batch) >= BATCH_ROWS:
+            conn.executemany(insert, batch)
+            batch = []
+    conn.executemany(insert, batch)
+
+
+def copy_table(conn, table):
+    """Copy table with its original schema from the attached source database."""
+    row = conn.execute("SELECT sql FROM source.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    if row is None:
+        return False
+    conn.execute(row[0])
+    conn.execute(f'INSERT INTO main."{table}" SELECT * FROM source."{table}" ORDER BY rowid')
+    return True
+
+
+def add_search_tables(conn, table):
+    """Add the R*Tree, name key table and covering index of one loaded table."""
+    declared = declared_columns(conn, table)
+    summary = [declared[column.lower()] for column in SUMMARY_COLUMNS.get(table, [])]
+
+    # Points are stored as zero size boxes, the geometry and summary columns as auxiliary columns
+    aux = ", ".join(f'+"{column}"' for column in GEOMETRY_COLUMNS + summary)
+    conn.execute(f'CREATE VIRTUAL TABLE "{rtree_table(table)}" USING rtree(id, min_lat, max_lat, min_lon, max_lon, '
+                 f'{aux})')
+    _insert_rtree_rows(conn, table, summary)
+
+    if summary:
+        # Covers the load of the in-memory spatial indexes (rows with a location)
+        first = [declared["latitude"], declared["longitude"]]
+        indexed = ", ".join(f'"{column}"' for column in first + [c for c in summary if c not in first])
+        conn.execute(f'CREATE INDEX "{table}_summary" ON "{table}" ({indexed})')
+
+    add_name_tables(conn, table)
+
+
+def add_name_tables(conn, table):
+    """Add the name key table and the covering index of the name columns of one loaded table."""
+    declared = declared_columns(conn, table)
+    names = [declared[column.lower()] for column in NAME_COLUMNS.get(table, [])]
+    if names:
+        name = names[0]
+        keys = name_key_table(table)
+        conn.execute(f'CREATE TABLE "{keys}" (name_key TEXT NOT NULL, id INTEGER NOT NULL, '
+                     f'PRIMARY KEY (name_key, id)) WITHOUT ROWID')
+        _insert_name_keys(conn, table, name)
+        # Covers the name index load and the exact name lookups
+        indexed = ", ".join(f'"{column}"' for column in names)
+        conn.execute(f'CREATE INDEX "{table}_names" ON "{table}" ({indexed})')
+
+
+def _insert_rtree_rows(conn, table, summary, rowids=None):
+    """Insert the R*Tree rows of the located rows of table (of the given rowids only)."""
+    geometry = ("radians(latitude), radians(longitude), cos(radians(latitude)), "
+                "cos(radians(latitude)) * cos(radians(longitude)), cos(radians(latitude)) * sin(radians(longitude)), "
+                "sin(radians(latitude))")
+    selected = ", ".join([geometry] + [f'"{column}"' for column in summary])
+    only, params = _only(rowids)
+    conn.execute(f'INSERT INTO "{rtree_table(table)}" SELECT rowid, latitude, latitude, longitude, longitude, '
+                 f'{selected} FROM "{table}" WHERE latitude IS NOT NULL AND longitude IS NOT NULL{only} '
+                 f'ORDER BY rowid', params)
+
+
+def _insert_name_keys(conn, table, name, rowids=None):
+    """Insert the name keys of the named rows of table (of the given rowids only)."""
+    only, params = _only(rowids)
+    conn.execute(f'INSERT INTO "{name_key_table(table)}" SELECT name_key("{name}"), rowid FROM "{table}" '
+                 f'WHERE "{name}" IS NOT NULL{only}', params)
+
+
+def _only(rowids):
+    """(SQL condition, parameters) limiting a query to rowids, nothing for None (every row)."""
+    if rowids is None:
+        return "", ()
+    return " AND rowid IN (SELECT value FROM json_each(?))", (json.dumps(sorted(rowids)),)
+
+
+def refresh_search_rows(conn, table, rowids):
+    """Bring the R*Tree and name keys of table up to date after the rows of rowids were inserted, updated or deleted."""
+    declared = declared_columns(conn, table)
+    changed = json.dumps(sorted(rowids))
+    if declared_columns(conn, rtree_table(table)):
+        conn.execute(f'DELETE FROM "{rtree_table(table)}" WHERE id IN (SELECT value FROM json_each(?))', (changed,))
+        _insert_rtree_rows(conn, table, [declared[column.lower()] for column in SUMMARY_COLUMNS.get(table, [])],
+                           rowids)
+    names = [declared[column.lower()] for column in NAME_COLUMNS.get(table, [])]
+    if names and declared_columns(conn, name_key_table(table)):
+        conn.execute(f'DELETE FROM "{name_key_table(table)}" WHERE id IN (SELECT value FROM json_each(?))',
+                     (changed,))
+        _insert_name_keys(conn, table, names[0], rowids)
+
+
+def open_build(building, page_size, copy_of=None, durable=False):
+    """
+    Connection to a new database file building (a copy of the database copy_of), with the
+    SQL functions the search tables are built with. Used with finish_build by the builds
+    here and by scamp_delta.py.
+
+    Unless durable, the file is written without a journal or syncs, the fastest for a
+    full offline build. durable (scamp_delta.py) keeps the journal and synchronous=FULL
+    while writing. Either way finish_build syncs the file before renaming it over the
+    output, so the output is only ever replaced by a complete database.
+    """
+    if os.path.exists(building):
+        os.remove(building)
+    if copy_of is not None:
+        shutil.copyfile(copy_of, building)
+    conn = sqlite3.connect(building)
+    for function, fn in (("radians", math.radians), ("cos", math.cos), ("sin", math.sin),
+                         ("name_key", lambda name: normalize_name(str(name)))):
+        conn.create_function(function, 1, fn, deterministic=True)
+    if copy_of is None:
+        conn.execute(f"PRAGMA page_size = {int(page_size)}")
+    if durable:
+        conn.execute("PRAGMA synchronous = FULL")
+    else:
+        # Nothing to recover if the build fails, the temporary file is just removed
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+    return conn
+
+
+def finish_build(conn, building, output, compact=True):
+    """
+    Analyze and compact a built database (unless compact is false) and rename it over output.
+    The file and the rename are synced to disk, so a power cut right after replacing a
+    live database leaves either the old or the new one.
+    """
+    if compact:
+        conn.execute("ANALYZE")
+    conn.commit()
+    if compact:
+        conn.execute("VACUUM")
+    conn.close()
+    _replace(building, output)
+
+
+def _replace(path, output):
+    """Sync path to disk and rename it over output, then sync the rename."""
+    _fsync(path)
+    os.replace(path, output)
+    _fsync(os.path.dirname(os.path.abspath(output)))
+
+
+def _fsync(path):
+    """Flush a file or directory to disk."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def database_version(db_file):
+    """The version (PRAGMA user_version) of a database file, 0 when it is missing or unversioned."""
+    if not db_file or not os.path.exists(db_file):
+        return 0
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def stamp_version(conn, after=0):
+    """Set the version of a database being built to the current time, at least after + 1. Returns it."""
+    version = max(int(time.time()), after + 1)
+    conn.execute(f"PRAGMA user_version = {version}")
+    return version
+
+
+def build_db(output, csv_files, from_db=None, page_size=PAGE_SIZE):
+    """
+    Build scamp.db at output. csv_files maps table name to a CSV file; tables
+    without a CSV are copied from from_db. Returns the tables built.
+    """
+    building = output + ".build"
+    conn = open_build(building, page_size)
+    try:
+        if from_db:
+            conn.execute("ATTACH DATABASE ? AS source", (from_db,))
+        built = []
+        for table in COLUMN_TYPES:
+            if table in SHARDED_TABLES:
+                continue
+            start = time.perf_counter()
+            if table in csv_files:
+                load_csv(conn, table, csv_files[table])
+            elif not (from_db and copy_table(conn, table)):
+                print(f"{table}: no source, skipped")
+                continue
+            add_search_tables(conn, table)
+            conn.commit()
+            count = conn.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0]
+            print(f"{table}: {count} rows in {time.perf_counter() - start:.1f} s")
+            built.append(table)
+        if from_db:
+            conn.execute("DETACH DATABASE source")
+        # After the version it replaces, so a server never takes the new file for the old version
+        stamp_version(conn, max(database_version(output), database_version(from_db)))
+        finish_build(conn, building, output)
+    except BaseException:
+        conn.close()
+        if os.path.exists(building):  # Already renamed when the failure came after finish_build
+            os.remove(building)
+        raise
+    return built
+
+
+def build_shards(output_dir, csv_file, table="state_park", region_column="state", page_size=PAGE_SIZE):
+    """
+    Build a sharded dataset (see park_dataset.py) in output_dir from one CSV of every
+    region: a <region>.db per value of region_column holding its rows of table with the
+    search tables, DIRECTORY_FILE with the name columns of every park under its id, and
+    MANIFEST_FILE listing the shard files with their bounding boxes (written last).
+    Returns the manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with open(csv_file, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        region = [name.lower() for name in header].index(region_column.lower())
+        regions = {}
+        for record in reader:
+            regions.setdefault(record[region].strip().upper() or "XX", []).append(record)
+
+    names = NAME_COLUMNS[table]
+    directory = []
+    shards = []
+    for number, name in enumerate(sorted(regions)):
+        file_name = name + ".db"
+        building = os.path.join(output_dir, file_name + ".build")
+        conn = open_build(building, page_size)
+        try:
+            load_rows(conn, table, header, regions[name])
+            add_search_tables(conn, table)
+            conn.commit()
+            bbox = conn.execute(f'SELECT min(latitude), max(latitude), min(longitude), max(longitude) FROM "{table}"'
+                                ).fetchone()
+            selected = ", ".join(f'"{column}"' for column in names)
+            directory += [(park_id(number, row[0]), *row[1:])
+                          for row in conn.execute(f'SELECT rowid, {selected} FROM "{table}" ORDER BY rowid')]
+            finish_build(conn, building, os.path.join(output_dir, file_name))
+        except BaseException:
+            conn.close()
+            if os.path.exists(building):  # Already renamed when the failure came after finish_build
+                os.remove(building)
+            raise
+        shards.append({"name": name, "file": file_name, "rows": len(regions[name]),
+                       "bbox": None if bbox[0] is None else list(bbox)})
+        print(f"{table} {name}: {len(regions[name])} rows")
+
+    building = os.path.join(output_dir, DIRECTORY_FILE + ".build")
+    conn = open_build(building, page_size)
+    try:
+        columns = ", ".join(f'"{column}" {COLUMN_TYPES[table].get(column, "")}'.rstrip() for column in names)
+        conn.execute(f'CREATE TABLE "{table}" (id INTEGER PRIMARY KEY, {columns})')
+        conn.executemany(f'INSERT INTO "{table}" VALUES ({",".join("?" * (len(names) + 1))})', directory)
+        add_name_tables(conn, table)
+        conn.commit()
+        finish_build(conn, building, os.path.join(output_dir, DIRECTORY_FILE))
+    except BaseException:
+        conn.close()
+        if os.path.exists(building):  # Already renamed when the failure came after finish_build
+            os.remove(building)
+        raise
+
+    manifest = {"table": table, "shards": shards}
+    with open(os.path.join(output_dir, MANIFEST_FILE + ".tmp"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    _replace(os.path.join(output_dir, MANIFEST_FILE + ".tmp"), os.path.join(output_dir, MANIFEST_FILE))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build scamp.db with its search tables and indexes")
+    parser.add_argument("output", help="database file to create (replaced when the build completes), "
+                                       "or the directory of --sharded-state-parks")
+    parser.add_argument("--rv-parks", help="CSV of the rv_park table")
+    parser.add_argument("--state-parks", help="CSV of the pa_state_park table")
+    parser.add_argument("--places", help="CSV of the US (place names) table")
+    parser.add_argument("--from-db", help="existing scamp.db to copy the tables without a CSV from")
+    parser.add_argument("--sharded-state-parks", help="CSV of the state parks of every state (with a state "
+                                                      "column), built into one shard file per state")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    if args.sharded_state_parks:
+        manifest = build_shards(args.output, args.sharded_state_parks, page_size=args.page_size)
+        print(f"{args.output}: {len(manifest['shards'])} shards built in {time.perf_counter() - start:.1f} s")
+        return
+    csv_files = {table: csv_file for table, csv_file in (("rv_park", args.rv_parks),
+                                                          ("pa_state_park", args.state_parks),
+                                                          ("US", args.places)) if csv_file}
+    if not csv_files and not args.from_db:
+        parser.error("give at least one CSV, --from-db or --sharded-state-parks")
+    build_db(args.output, csv_files, args.from_db, args.page_size)
+    print(f"{args.output} built in {time.perf_counter() - start:.1f} s, {os.path.getsize(args.output)} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,41 @@ class ConfigReader:
             self._load_config()
         return self._config_data.get("gps_file")
 
+    @property
+    def gps_port(self):
+        """Get the GPS receiver serial port from config."""
+        if self._config_data is None:
+            self._load_config()
+        return self._config_data.get("gps_port", "/dev/ttyACM0")
+
+    @property
+    def gps_baud_rate(self):
+        """Get the GPS receiver baud rate from config (9600 for most 1 Hz receivers, 115200 for 5-10 Hz)."""
+        if self._config_data is None:
+            self._load_config()
+        return self._config_data.get("gps_baud_rate", 9600)
+
+    @property
+    def gps_fix_file(self):
+        """Get the shared memory GPS fix file path from config."""
+        if self._config_data is None:
+            self._load_config()
+        return self._config_data.get("gps_fix_file", "/dev/shm/scamp_gps.fix")
+
+    @property
+    def write_gps_json(self):
+        """Whether gpsLogger.py also writes gps.json (compatibility mode)."""
+        if self._config_data is None:
+            self._load_config()
+        return self._config_data.get("write_gps_json", True)
+
+    @property
+    def track_db(self):
+        """Get the GPS track history DB path from config."""
+        if self._config_data is None:
+            self._load_config()
+        return self._config_data.get("track_db", "/home/pi/track.db")
+
     @property
     def scamp_db(self):
         """Get the Scamp DB path from config."""
@@ -20,6 +55,34 @@ class ConfigReader:
             self._load_config()
         return self._config_data.get("scamp_db")
     
+    @property
+    def index_snapshot_dir(self):
+        """Get the directory of the memory-mapped index snapshots from config (None: indexes are always rebuilt)."""
+        if self._config_data is None:
+            self._load_config()
+        return self._config_data.get("index_snapshot_dir")
+
+    @property
+    def state_parks_dir(self):
+        """Get the directory of the per-state state park shards from config (None: the pa_state_park table of scamp_db)."""
+        if self._config_data is None:
+            self._load_config()
+        return self._config_data.get("state_parks_dir")
+
+    @property
+    def title_index_dir(self):
+        """Get the directory of the ZIM archive title indexes from config (None: wiki tools return search links)."""
+        if self._config_data is None:
+            self._load_config()
+        return self._config_data.get("title_index_dir")
+
+    @property
+    def log_level(self):
+        """Get the server log level from config (DEBUG logs every tool call)."""
+        if self._config_data is None:
+            self._load_config()
+        return self._config_data.get("log_level", "WARNING")
+
     def _load_config(self):
         """Load configuration from JSON file."""
         try:
@@ -0,0 +1,173 @@
+import math
+
+import numpy as np
+
+# One Earth model for every distance and bounding box calculation (mean radius)
+EARTH_RADIUS_MILES = 3958.8
+
+
+def haversine_miles(latitude, longitude, latitudes, longitudes):
+    """
+    Great-circle distance in miles from one point to an array of points.
+
+    Inputs are in decimal degrees. latitudes/longitudes can be any array-like,
+    the result is a numpy array of the same shape.
+    """
+    lat1 = math.radians(latitude)
+    lon1 = math.radians(longitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon2 = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return haversine_miles_radians(lat1, lon1, math.cos(lat1), lat2, lon2, np.cos(lat2))
+
+
+def haversine_miles_radians(lat1, lon1, cos_lat1, lat2, lon2, cos_lat2):
+    """
+    Same as haversine_miles but with radians and cosines already computed,
+    so indexes can keep them precomputed for their points.
+    """
+    a = np.sin((lat2 - lat1) * 0.5) ** 2 + cos_lat1 * cos_lat2 * np.sin((lon2 - lon1) * 0.5) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def distance_matrix_miles(origin_latitudes, origin_longitudes, latitudes, longitudes):
+    """
+    Distances in miles from many origins to many points in one call.
+    Returns an array of shape (len(origins), len(points)).
+    """
+    lat1 = np.radians(np.asarray(origin_latitudes, dtype=np.float64))[:, np.newaxis]
+    lon1 = np.radians(np.asarray(origin_longitudes, dtype=np.float64))[:, np.newaxis]
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))[np.newaxis, :]
+    lon2 = np.radians(np.asarray(longitudes, dtype=np.float64))[np.newaxis, :]
+    return haversine_miles_radians(lat1, lon1, np.cos(lat1), lat2, lon2, np.cos(lat2))
+
+
+def distance_between_points(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in miles between two points given in decimal degrees.
+    """
+    return float(haversine_miles(lat1, lon1, lat2, lon2))
+
+
+def lat_lon_range(latitude, longitude, distance_miles):
+    """
+    Calculates the latitude and longitude range based on a given point and distance.
+
+    Args:
+        latitude (float): Latitude of the center point in degrees.
+        longitude (float): Longitude of the center point in degrees.
+        distance_miles (float): Distance in miles to calculate the range.
+
+    Returns:
+        tuple: A tuple containing the minimum and maximum latitude and longitude
+               (min_lat, max_lat, min_lon, max_lon). When the circle reaches a
+               pole the longitude range is the whole globe.
+    """
+    angular_distance = distance_miles / EARTH_RADIUS_MILES
+    min_lat = latitude - math.degrees(angular_distance)
+    max_lat = latitude + math.degrees(angular_distance)
+    cos_lat = math.cos(math.radians(latitude))
+    if max_lat >= 90 or min_lat <= -90 or math.sin(angular_distance) >= cos_lat:
+        return (max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)
+    delta_lon = math.degrees(math.asin(math.sin(angular_distance) / cos_lat))
+    return (min_lat, max_lat, longitude - delta_lon, longitude + delta_lon)
+
+
+def lon_ranges(min_lon, max_lon):
+    """Split a longitude range of lat_lon_range crossing the antimeridian in two (boxes have no wrap around)."""
+    if min_lon < -180:
+        return [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return [(min_lon, max_lon)]
+
+
+def bearing_between_points(lat1, lon1, lat2, lon2):
+    """
+    Initial compass bearing in degrees (0-360, 0 is north) from the first point to the second.
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_lon = math.radians(lon2 - lon1)
+    x = math.sin(delta_lon) * math.cos(phi2)
+    y = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(delta_lon)
+    return (math.degrees(math.atan2(x, y)) + 360.0) % 360.0
+
+
+def destination_point(latitude, longitude, bearing, distance_miles):
+    """
+    (latitude, longitude) reached by going distance_miles along a great circle from a point
+    (decimal degrees) with the initial compass bearing in degrees.
+    """
+    angle = distance_miles / EARTH_RADIUS_MILES
+    phi1 = math.radians(latitude)
+    theta = math.radians(bearing)
+    sin_phi2 = math.sin(phi1) * math.cos(angle) + math.cos(phi1) * math.sin(angle) * math.cos(theta)
+    phi2 = math.asin(max(-1.0, min(1.0, sin_phi2)))
+    lambda2 = math.radians(longitude) + math.atan2(math.sin(theta) * math.sin(angle) * math.cos(phi1),
+                                                   math.cos(angle) - math.sin(phi1) * sin_phi2)
+    return math.degrees(phi2), (math.degrees(lambda2) + 540.0) % 360.0 - 180.0
+
+
+def unit_vector(latitude, longitude):
+    """Point given in decimal degrees as a unit vector (x, y, z) from the center of the Earth."""
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    return np.array([math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)])
+
+
+def _arc(start, end):
+    """(angle, tangent) of the great-circle arc between two unit vectors; tangent is None for a zero length arc."""
+    normal = np.cross(start, end)
+    sin_angle = float(np.linalg.norm(normal))
+    angle = math.atan2(sin_angle, float(np.dot(start, end)))
+    if sin_angle < 1e-12:
+        return angle, None
+    return angle, np.cross(normal / sin_angle, start)
+
+
+def route_pieces(points, max_miles):
+    """
+    Split a polyline [(latitude, longitude)] into great-circle arcs of at most max_miles.
+
+    Returns [(start, end, mid_latitude, mid_longitude, start_miles, length_miles)]
+    with start/end as unit vectors and start_miles the distance along the route
+    to the start of the arc. A route of one point gives one zero length arc.
+    """
+    vectors = [unit_vector(latitude, longitude) for latitude, longitude in points]
+    pieces = []
+    route_miles = 0.0
+    for a, b in zip(vectors, vectors[1:]):
+        angle, tangent = _arc(a, b)
+        if tangent is None:
+            continue
+        count = max(1, math.ceil(angle * EARTH_RADIUS_MILES / max_miles))
+        step = angle / count
+        for i in range(count):
+            start = math.cos(i * step) * a + math.sin(i * step) * tangent
+            end = math.cos((i + 1) * step) * a + math.sin((i + 1) * step) * tangent
+            mid = math.cos((i + 0.5) * step) * a + math.sin((i + 0.5) * step) * tangent
+            pieces.append((start, end, math.degrees(math.asin(max(-1.0, min(1.0, mid[2])))),
+                           math.degrees(math.atan2(mid[1], mid[0])), route_miles, step * EARTH_RADIUS_MILES))
+            route_miles += step * EARTH_RADIUS_MILES
+    if not pieces and vectors:
+        pieces.append((vectors[0], vectors[0], points[0][0], points[0][1], 0.0, 0.0))
+    return pieces
+
+
+def distance_to_arc_miles(start, end, lat_rad, lon_rad, cos_lat):
+    """
+    Great-circle distance in miles from points to the arc between two unit vectors,
+    and the miles along the arc (from start) of each point's closest approach.
+    Points are given as numpy arrays of radians and cosines of the latitude.
+    """
+    points = np.stack((cos_lat * np.cos(lon_rad), cos_lat * np.sin(lon_rad), np.sin(lat_rad)), axis=-1)
+    angle, tangent = _arc(start, end)
+    if tangent is None:
+        along = np.zeros(len(points))
+        closest = np.broadcast_to(start, points.shape)
+    else:
+        # Angle of each point's projection on the arc's plane, clamped to the arc
+        along = np.clip(np.arctan2(points @ tangent, points @ start), 0.0, angle)
+        closest = np.cos(along)[:, np.newaxis] * start + np.sin(along)[:, np.newaxis] * tangent
+    distances = np.arctan2(np.linalg.norm(np.cross(points, closest), axis=-1), np.sum(points * closest, axis=-1))
+    return distances * EARTH_RADIUS_MILES, along * EARTH_RADIUS_MILES
@@ -1,12 +1,17 @@
-import pynmea2
 import serial
 import json
+import sqlite3
 import sys
 import os
-import traceback
+import time
+import atexit
+import signal
+from config_reader import ConfigReader
+from gps_fix import GpsFixWriter
+from track_store import TrackWriter
+from nmea_stream import NmeaFramer, parse_gga, parse_rmc
 
 # uv add pyserial
-# uv add pynmea2
 
 # Check if the correct number of arguments is provided
 if len(sys.argv) != 2:
@@ -23,44 +28,82 @@ elif not os.path.isdir(directory_path):
     print(f"Error: Path '{directory_path}' is not a directory.")
     sys.exit(1)
 
-# Define the port and baud rate (commonly 9600 for GPS devices)
-port = '/dev/ttyACM0'  # Change this to your actual device port
-baud_rate = 9600
+config=ConfigReader("config.json")
+# Port and baud rate (commonly 9600 for 1 Hz GPS devices, 115200 for 5-10 Hz receivers)
+port = config.gps_port
+baud_rate = config.gps_baud_rate
 carryOn=True
+# gps.json and the status line are written at most this often, however fast the receiver is
+JSON_SECONDS = 1
+STATUS_SECONDS = 10
 
+# The latest fix is published to a shared memory record that mcpScamp.py reads
+# without parsing. gps.json is still written for other readers (compatibility mode).
+fix_writer = GpsFixWriter(config.gps_fix_file)
+write_gps_json = config.write_gps_json
+# Every fix is also appended to the track history (committed in batches)
+track_writer = TrackWriter(config.track_db)
+atexit.register(track_writer.close)
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # systemd stop, flush the last batch
 
+def write_json(gps):
+    """Write gps.json via a temporary file and rename so readers never see a partial file."""
+    gps_file = directory_path + "/gps.json"
+    tmp_file = gps_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(gps, f)
+    os.replace(tmp_file, gps_file)
 
-
-altitude=0
+altitude=None
+num_sats=None
+gps_qual=None
+last_json=0
+last_status=0
+framer=NmeaFramer()
 while carryOn:
     try:
         # Open a serial connection
-        with serial.Serial(port, baud_rate) as ser:
+        with serial.Serial(port, baud_rate, timeout=1) as ser:
             while True:
-                line = ser.readline().decode('utf-8').strip()
-                if line.startswith('$GPGGA'): 
-                    msg = pynmea2.parse(line) 
-                    # print(repr(msg))
-                    if hasattr(msg, 'num_sats') and hasattr(msg, 'gps_qual') and hasattr(msg, 'altitude'):
-                        print("$GPGGA num_sats:",msg.num_sats, " gps_qual:",msg.gps_qual, " altitude:",msg.altitude)
-                        altitude=msg.altitude
+                # Read whatever has arrived (at least one byte) and frame it into sentences,
+                # bad bytes are skipped by the framer without reopening the port
+                data = ser.read(ser.in_waiting or 1)
+                for sentence_type, fields in framer.feed(data):
+                    if sentence_type == 'GGA':
+                        gga = parse_gga(fields)
+                        if gga:
+                            altitude=gga["altitude"]
+                            num_sats=gga["num_sats"]
+                            gps_qual=gga["gps_qual"]
+                        continue
 
-                if line.startswith('$GPRMC'):  # Check for NMEA sentences you are interested in
-                    msg = pynmea2.parse(line) 
-                    print("$GPRMC",repr(msg))
-                    if msg:
-                        if hasattr(msg, 'datetime') and hasattr(msg, 'latitude') and hasattr(msg, 'longitude'):
-                            if msg.latitude!=0 and msg.longitude!=0 and msg.datetime:
-                                print("date time:",str(msg.datetime)," Latitude:",msg.latitude," Longitude:",msg.longitude)
+                    rmc = parse_rmc(fields)
+                    if rmc and rmc["latitude"] and rmc["longitude"]:
+                        fix_time = rmc["datetime"]
+                        now = time.monotonic()
+                        try:
+                            fix_writer.publish(rmc["latitude"], rmc["longitude"], altitude, fix_time)
+                            track_writer.add(fix_time, rmc["latitude"], rmc["longitude"], altitude,
+                                             rmc["speed_knots"], rmc["course"], num_sats, gps_qual)
+                            if write_gps_json and now - last_json >= JSON_SECONDS:
                                 # Write the Longitude, latitude to a file
                                 gps = {
-                                    "timestamp" :str(msg.datetime),
-                                    "latitude": msg.latitude,
-                                    "longitude": msg.longitude,
+                                    "timestamp" :str(fix_time),
+                                    "latitude": rmc["latitude"],
+                                    "longitude": rmc["longitude"],
                                     "altitude":altitude
                                 }
-                                with open(directory_path + "/gps.json", "w", encoding="utf-8") as f:
-                                    json.dump(gps, f, indent=4) # indent for pretty printing
+                                write_json(gps)
+                                last_json = now
+                        except (sqlite3.Error, OSError) as e:
+                            # A full disk or a locked track database must not stop the logger,
+                            # track fixes not committed yet are retried with the next batch
+                            print("* Error writing the fix - Carry on and keep calm ",e)
+                        if now - last_status >= STATUS_SECONDS:
+                            print("date time:",str(fix_time)," Latitude:",rmc["latitude"]," Longitude:",rmc["longitude"],
+                                  " altitude:",altitude," num_sats:",num_sats," gps_qual:",gps_qual,
+                                  " sentences:",framer.sentences," skipped:",framer.skipped," bad:",framer.bad)
+                            last_status = now
 
     except serial.SerialException as e:
         print(f"* Error opening the port {port}: {e}")
@@ -68,18 +111,3 @@ while carryOn:
     except KeyboardInterrupt:
         print("Script terminated by user.")
         carryOn=False
-    except pynmea2.nmea.ParseError as e:
-        print("* ParseError - Carry on and keep calm ",e)
-        carryOn=True
-    except UnicodeDecodeError as e:
-        print("* UnicodeDecodeError - Carry on and keep calm ",e)
-        carryOn=True
-    except TypeError as e:
-        print("* TypeError - Carry on and keep calm ",e)
-        # traceback.print_exc()
-        carryOn=True
-
-    # except Exception as e:
-    #     print("Other Error:",e)
-    #     carryOn=False  
-    carryon=False      
\ No newline at end of file
@@ -0,0 +1,128 @@
+import math
+import mmap
+import os
+import struct
+import zlib
+from datetime import datetime, timezone
+
+# Fixed layout of the shared GPS fix record:
+#   magic, version, sequence, latitude, longitude, altitude, timestamp (epoch seconds), crc32 of the fix fields
+# The sequence is odd while the writer is updating the record and even once it
+# is published, so readers can detect (and retry) a torn read.
+MAGIC = b"GPSF"
+VERSION = 1
+_HEADER = struct.Struct("<4sHxxQ")
+_FIX = struct.Struct("<dddd")
+_CRC = struct.Struct("<I")
+_SEQ_OFFSET = 8
+_FIX_OFFSET = _HEADER.size
+_CRC_OFFSET = _FIX_OFFSET + _FIX.size
+RECORD_SIZE = _CRC_OFFSET + _CRC.size
+READ_RETRIES = 100
+
+
+class GpsFixWriter:
+    """
+    Publishes the latest GPS fix into a small memory-mapped file (normally on /dev/shm).
+    Only one writer (gpsLogger.py) should exist per file.
+    """
+
+    def __init__(self, fix_file):
+        self.fix_file = fix_file
+        fd = os.open(fix_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < RECORD_SIZE:
+                os.ftruncate(fd, RECORD_SIZE)
+            self._map = mmap.mmap(fd, RECORD_SIZE)
+        finally:
+            os.close(fd)
+        magic, version, seq = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            _HEADER.pack_into(self._map, 0, MAGIC, VERSION, 0)
+            seq = 0
+        # Never start on an odd (half written) sequence left by a crashed writer
+        self._seq = seq + (seq & 1)
+
+    def publish(self, latitude, longitude, altitude, timestamp):
+        """Publish a fix. timestamp is a timezone aware datetime."""
+        altitude = math.nan if altitude is None else float(altitude)
+        fix = _FIX.pack(float(latitude), float(longitude), altitude, timestamp.timestamp())
+        self._seq += 1
+        struct.pack_into("<Q", self._map, _SEQ_OFFSET, self._seq)
+        self._map[_FIX_OFFSET:_CRC_OFFSET] = fix
+        _CRC.pack_into(self._map, _CRC_OFFSET, zlib.crc32(fix))
+        self._seq += 1
+        struct.pack_into("<Q", self._map, _SEQ_OFFSET, self._seq)
+
+    def close(self):
+        self._map.close()
+
+
+class GpsFixReader:
+    """
+    Reads the latest fix published by GpsFixWriter. The file is mapped once,
+    after that a read is a stat, a memory copy and a checksum, no file open or
+    JSON parsing. It is mapped again when the writer has recreated it, like
+    ScampDB follows its file (inode and size; the mtime moves with every fix).
+    """
+
+    def __init__(self, fix_file):
+        self.fix_file = fix_file
+        self._map = None
+        self._signature = None
+
+    def _open(self):
+        try:
+            with open(self.fix_file, "rb") as f:
+                st = os.fstat(f.fileno())
+                self._signature = (st.st_dev, st.st_ino, st.st_size)
+                self._map = mmap.mmap(f.fileno(), RECORD_SIZE, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # Missing or not yet sized by the writer, try again next read
+            self._map = None
+        return self._map
+
+    def _record(self):
+        """The mapped record, mapped again when the file has been replaced (None while it is missing)."""
+        try:
+            st = os.stat(self.fix_file)
+        except FileNotFoundError:
+            self._map = None
+            return None
+        if self._map is None or (st.st_dev, st.st_ino, st.st_size) != self._signature:
+            # Reads still holding the old map finish on it
+            return self._open()
+        return self._map
+
+    @property
+    def sequence(self):
+        """Sequence number of the latest published fix (0 if none)."""
+        record = self._record()
+        if record is None:
+            return 0
+        return _HEADER.unpack_from(record, 0)[2]
+
+    def read(self):
+        """Return the latest fix as a dict like gps.json, or None if no fix has been published."""
+        record = self._record()
+        if record is None:
+            return None
+        for _ in range(READ_RETRIES):
+            magic, version, seq = _HEADER.unpack_from(record, 0)
+            if magic != MAGIC or version != VERSION or seq == 0:
+                return None
+            if seq & 1:
+                continue
+            fix = record[_FIX_OFFSET:_CRC_OFFSET]
+            crc, = _CRC.unpack_from(record, _CRC_OFFSET)
+            if _HEADER.unpack_from(record, 0)[2] != seq or zlib.crc32(fix) != crc:
+                continue
+            latitude, longitude, altitude, epoch = _FIX.unpack(fix)
+            return {
+                "timestamp": str(datetime.fromtimestamp(epoch, timezone.utc)),
+                "latitude": latitude,
+                "longitude": longitude,
+                "altitude": None if math.isnan(altitude) else altitude,
+                "sequence": seq
+            }
+        return None
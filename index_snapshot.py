@@ -0,0 +1,79 @@
+import json
+import mmap
+import os
+import shutil
+
+import numpy as np
+
+from metrics import log
+
+# Bumped whenever the layout of the snapshot files changes, older snapshots are then rebuilt
+VERSION = 1
+META_FILE = "meta.json"
+
+
+def save(path, key, meta, arrays, blobs):
+    """
+    Write an index snapshot to the directory path: arrays (name -> numpy array, one
+    .npy file each), blobs (name -> bytes, one .bin file each) and meta (JSON) saved
+    under key. The directory is written beside path and renamed over it when complete.
+    Returns False (and logs why) when the snapshot could not be written.
+    """
+    building = f"{path}.{os.getpid()}.tmp"
+    try:
+        if os.path.exists(building):
+            shutil.rmtree(building)
+        os.makedirs(building)
+        for name, values in arrays.items():
+            np.save(os.path.join(building, name + ".npy"), np.ascontiguousarray(values), allow_pickle=False)
+        for name, data in blobs.items():
+            with open(os.path.join(building, name + ".bin"), "wb") as f:
+                f.write(data)
+        with open(os.path.join(building, META_FILE), "w") as f:
+            json.dump({"version": VERSION, "key": key, "meta": meta}, f)
+        if os.path.exists(path):
+            old = f"{path}.{os.getpid()}.old"
+            os.replace(path, old)
+            os.replace(building, path)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.replace(building, path)
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        log.warning("could not save index snapshot %s: %s", path, e)
+        shutil.rmtree(building, ignore_errors=True)
+        return False
+
+
+def load(path, key):
+    """
+    (meta, arrays, blobs) of the snapshot in directory path, memory-mapped read-only,
+    or None when there is no snapshot saved under key (missing, stale or unreadable).
+    """
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        return None
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            saved = json.load(f)
+        if saved.get("version") != VERSION or saved.get("key") != key:
+            return None
+        arrays = {}
+        blobs = {}
+        for file_name in os.listdir(path):
+            name, extension = os.path.splitext(file_name)
+            if extension == ".npy":
+                arrays[name] = np.load(os.path.join(path, file_name), mmap_mode="r", allow_pickle=False)
+            elif extension == ".bin":
+                blobs[name] = _map_blob(os.path.join(path, file_name))
+        return saved["meta"], arrays, blobs
+    except (OSError, ValueError, KeyError) as e:
+        log.warning("could not load index snapshot %s: %s", path, e)
+        return None
+
+
+def _map_blob(file_name):
+    """Contents of a file as a read-only mmap (slicing it gives bytes)."""
+    with open(file_name, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
@@ -1,104 +1,189 @@
 import time
-import sqlite3
 import math
+import sqlite3
 import json
 import os
 import sys
-import pytz
+import threading
 
 from datetime import datetime,timezone
-from timezonefinder import TimezoneFinder
 from mcp.server.fastmcp import FastMCP
 from config_reader import ConfigReader
+from scamp_db import ScampDB
+from spatial_index import SpatialIndex
+from park_dataset import ParkDataset
+from paging import find_hits, page_hits
+from response_format import MAX_TEXT_LENGTH, columnar, encode, shape_parks
+from name_index import NameIndex, normalize_name
+from scamp_schema import NAME_COLUMNS, SUMMARY_COLUMNS, name_key_table
+from worker_pool import WorkerPool
+from result_cache import ResultCache
+from geo import bearing_between_points, distance_between_points
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from metrics import Metrics, StartupTimer, log, phase, setup_logging
+from timezones import TimezoneLookup
+from gps_fix import GpsFixReader
+from track_store import TrackHistory
+from prefetch import Prefetcher
+from title_index import TitleIndex
 import urllib.parse
+import anyio
 
 
 
 config=ConfigReader("config.json")
+setup_logging(config.log_level)
+# Time from process start to each startup step, logged at INFO and in get_server_stats
+startup = StartupTimer()
+startup.mark("imports")
 mcp = FastMCP("MCP Scamp",port=8100,host="0.0.0.0")
-
-
-
-def distance_between_points(lat1, lon1, lat2, lon2):
+db = ScampDB(config.scamp_db)
+# Per tool latency, phase timings, rows and response sizes (get_server_stats, /metrics)
+metrics = Metrics()
+# Tools doing blocking work are async handlers running on this bounded thread pool,
+# so one slow call does not hold up the other clients. Each call stays on the version
+# of scamp.db it started with, even when a new snapshot is swapped in meanwhile.
+pool = WorkerPool(call_context=db.pinned)
+# Results of the distance and by-name tools, dropped when scamp.db changes the tables they read
+result_cache = ResultCache(db)
+# While the fix stays within this distance the same search origin is reused, so
+# repeated "near me" searches of a parked vehicle are answered from the cache
+ORIGIN_MOVE_MILES = 0.1
+last_origin = None
+
+# All SQL is parameterized so the compiled statements are reused from the
+# per-connection statement cache.
+SQL_RV_PARK_BY_NAME = "SELECT * FROM rv_park where name = ?"
+SQL_RV_PARK_BY_ROWIDS = "SELECT rowid AS _rowid, * FROM rv_park where rowid IN (SELECT value FROM json_each(?))"
+SQL_LOCATION_BY_NAME = "SELECT * FROM US where name = LOWER(?) and state=UPPER(?)"
+# Same lookups on the normalized names of build_db.py (case and punctuation insensitive)
+SQL_RV_PARK_BY_NAME_KEY = "SELECT t.* FROM rv_park_name_key k JOIN rv_park t ON t.rowid = k.id where k.name_key = ?"
+SQL_LOCATION_BY_NAME_KEY = ("SELECT t.* FROM US_name_key k JOIN US t ON t.rowid = k.id "
+                            "where k.name_key = ? and t.state=UPPER(?)")
+
+# Spatial indexes over the park tables. They hold the summary columns in memory (or
+# read them from the R*Tree of a build_db.py database), so radius searches without
+# details never read full rows. With index_snapshot_dir set, all the indexes are
+# memory-mapped from snapshots saved there instead of rebuilt on every start.
+rv_park_index = SpatialIndex(db, "rv_park", SUMMARY_COLUMNS["rv_park"], snapshot_dir=config.index_snapshot_dir)
+# State parks: the per-state shard files of state_parks_dir (build_db.py --sharded-state-parks),
+# opened only where searched, or the pa_state_park table of scamp.db when it is not set.
+# Each has its spatial index and a trigram name index (state_parks.name_index).
+state_park_table = "pa_state_park" if config.state_parks_dir is None else "state_park"
+state_parks = ParkDataset(db, state_park_table, SUMMARY_COLUMNS[state_park_table], config.state_parks_dir,
+                          snapshot_dir=config.index_snapshot_dir)
+# Replaced shard files do not show in ScampDB.changes, their cached results follow the manifest
+result_cache.watch(state_parks.table, lambda: state_parks.generation)
+# Trigram name indexes so a slightly wrong name gets ranked candidates in one call
+rv_park_name_index = NameIndex(db, "rv_park", NAME_COLUMNS["rv_park"], snapshot_dir=config.index_snapshot_dir)
+location_name_index = NameIndex(db, "US", NAME_COLUMNS["US"], snapshot_dir=config.index_snapshot_dir)
+# Spatial index over every place of the US gazetteer table for reverse geocoding,
+# kept in compact arrays (or searched through its R*Tree when the table is large)
+places_index = SpatialIndex(db, "US", SUMMARY_COLUMNS["US"], snapshot_dir=config.index_snapshot_dir)
+# Most places get_nearest_places returns
+MAX_NEAREST_PLACES = 50
+timezone_lookup = TimezoneLookup()
+gps_fix_reader = GpsFixReader(config.gps_fix_file)
+track_history = TrackHistory(ScampDB(config.track_db))
+
+# Kiwix server of the offline Wikipedia and wikiHow archives, and the books served
+KIWIX_URL = "http://piai.local:8080"
+WIKIPEDIA_BOOK = "wikipedia_en_all_maxi_2025-08"
+WIKIHOW_BOOK = "wikihow_en_maxi_2022-12"
+
+def title_index(book):
+    """Title index of a Kiwix book (title_index.py), built into title_index_dir as <book>.titles."""
+    directory = config.title_index_dir
+    return TitleIndex(None if directory is None else os.path.join(directory, book + ".titles"))
+
+# Article titles of the books, so the wiki tools link straight to existing articles
+wikipedia_titles = title_index(WIKIPEDIA_BOOK)
+wikihow_titles = title_index(WIKIHOW_BOOK)
+
+# Follows the GPS fix while driving and keeps the parks ahead in the spatial indexes,
+# so "from my location" searches are answered without touching the grid or the DB
+prefetcher = Prefetcher(gps_fix_reader.read, [rv_park_index, state_parks])
+
+def details_by_rowid(sql, rowids):
+    """Fetch full rows for the given rowids, returned as a dict keyed on rowid."""
+    rows = db.query(sql, (json.dumps(rowids),))
+    details = {}
+    for row in rows:
+        park = dict(row)
+        details[park.pop("_rowid")] = park
+    return details
+
+def rv_park_details(rowids):
+    return details_by_rowid(SQL_RV_PARK_BY_ROWIDS, rowids)
+
+def rows_by_name(table, sql, sql_by_key, name, *params):
+    """Rows named name, using the normalized names when the database has them."""
+    if db.columns(name_key_table(table)):
+        return db.query(sql_by_key, (normalize_name(name), *params))
+    return db.query(sql, (name, *params))
+
+def details_by_fuzzy_name(index, read_details, name, limit):
+    """Full rows of the parks best matching name, best first, each with its matchScore."""
+    hits = index.search(name, limit)
+    details = read_details([rowid for rowid,row,score in hits])
+    parks = []
+    for rowid,row,score in hits:
+        park = details[rowid]
+        park['matchScore'] = score
+        parks.append(park)
+    return parks
+
+def my_search_origin():
+    """Current location as (latitude, longitude), kept at the previous origin until the fix moves ORIGIN_MOVE_MILES."""
+    global last_origin
+    location=get_my_location.sync()
+    origin=(float(location.get("latitude",0)),float(location.get("longitude",0)))
+    if last_origin is None or distance_between_points(*origin,*last_origin) > ORIGIN_MOVE_MILES:
+        last_origin=origin
+    return last_origin
+
+def has_rv_camping(park):
+    return park.get("hasRVCamping")==1
+
+def to_json(result):
+    with phase("serialization"):
+        return encode(result)
+
+def park_result(parks, fields=None, compact=False, maxTextLength=MAX_TEXT_LENGTH):
+    """Parks projected on fields with long text cut, as an array or (compact) columns plus rows."""
+    parks = shape_parks(parks, fields, maxTextLength)
+    return columnar(parks) if compact else parks
+
+def paged_result(parks, limit, next_cursor, fields=None, compact=False, maxTextLength=MAX_TEXT_LENGTH):
     """
-    Calculate the distance between two points on Earth using the Haversine formula.
-    
-    Inputs are in decimal degrees. Output is in kilometers.
+    Plain array (or compact columns) when no limit was asked for, otherwise one page
+    plus the cursor of the next page.
     """
-    # Earth radius in kilometers
-    earth_radius = 6371
+    result = park_result(parks, fields, compact, maxTextLength)
+    if limit <= 0:
+        return to_json(result)
+    if compact:
+        return to_json({**result, "nextCursor": next_cursor})
+    return to_json({"parks": result, "nextCursor": next_cursor})
 
-    # Convert degrees to radians
-    lat1 = math.radians(lat1)
-    lon1 = math.radians(lon1)
-    lat2 = math.radians(lat2)
-    lon2 = math.radians(lon2)
-
-    # Differences in coordinates
-    diff_lat = lat2 - lat1
-    diff_lon = lon2 - lon1
-
-    # Haversine formula
-    a = math.sin(diff_lat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(diff_lon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-    # Distance in miles
-    distance = earth_radius * c * 0.62
-    return distance
-
-def lat_lon_range(latitude, longitude, distance_miles):
-    """
-    Calculates the latitude and longitude range based on a given point and distance.
-
-    Args:
-        latitude (float): Latitude of the center point in degrees.
-        longitude (float): Longitude of the center point in degrees.
-        distance_miles (float): Distance in miles to calculate the range.
-
-    Returns:
-        tuple: A tuple containing the minimum and maximum latitude and longitude
-               (min_lat, max_lat, min_lon, max_lon).
-    """
-    earth_radius_miles = 3959  # Earth radius in miles
-
-    # Convert latitude and longitude to radians
-    lat_rad = math.radians(latitude)
-    lon_rad = math.radians(longitude)
-
-    # Angular distance in radians
-    angular_distance = distance_miles / earth_radius_miles
-
-    # Calculate minimum and maximum latitude
-    min_lat = math.degrees(lat_rad - angular_distance)
-    max_lat = math.degrees(lat_rad + angular_distance)
-
-    # Calculate the change in longitude
-    delta_lon = math.degrees(math.asin(math.sin(angular_distance) / math.cos(lat_rad)))
-
-    # Calculate minimum and maximum longitude
-    min_lon = longitude - delta_lon
-    max_lon = longitude + delta_lon
-
-    return (min_lat, max_lat, min_lon, max_lon)
-
-def get_db_connection():
-    scamp_db_file = config.scamp_db
-    print("scamp_db_file",scamp_db_file)
-    conn = sqlite3.connect(scamp_db_file)
-    conn.row_factory = sqlite3.Row  # Enables dict-like access to rows
-    return conn
 
 # Tool: return location as latitude and longitude
 @mcp.tool(annotations={"readOnlyHint": True})
+@metrics.instrument
+@pool.tool()
 def get_my_location() -> dict:
     """Return the current location as latitude, longitude and altitude(meters).
        Only use this for finding my current location, not for other locations.
        Timestamp is included for information on when the location was last determined."""
-    print("get_location")
     try:
+        # Latest fix shared by gpsLogger.py, falling back to gps.json (compatibility mode)
         gps_file_name = config.gps_file
-        with open(gps_file_name, "r") as f:
-            gps_data = json.load(f)
+        with phase("file"):
+            gps_data = gps_fix_reader.read()
+            if gps_data is None:
+                with open(gps_file_name, "r") as f:
+                    gps_data = json.load(f)
         
         # Extract values
         latitude = round(gps_data.get("latitude"),5)
@@ -114,264 +199,648 @@ def get_my_location() -> dict:
             }
     
     except FileNotFoundError:
-        print(f"Error: {gps_file_name} not found.")
+        log.error("gps file %s not found", gps_file_name)
     except json.JSONDecodeError:
-        print("Error: Invalid JSON format.")
+        log.error("gps file %s is not valid JSON", gps_file_name)
+
+@mcp.tool(annotations={"readOnlyHint": True})
+@metrics.instrument
+@pool.tool()
+def get_recent_track(minutes: int=60, maxPoints: int=100, endTime: str="") -> str:
+    """
+    Return the track traveled (GPS history) over a time window, with distance traveled, average speed and heading.
+    Use for questions like "how far have we driven today" or "where were we an hour ago".
+    Args:
+        minutes(number, optional): Length of the window in minutes, ending at endTime. Default: 60.
+        maxPoints(number, optional): Maximum track points to return (the track is downsampled). Default: 100.
+        endTime(string, optional): ISO 8601 end of the window. Default: now.
+    Output:
+        start, end (string): The window.
+        resolution (string): "fix" for raw fixes, otherwise the summary bucket size used (e.g. "60s").
+        distanceMiles (number), averageSpeedMph (number, while moving), heading (number, degrees from north, or null if not moving).
+        segments (array): Continuous stretches of track, each {start, end, points: array of [latitude, longitude, altitude, timestamp]}.
+    """
+    if endTime:
+        end = datetime.fromisoformat(endTime)
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        end_ts = end.timestamp()
+    else:
+        end_ts = time.time()
+    return to_json(track_history.track(end_ts - minutes * 60, end_ts, maxPoints))
 
 @mcp.tool(annotations={"readOnlyHint": True})
-def get_state_parks_details_by_name(name: str ) -> str:
+@metrics.instrument
+@pool.tool()
+@result_cache.cached(tables=[state_parks.table])
+def get_state_parks_details_by_name(name: str, maxCandidates: int=3, fields:list[str]|None=None, compact:bool=False,
+                                    maxTextLength:int=MAX_TEXT_LENGTH) -> str:
     """
-    Gets a detailed information about a specific pennsylvania state park by name.
+    Gets a detailed information about a specific state park by name.
+    If there is no exact match the closest matching parks are returned instead, best first,
+    each with a matchScore (0 to 1). Pick the intended park from these rather than retrying.
     Args:
         name: The name of the park   
+        maxCandidates(number, optional): Maximum parks returned when there is no exact match. Default: 3.
+        fields(array of strings, optional): Only return these park fields (distance and matchScore are always kept). Default: all.
+        compact(boolean, optional): If true parks are returned as {"columns": field names, "rows": array of value arrays}. Default: false.
+        maxTextLength(number, optional): Longer text fields are cut to this many characters, 0 for no limit. Default: 1000.
     """
-    print("get_state_parks_details_by_name",name)
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    select =   "SELECT * FROM pa_state_park where name = '" + name + "'"
-    cursor.execute(select)
-    rows = cursor.fetchall()
-    conn.close()
-    park = [dict(row) for row in rows]  # Convert to list of dictionaries items
-    return json.dumps(park)
+    ids = state_parks.ids_by_name(name)
+    details = state_parks.details(ids)
+    park = [details[park_id] for park_id in ids if park_id in details]
+    if not park:
+        park = details_by_fuzzy_name(state_parks.name_index, state_parks.details, name, maxCandidates)
+    return to_json(park_result(park,fields,compact,maxTextLength))
 
 @mcp.tool(annotations={"readOnlyHint": True})
-def get_state_parks_by_distance_from_my_location(miles: int, rvOnly:bool=False,includeDetails:bool=False) -> str:
+@metrics.instrument
+@pool.tool()
+def get_state_parks_by_distance_from_my_location(miles: int, rvOnly:bool=False,includeDetails:bool=False,
+                                                 limit:int=0,sortByDistance:bool=False,cursor:str="",
+                                                 fields:list[str]|None=None,compact:bool=False,maxTextLength:int=MAX_TEXT_LENGTH) -> str:
     """
-    Find Pennsylvania state parks within miles of the current location. 
+    Find state parks within miles of the current location. 
     Results are calculated by straight-line distance (miles). Use when searching near the current device location.
+    For "the closest N parks" use sortByDistance=true and limit=N.
     Args:
         miles(number, required):  Search radius in miles. 
         rvOnly(boolean, optional): Only parks with RV camping should be included. Default: false.
         includeDetails(boolean, optional): If true, include full park details. Default: false
-    Output (array of parks):
+        limit(number, optional): Maximum parks to return (one page). Default: 0 (no limit).
+        sortByDistance(boolean, optional): If true, closest parks first. Default: false.
+        cursor(string, optional): nextCursor from the previous page to get the next page.
+        fields(array of strings, optional): Only return these park fields (distance and matchScore are always kept). Default: all.
+        compact(boolean, optional): If true parks are returned as {"columns": field names, "rows": array of value arrays}. Default: false.
+        maxTextLength(number, optional): Longer text fields are cut to this many characters, 0 for no limit. Default: 1000.
+    Output (array of parks, or when limit is set {"parks": array of parks, "nextCursor": string or null}):
         Always: name (string), distanceMiles (number), hasRvCamping (boolean).
         If includeDetails=true: address (string), city (string), zip (number), latitude (number), longitude (number), hasOvernight (boolean), hasPavilion (boolean), overview (string), url (string).
     """
-    print("get_state_parks_by_distance_from_my_current_location",miles)
-    location=get_my_location()
-    print("location",location)
-    lat=float(location.get("latitude",0))
-    long=float(location.get("longitude",0))
-    return get_state_parks_by_distance_from_any_location(lat,long,miles,rvOnly,includeDetails)
+    lat,long=my_search_origin()
+    return get_state_parks_by_distance_from_any_location.sync(lat,long,miles,rvOnly,includeDetails,limit,sortByDistance,cursor,
+                                                              fields,compact,maxTextLength)
 
 @mcp.tool(annotations={"readOnlyHint": True})
-def get_state_parks_by_distance_from_any_location(latitude:float,longitude:float,miles: int, rvOnly:bool=False,includeDetails:bool=False) -> str:
+@metrics.instrument
+@pool.tool()
+@result_cache.cached(tables=[state_parks.table])
+def get_state_parks_by_distance_from_any_location(latitude:float,longitude:float,miles: int, rvOnly:bool=False,includeDetails:bool=False,
+                                                  limit:int=0,sortByDistance:bool=False,cursor:str="",
+                                                  fields:list[str]|None=None,compact:bool=False,maxTextLength:int=MAX_TEXT_LENGTH) -> str:
     """
-    Find Pennsylvania state parks within miles of the given latitude/longitude. 
+    Find state parks within miles of the given latitude/longitude. 
     Results are calculated by straight-line distance (miles). Use when searching near a specified coordinate
     (not the current device location).
+    For "the closest N parks" use sortByDistance=true and limit=N.
     Args:
         latitude (number, required): Decimal degrees (-90 to 90).
         longitude (number, required): Decimal degrees (-180 to 180).
         miles(number, required):  Search radius in miles. 
         rvOnly(boolean, optional): Only parks with RV camping should be included. Default: false.
         includeDetails(boolean, optional): If true, include full park details. Default: false.
-    Output (array of parks):
+        limit(number, optional): Maximum parks to return (one page). Default: 0 (no limit).
+        sortByDistance(boolean, optional): If true, closest parks first. Default: false.
+        cursor(string, optional): nextCursor from the previous page to get the next page.
+        fields(array of strings, optional): Only return these park fields (distance and matchScore are always kept). Default: all.
+        compact(boolean, optional): If true parks are returned as {"columns": field names, "rows": array of value arrays}. Default: false.
+        maxTextLength(number, optional): Longer text fields are cut to this many characters, 0 for no limit. Default: 1000.
+    Output (array of parks, or when limit is set {"parks": array of parks, "nextCursor": string or null}):
         Always: name (string), distanceMiles (number), hasRvCamping (boolean).
         If includeDetails=true: address (string), city (string), zip (number), latitude (number), longitude (number), hasOvernight (boolean), hasPavilion (boolean), overview (string), url (string).
     """
-    print("get_state_parks_by_distance_from_any_location",latitude,longitude,miles,rvOnly,includeDetails)
-    min_lat, max_lat, min_lon, max_lon = lat_lon_range(latitude,longitude,miles)
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    query = [state_parks.table,latitude,longitude,miles,rvOnly,sortByDistance]
+    hits, next_cursor = find_hits(state_parks,latitude,longitude,miles,query,limit,sortByDistance,cursor,
+                                  has_rv_camping if rvOnly else None)
     if includeDetails:
-        select =   "SELECT * FROM pa_state_park where latitude>={:.4f} and latitude <={:.4f} and longitude>={:.4f} and longitude<={:.4f}".format(min_lat, max_lat, min_lon, max_lon)
-    else:
-        select =   "SELECT name,longitude,latitude,hasRVCamping FROM pa_state_park where latitude>={:.4f} and latitude <={:.4f} and longitude>={:.4f} and longitude<={:.4f}".format(min_lat, max_lat, min_lon, max_lon)
-    if rvOnly:
-        select += " and hasRVCamping==1"
-    # print(select)
-    cursor.execute(select)
-    rows = cursor.fetchall()
-    conn.close()
-    parks = [dict(row) for row in rows]  # Convert to list of dictionaries items
+        details = state_parks.details([rowid for rowid,park,distance in hits])
     parkAndDistance=[]
-    for park in parks:
-        park['distance']=round(distance_between_points(latitude,longitude,park.get("latitude"),park.get("longitude")),2)
-        if not includeDetails:
+    for rowid,park,distance in hits:
+        if includeDetails:
+            park=details[rowid]
+        else:
             del park['latitude']
             del park['longitude']
+        park['distance']=round(distance,2)
         parkAndDistance.append(park)
-    return json.dumps(parkAndDistance)
+    return paged_result(parkAndDistance,limit,next_cursor,fields,compact,maxTextLength)
 
 @mcp.tool(annotations={"readOnlyHint": True})
-def get_rv_parks_by_distance_from_my_location(miles: int , includeDetails:bool=False) -> str:
+@metrics.instrument
+@pool.tool()
+def get_rv_parks_by_distance_from_my_location(miles: int , includeDetails:bool=False,
+                                              limit:int=0,sortByDistance:bool=False,cursor:str="",
+                                              fields:list[str]|None=None,compact:bool=False,maxTextLength:int=MAX_TEXT_LENGTH) -> str:
     """
     Find RV parks within miles of my the current location. 
     Results are calculated by straight-line distance (miles). Use when searching near the current device location.
+    For "the closest N RV parks" use sortByDistance=true and limit=N.
     Args:
         miles(number, required):  Search radius in miles. 
         includeDetails(boolean, optional): If true, include full park details. Default: false
-    Output (array of RV parks):
+        limit(number, optional): Maximum parks to return (one page). Default: 0 (no limit).
+        sortByDistance(boolean, optional): If true, closest parks first. Default: false.
+        cursor(string, optional): nextCursor from the previous page to get the next page.
+        fields(array of strings, optional): Only return these park fields (distance and matchScore are always kept). Default: all.
+        compact(boolean, optional): If true parks are returned as {"columns": field names, "rows": array of value arrays}. Default: false.
+        maxTextLength(number, optional): Longer text fields are cut to this many characters, 0 for no limit. Default: 1000.
+    Output (array of RV parks, or when limit is set {"parks": array of RV parks, "nextCursor": string or null}):
         Always: name (string), distanceMiles (number),City,St
         If includeDetails=true: UID,Name,Est,Address,City,St,zip,Phone,latitude,longitude,Amenities(This includes a relative price indicator using $ signs),RecordID,Web,Booking,Comments,Rating,Reviews
     """
-    print("get_rv_parks_by_distance_from_my_location",miles,includeDetails)
-    location=get_my_location()
-    print("location",location)
-    lat=float(location.get("latitude",0))
-    long=float(location.get("longitude",0))
-    return get_rv_parks_by_distance_from_any_location(lat,long,miles,includeDetails)
+    lat,long=my_search_origin()
+    return get_rv_parks_by_distance_from_any_location.sync(lat,long,miles,includeDetails,limit,sortByDistance,cursor,
+                                                           fields,compact,maxTextLength)
 
 @mcp.tool(annotations={"readOnlyHint": True})
-def get_rv_parks_by_distance_from_any_location(latitude:float,longitude:float,miles: int, includeDetails:bool=False) -> str:
+@metrics.instrument
+@pool.tool()
+@result_cache.cached(tables=["rv_park"])
+def get_rv_parks_by_distance_from_any_location(latitude:float,longitude:float,miles: int, includeDetails:bool=False,
+                                               limit:int=0,sortByDistance:bool=False,cursor:str="",
+                                               fields:list[str]|None=None,compact:bool=False,maxTextLength:int=MAX_TEXT_LENGTH) -> str:
     """
     Find RV parks within miles of the given latitude/longitude. 
     Results are calculated by straight-line distance (miles). Use when searching near a specified coordinate
     (not the current device location).
+    For "the closest N RV parks" use sortByDistance=true and limit=N.
     Args:
         latitude (number, required): Decimal degrees (-90 to 90).
         longitude (number, required): Decimal degrees (-180 to 180).
         miles(number, required):  Search radius in miles. 
         includeDetails(boolean, optional): If true, include full park details. Default: false.
-    Output (array of RV parks):
+        limit(number, optional): Maximum parks to return (one page). Default: 0 (no limit).
+        sortByDistance(boolean, optional): If true, closest parks first. Default: false.
+        cursor(string, optional): nextCursor from the previous page to get the next page.
+        fields(array of strings, optional): Only return these park fields (distance and matchScore are always kept). Default: all.
+        compact(boolean, optional): If true parks are returned as {"columns": field names, "rows": array of value arrays}. Default: false.
+        maxTextLength(number, optional): Longer text fields are cut to this many characters, 0 for no limit. Default: 1000.
+    Output (array of RV parks, or when limit is set {"parks": array of RV parks, "nextCursor": string or null}):
         Always: name (string), distanceMiles (number),City,St
         If includeDetails=true: UID,Name,Est,Address,City,St,zip,Phone,latitude,longitude,Amenities (This includes a relative price indicator using $ signs),RecordID,Web,Booking,Comments,Rating,Reviews
     """
 
-    print("get_rv_parks_by_distance_from_any_location:",miles,latitude,longitude,includeDetails)
-    location=get_my_location()
-    lat=latitude
-    long=longitude
-    min_lat, max_lat, min_lon, max_lon = lat_lon_range(lat,long,miles)
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    query = ["rv_park",latitude,longitude,miles,sortByDistance]
+    hits, next_cursor = find_hits(rv_park_index,latitude,longitude,miles,query,limit,sortByDistance,cursor)
     if includeDetails:
-        select =   "SELECT * FROM rv_park where latitude>={:.4f} and latitude <={:.4f} and longitude>={:.4f} and longitude<={:.4f}".format(min_lat, max_lat, min_lon, max_lon)
-    else:
-        select =   "SELECT name,longitude,latitude,city,st FROM rv_park where latitude>={:.4f} and latitude <={:.4f} and longitude>={:.4f} and longitude<={:.4f}".format(min_lat, max_lat, min_lon, max_lon)
-    print(select)
-    cursor.execute(select)
-    rows = cursor.fetchall()
-    conn.close()
-    parks = [dict(row) for row in rows]  # Convert to list of dictionaries items
+        details = details_by_rowid(SQL_RV_PARK_BY_ROWIDS,[rowid for rowid,park,distance in hits])
     parkAndDistance=[]
-    for park in parks:
-        park['distance']=distance_between_points(lat,long,park.get("latitude"),park.get("longitude"))
+    for rowid,park,distance in hits:
+        if includeDetails:
+            park=details[rowid]
+        park['distance']=distance
         parkAndDistance.append(park)
-    return json.dumps(parkAndDistance)
+    return paged_result(parkAndDistance,limit,next_cursor,fields,compact,maxTextLength)
+
+def resolve_location(place):
+    """[latitude, longitude] of "latitude,longitude" or "name, state" (resolved like get_location_by_name)."""
+    parts = [part.strip() for part in str(place).rsplit(",", 1)]
+    if len(parts) != 2:
+        raise ValueError(f"Location '{place}' is not 'latitude,longitude' or 'name, state'")
+    try:
+        latitude,longitude = float(parts[0]), float(parts[1])
+    except ValueError:
+        location = get_location_by_name.sync(parts[0], parts[1])
+        latitude,longitude = location["latitude"], location["longitude"]
+    return [round(latitude,5), round(longitude,5)]
+
+def route_points(route, fromMyLocation):
+    """Resolve route stops ("latitude,longitude" or "name, ST") to [[latitude, longitude]]."""
+    points = [[round(coordinate,5) for coordinate in my_search_origin()]] if fromMyLocation else []
+    points += [resolve_location(stop) for stop in route]
+    if not points:
+        raise ValueError("The route needs at least one stop")
+    return points
 
 @mcp.tool(annotations={"readOnlyHint": True})
-def get_rv_parks_details_by_name(name: str ) -> str:
+@metrics.instrument
+@pool.tool()
+def get_rv_parks_along_route(route: list[str], miles: float=5, fromMyLocation: bool=False, includeDetails:bool=False,
+                             limit:int=0, cursor:str="") -> str:
+    """
+    Find RV parks within miles of a route, in the order they are passed when driving it.
+    Use this for trip planning ("RV parks within 5 miles of my route to Erie") instead of
+    repeated searches around points along the way. The route is straight (great-circle) lines between the stops.
+    Args:
+        route(array of strings, required): Stops in driving order, each "latitude,longitude" or "name, state"
+                                           (e.g. "Erie, PA", resolved like get_location_by_name).
+        miles(number, optional): Maximum distance from the route in miles. Default: 5.
+        fromMyLocation(boolean, optional): If true the route starts at the current location. Default: false.
+        includeDetails(boolean, optional): If true, include full park details. Default: false.
+        limit(number, optional): Maximum parks to return (one page). Default: 0 (no limit).
+        cursor(string, optional): nextCursor from the previous page to get the next page.
+    Output (array of RV parks, or when limit is set {"parks": array of RV parks, "nextCursor": string or null}):
+        Always: name (string), distance (miles from the route), routeMiles (miles along the route to the park),City,St
+        If includeDetails=true: UID,Name,Est,Address,City,St,zip,Phone,latitude,longitude,Amenities (This includes a relative price indicator using $ signs),RecordID,Web,Booking,Comments,Rating,Reviews
+    """
+    return rv_parks_along_route(route_points(route,fromMyLocation),miles,includeDetails,limit,cursor)
+
+@result_cache.cached(tables=["rv_park"])
+def rv_parks_along_route(points, miles, includeDetails, limit, cursor):
+    hits, next_cursor = page_hits(rv_park_index.along_route(points,miles),["rv_park_route",points,miles],limit,cursor)
+    if includeDetails:
+        details = details_by_rowid(SQL_RV_PARK_BY_ROWIDS,[hit[0] for hit in hits])
+    parks=[]
+    for rowid,park,distance,route_miles in hits:
+        if includeDetails:
+            park=details[rowid]
+        park['distance']=round(distance,2)
+        park['routeMiles']=round(route_miles,1)
+        parks.append(park)
+    return paged_result(parks,limit,next_cursor)
+
+@mcp.tool(annotations={"readOnlyHint": True})
+@metrics.instrument
+@pool.tool()
+def get_state_parks_along_route(route: list[str], miles: float=5, fromMyLocation: bool=False, rvOnly:bool=False,
+                                includeDetails:bool=False, limit:int=0, cursor:str="") -> str:
+    """
+    Find state parks within miles of a route, in the order they are passed when driving it.
+    Use this for trip planning instead of repeated searches around points along the way.
+    The route is straight (great-circle) lines between the stops.
+    Args:
+        route(array of strings, required): Stops in driving order, each "latitude,longitude" or "name, state"
+                                           (e.g. "Erie, PA", resolved like get_location_by_name).
+        miles(number, optional): Maximum distance from the route in miles. Default: 5.
+        fromMyLocation(boolean, optional): If true the route starts at the current location. Default: false.
+        rvOnly(boolean, optional): Only parks with RV camping should be included. Default: false.
+        includeDetails(boolean, optional): If true, include full park details. Default: false.
+        limit(number, optional): Maximum parks to return (one page). Default: 0 (no limit).
+        cursor(string, optional): nextCursor from the previous page to get the next page.
+    Output (array of parks, or when limit is set {"parks": array of parks, "nextCursor": string or null}):
+        Always: name (string), distance (miles from the route), routeMiles (miles along the route to the park), hasRvCamping (boolean).
+        If includeDetails=true: address (string), city (string), zip (number), latitude (number), longitude (number), hasOvernight (boolean), hasPavilion (boolean), overview (string), url (string).
+    """
+    return state_parks_along_route(route_points(route,fromMyLocation),miles,rvOnly,includeDetails,limit,cursor)
+
+@result_cache.cached(tables=[state_parks.table])
+def state_parks_along_route(points, miles, rvOnly, includeDetails, limit, cursor):
+    hits = state_parks.along_route(points,miles,has_rv_camping if rvOnly else None)
+    hits, next_cursor = page_hits(hits,[state_parks.table + "_route",points,miles,rvOnly],limit,cursor)
+    if includeDetails:
+        details = state_parks.details([hit[0] for hit in hits])
+    parks=[]
+    for rowid,park,distance,route_miles in hits:
+        if includeDetails:
+            park=details[rowid]
+        else:
+            del park['latitude']
+            del park['longitude']
+        park['distance']=round(distance,2)
+        park['routeMiles']=round(route_miles,1)
+        parks.append(park)
+    return paged_result(parks,limit,next_cursor)
+
+@mcp.tool(annotations={"readOnlyHint": True})
+@metrics.instrument
+@pool.tool()
+def get_parks_near_locations(locations: list[str], miles: float=10, dataset: str="rv_park", includeMyLocation: bool=False,
+                             rvOnly: bool=False, includeDetails: bool=False, limit: int=0, cursor: str="") -> str:
+    """
+    Find parks near several locations in one call, instead of one distance search per location.
+    Each park is listed once with its distance to every location.
+    Args:
+        locations(array of strings, required): Each "latitude,longitude" or "name, state"
+                                               (e.g. "Erie, PA", resolved like get_location_by_name).
+        miles(number, optional): Search radius around each location in miles. Default: 10.
+        dataset(string, optional): "rv_park" for RV parks or "state_park" for state parks. Default: "rv_park".
+        includeMyLocation(boolean, optional): If true the current location is added as the first location. Default: false.
+        rvOnly(boolean, optional): State parks only: only parks with RV camping. Default: false.
+        includeDetails(boolean, optional): If true, include full park details. Default: false.
+        limit(number, optional): Maximum parks to return (one page). Default: 0 (no limit).
+        cursor(string, optional): nextCursor from the previous page to get the next page.
+    Output: {"locations": array of [latitude, longitude] in the order searched,
+             "parks": array of parks closest first, each with the park's summary (or details) and
+                       distances (array, miles to each location in the same order, null when beyond miles),
+             "nextCursor": string or null (only when limit is set)}
+    """
+    if dataset == "pa_state_park":
+        dataset = "state_park"  # Name of the dataset before it had other states
+    if dataset not in ("rv_park", "state_park"):
+        raise ValueError("dataset must be rv_park or state_park")
+    points = [resolve_location(location) for location in locations]
+    if includeMyLocation:
+        points.insert(0, [round(coordinate,5) for coordinate in my_search_origin()])
+    if not points:
+        raise ValueError("Give at least one location")
+    return parks_near_locations(points,miles,dataset,rvOnly,includeDetails,limit,cursor)
+
+@result_cache.cached(tables=["rv_park", state_parks.table])
+def parks_near_locations(points, miles, dataset, rvOnly, includeDetails, limit, cursor):
+    if dataset == "rv_park":
+        index, where, read_details = rv_park_index, None, rv_park_details
+    else:
+        index, where, read_details = state_parks, has_rv_camping if rvOnly else None, state_parks.details
+    hits = index.within_any(points,miles,where)
+    hits.sort(key=lambda hit: min(distance for distance in hit[2] if distance is not None))
+    hits, next_cursor = page_hits(hits,[dataset,points,miles,rvOnly],limit,cursor)
+    if includeDetails:
+        details = read_details([rowid for rowid,park,distances in hits])
+    parks=[]
+    for rowid,park,distances in hits:
+        if includeDetails:
+            park=details[rowid]
+        elif dataset == "state_park":
+            del park['latitude']
+            del park['longitude']
+        park['distances']=[None if distance is None else round(distance,2) for distance in distances]
+        parks.append(park)
+    result = {"locations": points, "parks": parks}
+    if limit > 0:
+        result["nextCursor"] = next_cursor
+    return to_json(result)
+
+@mcp.tool(annotations={"readOnlyHint": True})
+@metrics.instrument
+@pool.tool()
+@result_cache.cached(tables=["rv_park"])
+def get_rv_parks_details_by_name(name: str, maxCandidates: int=3, fields:list[str]|None=None, compact:bool=False,
+                                 maxTextLength:int=MAX_TEXT_LENGTH) -> str:
     """
     Gets a detailed information about a specific RV park by name
+    If there is no exact match the closest matching RV parks are returned instead, best first,
+    each with a matchScore (0 to 1). Pick the intended park from these rather than retrying.
     Args:
         name: The name of the park   
+        maxCandidates(number, optional): Maximum parks returned when there is no exact match. Default: 3.
+        fields(array of strings, optional): Only return these park fields (distance and matchScore are always kept). Default: all.
+        compact(boolean, optional): If true parks are returned as {"columns": field names, "rows": array of value arrays}. Default: false.
+        maxTextLength(number, optional): Longer text fields are cut to this many characters, 0 for no limit. Default: 1000.
     """
-    print("get_rv_parks_details_by_name",name)
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    select =   "SELECT * FROM rv_park where name = '" + name + "'"
-    cursor.execute(select)
-    rows = cursor.fetchall()
-    conn.close()
+    rows = rows_by_name("rv_park", SQL_RV_PARK_BY_NAME, SQL_RV_PARK_BY_NAME_KEY, name)
     park = [dict(row) for row in rows]  # Convert to list of dictionaries items
-    return json.dumps(park)
+    if not park:
+        park = details_by_fuzzy_name(rv_park_name_index, rv_park_details, name, maxCandidates)
+    return to_json(park_result(park,fields,compact,maxTextLength))
 
 @mcp.tool(annotations={"readOnlyHint": True})
+@metrics.instrument
+@pool.tool()
+@result_cache.cached(tables=["US"])
 def get_location_by_name(name: str,state : str ) -> dict:
     """
     Gets the latitude and longitude of a location specified by the name and state of the location
     Use this for any locations other than finding the current location
+    If there is no exact match the closest matching name is used (in the state if possible) and the result
+    also has matchedName, matchedState, matchScore (0 to 1) and other candidates. Check the matched name rather than retrying.
     Args:
         name(string:required): The name of the town, city or geographic point of interest
         state(string:required): The US state containing the named location . This is the 2 letter abbreviated state name i.e. Pennsylvania is PA
     """
-    print("get_location_by_name",name,state)
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    select =   "SELECT * FROM US where name = LOWER('" + name + "') and state=UPPER('" + state + "')"
-    cursor.execute(select)
-    row = cursor.fetchone()
-    conn.close()
-    location = dict(row) # Convert row to dictionary item
-    del location["U"]
-    del location["name"]
-    del location["state"]
-    return location
+    rows = rows_by_name("US", SQL_LOCATION_BY_NAME, SQL_LOCATION_BY_NAME_KEY, name, state)
+    if rows:
+        location = dict(rows[0]) # Convert row to dictionary item
+        del location["U"]
+        del location["name"]
+        del location["state"]
+        return location
+    hits = location_name_index.search(name, 5, lambda place: str(place["state"]).upper() == state.upper())
+    if not hits:
+        hits = location_name_index.search(name, 5)
+    if not hits:
+        raise ValueError(f"No location named {name} found")
+    candidates = [{"name": place["name"], "state": place["state"], "latitude": place["latitude"],
+                   "longitude": place["longitude"], "matchScore": score} for rowid,place,score in hits]
+    best = candidates.pop(0)
+    return {
+        "latitude": best["latitude"],
+        "longitude": best["longitude"],
+        "matchedName": best["name"],
+        "matchedState": best["state"],
+        "matchScore": best["matchScore"],
+        "candidates": candidates
+        }
+
+@mcp.tool(annotations={"readOnlyHint": True})
+@metrics.instrument
+@pool.tool()
+def get_nearest_places_from_my_location(k: int=5, maxMiles: float=50) -> str:
+    """
+    Return the named places (towns, cities and other points of interest) closest to the current location, closest first.
+    Use this to answer "what town am I near?" or "where am I?".
+    Args:
+        k(number, optional): Number of places to return (at most 50). Default: 5.
+        maxMiles(number, optional): Only places within this many miles. Default: 50.
+    Output (array of places): name (string), state (string), latitude (number), longitude (number),
+        distance (miles), bearing (compass degrees from the current location to the place, 0 is north).
+    """
+    lat,long=my_search_origin()
+    return get_nearest_places.sync(lat,long,k,maxMiles)
+
+@mcp.tool(annotations={"readOnlyHint": True})
+@metrics.instrument
+@pool.tool()
+@result_cache.cached(tables=["US"])
+def get_nearest_places(latitude: float, longitude: float, k: int=5, maxMiles: float=50) -> str:
+    """
+    Return the named places (towns, cities and other points of interest) closest to the given latitude/longitude,
+    closest first. Use this to find what town a coordinate is in or near (not for the current location).
+    Args:
+        latitude (number, required): Decimal degrees (-90 to 90).
+        longitude (number, required): Decimal degrees (-180 to 180).
+        k(number, optional): Number of places to return (at most 50). Default: 5.
+        maxMiles(number, optional): Only places within this many miles. Default: 50.
+    Output (array of places): name (string), state (string), latitude (number), longitude (number),
+        distance (miles), bearing (compass degrees from the given point to the place, 0 is north).
+    """
+    places = []
+    for rowid,place,distance in places_index.nearest(latitude,longitude,max(1,min(k,MAX_NEAREST_PLACES)),maxMiles):
+        place['distance']=round(distance,2)
+        place['bearing']=round(bearing_between_points(latitude,longitude,place['latitude'],place['longitude']))
+        places.append(place)
+    return to_json(places)
 
 # Tool: return current UTC time
 @mcp.tool(annotations={"readOnlyHint": True})
-def get_UTC_time() -> str:
+@metrics.instrument
+async def get_UTC_time() -> str:
     """Return the current UTC date and time as an ISO 8601 string."""
-    print("get_UTC_time")
-    return datetime.now(timezone.utc).replace(tzinfo=pytz.utc).isoformat()
+    return datetime.now(timezone.utc).isoformat()
 
 # Tool: return local time by latitude & longitude
 @mcp.tool(annotations={"readOnlyHint": True})
+@metrics.instrument
+@pool.tool()
 def get_local_time() -> str:
     """
     Return the local date and time based on the current location timezone.
     Time is returned as an ISO 8601 string.
     """
-    print("get_local_time")
-    location=get_my_location()
+    location=get_my_location.sync()
     latitude=float(location.get("latitude",0))
     longitude=float(location.get("longitude",0))
-    tf = TimezoneFinder()
-    tz_name = tf.timezone_at(lng=longitude, lat=latitude)
+    return local_time_at(latitude,longitude)
+
+@mcp.tool(annotations={"readOnlyHint": True})
+@metrics.instrument
+@pool.tool()
+def get_local_time_at(latitude:float,longitude:float) -> str:
+    """
+    Return the local date and time at the given latitude/longitude, using that location's timezone.
+    Use this for any locations other than the current location.
+    Time is returned as an ISO 8601 string.
+    Args:
+        latitude (number, required): Decimal degrees (-90 to 90).
+        longitude (number, required): Decimal degrees (-180 to 180).
+    """
+    return local_time_at(latitude,longitude)
+
+def local_time_at(latitude,longitude):
+    with phase("timezone"):
+        tz_name = timezone_lookup.timezone_at(latitude,longitude)
 
     if not tz_name:
         raise ValueError("Could not determine timezone for given coordinates")
 
+    # Imported here so startup does not pay for it until needed
+    import pytz
     tz = pytz.timezone(tz_name)
     utc_now = datetime.now(timezone.utc).replace(tzinfo=pytz.utc)
     local_time = utc_now.astimezone(tz)
     return local_time.isoformat()
 
 @mcp.tool(annotations={"readOnlyHint": True})
-def get_wikipedia_url(topic: str) -> str:
+@metrics.instrument
+async def get_wikipedia_url(topic: str) -> str:
     """
-    Generates a URL linking to the local Wikipedia instance for the given search term.
+    Generates URLs linking to the articles of the local Wikipedia instance best matching the given topic.
 
     **Purpose:**
-    Use this tool whenever the user asks for wikipedia reference to the topic. The tool returns a pre-formatted,
-    ready-to-use link to the local Wikipedia mirror.
+    Use this tool whenever the user asks for wikipedia reference to the topic. The tool returns pre-formatted,
+    ready-to-use links to existing articles of the local Wikipedia mirror.
 
     **LLM Behavior:**
-    - Always include the returned URL in the response as a clickable Wikipedia link.
+    - Always include the first article URL in the response as a clickable Wikipedia link. Offer the others only if the first is clearly not the intended topic.
+    - If there are no articles, include searchUrl instead (a search of the mirror).
     - Do not alter, reformat, or append anything to the URL.
     - Do not summarize or explain the URL — just display it as-is with your answer.
-    - Format the link's text as "Wikipedia - [topic]"
+    - Format the link's text as "Wikipedia - [article title]"
 
 
     **Arguments:**
         topic (str): The term or topic to look up.
 
     **Returns:**
-        str: A fully URL-encoded link to the local Wikipedia instance.
+        str: JSON {"articles": array of {"title": string, "url": string}, best match first}
+             or, when no article title matches, {"articles": [], "searchUrl": string}.
     """
-    return "http://piai.local:8080/viewer#search?books.name=wikipedia_en_all_maxi_2025-08&pattern=" + urllib.parse.quote(topic)
+    return kiwix_articles(wikipedia_titles, WIKIPEDIA_BOOK, topic)
 
 @mcp.tool(annotations={"readOnlyHint": True})
-def get_wikihow_url(topic:str) -> str:
+@metrics.instrument
+async def get_wikihow_url(topic:str) -> str:
     """
-    Generates a wikihow URL linking to the local Wikihow instance for the given search term.
+    Generates wikihow URLs linking to the articles of the local Wikihow instance best matching the given topic.
 
     **Purpose:**
-    Use this tool whenever the user asks for wikihow reference to the topic or specifically asks "How do I [topic]". The tool returns a pre-formatted,
-    ready-to-use link.
+    Use this tool whenever the user asks for wikihow reference to the topic or specifically asks "How do I [topic]". The tool returns pre-formatted,
+    ready-to-use links to existing articles.
 
     **LLM Behavior:**
-    - Show the user the wikihow url. Keep the rest of the response very short.
+    - Show the user the first article url (or searchUrl if there are no articles). Keep the rest of the response very short.
     - Do not alter, reformat, or append anything to the URL.
     - Do not summarize or explain the URL — just display it as-is with your answer.
-    - Format the link's text as "Wikihow - [topic]"
+    - Format the link's text as "Wikihow - [article title]"
 
 
     **Arguments:**
         topic (str): The term or topic to look up.
 
     **Returns:**
-        str: A fully URL-encoded link to the local Wikihow instance.
+        str: JSON {"articles": array of {"title": string, "url": string}, best match first}
+             or, when no article title matches, {"articles": [], "searchUrl": string}.
+    """
+    return kiwix_articles(wikihow_titles, WIKIHOW_BOOK, topic)
+
+def kiwix_articles(titles, book, topic):
+    """Links to the articles of book best matching topic, or a search of the book when none matches."""
+    with phase("file"):
+        articles = titles.lookup(topic)
+    if not articles:
+        return to_json({"articles": [], "searchUrl": f"{KIWIX_URL}/viewer#search?books.name={book}&pattern="
+                                                     + urllib.parse.quote(topic)})
+    return to_json({"articles": [{"title": title, "url": f"{KIWIX_URL}/viewer#{book}/" + urllib.parse.quote(path)}
+                                 for path, title in articles]})
+
+@mcp.tool(annotations={"readOnlyHint": True})
+async def get_server_stats() -> dict:
+    """
+    Return this server's own performance counters: per tool call counts, errors, latency,
+    time spent in the database, files, timezone lookup and serialization, rows scanned
+    against rows returned, response sizes, result cache hit rates and the database version.
+    Only use this when asked about the MCP server itself.
+    """
+    return server_stats()
+
+def server_stats():
+    return {**metrics.summary(), "resultCache": result_cache.stats(), "startupMs": startup.summary(),
+            "prefetch": prefetcher.stats(), "stateParks": state_parks.stats(),
+            "database": {"version": db.version,
+                         "indexUpdates": {"rv_park": dict(rv_park_index.updates), "US": dict(places_index.updates),
+                                          "rv_park_names": dict(rv_park_name_index.updates),
+                                          "US_names": dict(location_name_index.updates)}}}
+
+@mcp.custom_route("/stats", methods=["GET"])
+async def stats(request: Request) -> JSONResponse:
+    """Server counters (not a tool), e.g. curl http://localhost:8100/stats"""
+    return JSONResponse(server_stats())
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """Prometheus scrape endpoint, e.g. curl http://localhost:8100/metrics"""
+    cache = result_cache.stats()
+    lines = [metrics.prometheus(),
+             "# TYPE mcpscamp_result_cache_hits_total counter\n",
+             f"mcpscamp_result_cache_hits_total {cache['hits']}\n",
+             "# TYPE mcpscamp_result_cache_misses_total counter\n",
+             f"mcpscamp_result_cache_misses_total {cache['misses']}\n",
+             "# TYPE mcpscamp_result_cache_entries gauge\n",
+             f"mcpscamp_result_cache_entries {cache['entries']}\n"]
+    return PlainTextResponse("".join(lines), media_type="text/plain; version=0.0.4")
+
+def warm_up():
+    """
+    Build the indexes and timezone data in a background thread, most used first, then
+    start the prefetcher. Returns the thread (also used by benchmarks/bench_suite.py). A tool call arriving
+    first waits for (or builds) the index it needs. A missing or broken DB is
+    reported here and retried on the first search.
     """
-    return "http://piai.local:8080/viewer#search?books.name=wikihow_en_maxi_2022-12&pattern=" + urllib.parse.quote(topic)
+    def run():
+        steps = [("rv_park_index", rv_park_index.warm_up), ("state_park_index", state_parks.warm_up),
+                 ("timezones", timezone_lookup.warm_up), ("places_index", places_index.warm_up),
+                 ("state_park_name_index", state_parks.name_index.warm_up),
+                 ("rv_park_name_index", rv_park_name_index.warm_up),
+                 ("location_name_index", location_name_index.warm_up)]
+        for step, warm_up_step in steps:
+            try:
+                warm_up_step(background=False)
+            except sqlite3.Error as e:
+                log.error("could not build %s: %s", step, e)
+            startup.mark(step)
+        prefetcher.start()
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+async def serve():
+    """Run the streamable-http server, warming up once the port is listening."""
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(mcp.streamable_http_app(), host=mcp.settings.host,
+                                           port=mcp.settings.port, log_level=mcp.settings.log_level.lower()))
+
+    async def warm_up_when_listening():
+        while not server.started:
+            await anyio.sleep(0.01)
+        startup.mark("listening")
+        warm_up()
+
+    async with anyio.create_task_group() as tasks:
+        tasks.start_soon(warm_up_when_listening)
+        await server.serve()
+        tasks.cancel_scope.cancel()
+
+startup.mark("tools")
 
 if __name__ == '__main__':
-    # print(get_location_by_name('Blue Bell',"pa"))
-    # print(get_location())
-    # print(get_state_parks_by_distance_from_my_location(10,rvOnly=False,includeDetails=True))
-    # print(get_rv_parks_by_distance_from_my_location(10,includeDetails=False))
-    # print(get_wikipedia_url("model context protocol"))
-    mcp.run(transport="streamable-http")
+    anyio.run(serve)
@@ -0,0 +1,270 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+# Latency histogram bucket upper bounds in seconds (Prometheus style, plus +Inf)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Where a tool call's time goes
+PHASES = ("db", "file", "timezone", "serialization")
+
+log = logging.getLogger("mcpScamp")
+
+# Per call counters of the tool call running in this context (None outside a tool call)
+_current = contextvars.ContextVar("current_call", default=None)
+
+
+class _Call:
+    __slots__ = ("phases", "rows_scanned", "rows_returned")
+
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.rows_scanned = 0
+        self.rows_returned = 0
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Count the time of the with block against the current tool call's phase (db, file, timezone, serialization)."""
+    call = _current.get()
+    if call is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        call.phases[name] += time.perf_counter() - start
+
+
+def count_rows(scanned, returned):
+    """Record rows looked at and rows kept by the current tool call."""
+    call = _current.get()
+    if call is not None:
+        call.rows_scanned += scanned
+        call.rows_returned += returned
+
+
+class _ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.rows_scanned = 0
+        self.rows_returned = 0
+        self.response_bytes = 0
+        self.max_response_bytes = 0
+
+
+class Metrics:
+    """
+    Per tool call counts, latency histograms, time per phase, rows scanned
+    against rows returned and response sizes.
+
+    instrument() wraps an async tool handler; code running inside the call,
+    including on the worker pool threads, reports through phase() and count_rows().
+    Exported in Prometheus text format and as a JSON summary.
+    """
+
+    def __init__(self):
+        self._tools = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def instrument(self, fn):
+        """Decorator recording every call of an async tool handler."""
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        async def handler(*args, **kwargs):
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("tool=%s args=%s kwargs=%s", name, args, kwargs)
+            call = _Call()
+            token = _current.set(call)
+            start = time.perf_counter()
+            error = False
+            result = None
+            try:
+                result = await fn(*args, **kwargs)
+                return result
+            except Exception:
+                error = True
+                log.warning("tool=%s failed", name, exc_info=True)
+                raise
+            finally:
+                _current.reset(token)
+                self._record(name, call, time.perf_counter() - start, error, result)
+
+        return handler
+
+    def _record(self, name, call, elapsed, error, result):
+        if isinstance(result, str):
+            size = len(result)
+        elif result is None:
+            size = 0
+        else:
+            size = len(json.dumps(result, default=str))
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), len(LATENCY_BUCKETS))
+        with self._lock:
+            stats = self._tools.get(name)
+            if stats is None:
+                stats = self._tools[name] = _ToolStats()
+            stats.calls += 1
+            stats.errors += error
+            stats.buckets[bucket] += 1
+            stats.latency += elapsed
+            for phase_name, seconds in call.phases.items():
+                stats.phases[phase_name] += seconds
+            stats.rows_scanned += call.rows_scanned
+            stats.rows_returned += call.rows_returned
+            stats.response_bytes += size
+            stats.max_response_bytes = max(stats.max_response_bytes, size)
+
+    def summary(self):
+        """JSON friendly per tool summary. Percentiles are histogram bucket upper bounds."""
+        with self._lock:
+            tools = {}
+            for name, stats in sorted(self._tools.items()):
+                tools[name] = {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "avgMs": round(stats.latency / stats.calls * 1000, 2),
+                    "p50MsAtMost": _percentile_bound(stats.buckets, 0.50),
+                    "p95MsAtMost": _percentile_bound(stats.buckets, 0.95),
+                    "p99MsAtMost": _percentile_bound(stats.buckets, 0.99),
+                    "phaseMs": {p: round(s * 1000, 2) for p, s in stats.phases.items()},
+                    "rowsScanned": stats.rows_scanned,
+                    "rowsReturned": stats.rows_returned,
+                    "avgResponseBytes": round(stats.response_bytes / stats.calls),
+                    "maxResponseBytes": stats.max_response_bytes,
+                }
+        return {"uptimeSeconds": round(time.time() - self.started), "tools": tools}
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format, each family grouped after its TYPE line."""
+        with self._lock:
+            tools = [(f'tool="{name}"', stats) for name, stats in sorted(self._tools.items())]
+            lines = []
+            for family, kind, samples in _FAMILIES:
+                lines.append(f"# TYPE {family} {kind}")
+                for tool, stats in tools:
+                    lines += [f"{family}{suffix}{{{labels}}} {value}" for suffix, labels, value in samples(tool, stats)]
+        return "\n".join(lines) + "\n"
+
+
+def _latency_samples(tool, stats):
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.buckets):
+        cumulative += count
+        yield "_bucket", f'{tool},le="{bound}"', cumulative
+    yield "_sum", tool, f"{stats.latency:.6f}"
+    yield "_count", tool, stats.calls
+
+
+# (family, type, samples(tool label, stats) -> (name suffix, labels, value)) of the Prometheus output
+_FAMILIES = (
+    ("mcpscamp_tool_calls_total", "counter", lambda tool, stats: [("", tool, stats.calls)]),
+    ("mcpscamp_tool_errors_total", "counter", lambda tool, stats: [("", tool, stats.errors)]),
+    ("mcpscamp_tool_latency_seconds", "histogram", _latency_samples),
+    ("mcpscamp_tool_phase_seconds_total", "counter",
+     lambda tool, stats: [("", f'{tool},phase="{name}"', f"{seconds:.6f}") for name, seconds in stats.phases.items()]),
+    ("mcpscamp_tool_rows_scanned_total", "counter", lambda tool, stats: [("", tool, stats.rows_scanned)]),
+    ("mcpscamp_tool_rows_returned_total", "counter", lambda tool, stats: [("", tool, stats.rows_returned)]),
+    ("mcpscamp_tool_response_bytes_total", "counter", lambda tool, stats: [("", tool, stats.response_bytes)]),
+)
+
+
+def _percentile_bound(buckets, fraction):
+    total = sum(buckets)
+    if total == 0:
+        return None
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, buckets):
+        cumulative += count
+        if cumulative >= fraction * total:
+            return bound * 1000
+    return None  # Above the largest bucket
+
+
+def _process_age():
+    """Seconds since this process was started (from /proc on Linux), None when unknown."""
+    try:
+        with open("/proc/self/stat") as f:
+            # The fields after the (command name); starttime, in clock ticks after boot, is field 22
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupTimer:
+    """
+    Time from the process start to each startup step (imports, tool registration,
+    port listening, each warm-up step) in milliseconds, to check time to first
+    response after a restart. Times count from the process start when /proc
+    tells it (10 ms resolution), otherwise from the creation of the timer.
+    """
+
+    def __init__(self):
+        self._origin = time.perf_counter() - (_process_age() or 0.0)
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    def mark(self, step):
+        """Record that step has just finished."""
+        elapsed = round((time.perf_counter() - self._origin) * 1000, 1)
+        with self._lock:
+            self.steps[step] = elapsed
+        log.info("startup step=%s ms=%.0f", step, elapsed)
+
+    def summary(self):
+        with self._lock:
+            return dict(self.steps)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most burst records of each message template through per interval seconds.
+    The next record let through reports how many were suppressed.
+    """
+
+    def __init__(self, burst=20, interval=60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                window = self._windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+            return True
+
+
+def setup_logging(level="WARNING"):
+    """key=value style log lines on stderr (journald under systemd), rate limited per message."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("level=%(levelname)s logger=%(name)s thread=%(threadName)s %(message)s"))
+    handler.addFilter(RateLimitFilter())
+    log.addHandler(handler)
+    log.setLevel(level)
+    log.propagate = False
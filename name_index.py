@@ -0,0 +1,258 @@
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+import index_snapshot
+from metrics import count_rows
+from row_store import RowStore
+from scamp_db import state_of
+
+# Candidates scoring below this (Dice coefficient of the name trigrams) are not returned
+MIN_SCORE = 0.3
+# A new database version changing at most this fraction of the rows patches the
+# postings (trigrams of the changed names only), more is a full rebuild
+MAX_PATCH_FRACTION = 0.2
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(name):
+    """Lower case, with punctuation and repeated spaces collapsed to one space."""
+    return _NON_WORD.sub(" ", name.lower()).strip()
+
+
+def trigrams(name):
+    """The set of character trigrams of a normalized name, padded so word starts and ends count."""
+    padded = "  " + name + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    In-memory trigram index over the name column of one table, for fuzzy name lookups.
+
+    Each name is split into character trigrams and every trigram keeps the
+    array of rows containing it. A lookup counts the shared trigrams of all
+    rows in one numpy bincount and ranks them by Dice similarity, so a
+    slightly wrong name still finds its row in a single call. The first
+    column is the name; the light columns of every row are kept in memory
+    (in a compact RowStore).
+    Like SpatialIndex, the index is brought up to date on the next lookup
+    whenever the database generation changes (kept, patched with the changed
+    names or rebuilt, the previous generation's kept for pinned calls), or
+    memory-mapped from snapshot_dir (see index_snapshot.py) when it was saved
+    there for the same database file.
+    """
+
+    def __init__(self, db, table, columns, snapshot_dir=None):
+        self.db = db
+        self.table = table
+        self.columns = columns
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        # _States of the newest generation and the one before, swapped as one list
+        self._states = []
+        # Updates to a new generation by kind: "built", "patched" or "unchanged"
+        self.updates = {"built": 0, "patched": 0, "unchanged": 0}
+
+    def build(self):
+        """(Re)load the names from the database and rebuild the index."""
+        with self._lock:
+            self._states = [self._build()]
+            self.updates["built"] += 1
+
+    def warm_up(self, background=True):
+        """Build the index (unless it is current) in a background thread, or in this one."""
+        if not background:
+            self._ensure_current()
+            return
+        threading.Thread(target=self._ensure_current, name=f"{self.table}-name-index", daemon=True).start()
+
+    def _ensure_current(self):
+        """The _State for the calling thread's database generation, updating the index when it is newer."""
+        generation = self.db.generation
+        state = state_of(self._states, generation)
+        if state is None:
+            with self._lock:
+                state = state_of(self._states, generation)
+                if state is None:
+                    state = self._update(self._states[-1] if self._states else None)
+                    self._states = (self._states + [state])[-2:]
+        return state
+
+    def _update(self, previous):
+        """The _State of the current generation, from the previous one when the changes since allow."""
+        changes = None if previous is None else self.db.changes(previous.version)
+        changed = None if changes is None else changes.get(self.table, set())
+        if changed is not None and not changed:
+            self.updates["unchanged"] += 1
+            return _State(self.db.generation, self.db.version, previous.snapshot)
+        if changed is not None and len(changed) <= len(previous.snapshot.rowids) * MAX_PATCH_FRACTION:
+            rows = self._load(sorted(changed))
+            snapshot = previous.snapshot.patched(np.array(sorted(changed), dtype=np.int64), rows,
+                                                 rows.column(rows.names[1]))
+            self._save(snapshot)
+            self.updates["patched"] += 1
+            return _State(self.db.generation, self.db.version, snapshot)
+        self.updates["built"] += 1
+        return self._build()
+
+    def _build(self):
+        generation = self.db.generation
+        version = self.db.version
+        key = self._snapshot_key()
+        if key is not None:
+            saved = index_snapshot.load(self._snapshot_path(), key)
+            if saved is not None:
+                return _State(generation, version, _Snapshot.mapped(*saved))
+        rows = self._load()
+        # Names by position: column names keep the table's own case (Name in rv_park)
+        snapshot = _Snapshot.build(rows, rows.column(rows.names[1]))
+        self._save(snapshot)
+        return _State(generation, version, snapshot)
+
+    def _load(self, rowids=None):
+        """The named rows of the table, or of the given rowids only."""
+        cursor = self.db.connection().cursor()
+        cursor.row_factory = None
+        sql = ("SELECT rowid AS _rowid, " + ",".join(self.columns) + " FROM " + self.table +
+               " WHERE " + self.columns[0] + " IS NOT NULL")
+        if rowids is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql + " AND rowid IN (SELECT value FROM json_each(?))", (json.dumps(rowids),))
+        return RowStore.load(cursor)
+
+    def _snapshot_key(self):
+        signature = self.db.file_signature()
+        if self.snapshot_dir is None or signature is None:
+            return None
+        return {"db": list(signature), "table": self.table, "columns": self.columns}
+
+    def _save(self, snapshot):
+        key = self._snapshot_key()
+        if key is not None:
+            index_snapshot.save(self._snapshot_path(), key, *snapshot.dump())
+
+    def _snapshot_path(self):
+        return os.path.join(self.snapshot_dir, self.table + ".names")
+
+    def search(self, name, limit=5, where=None):
+        """
+        Return up to limit [(rowid, row, score)] best matching name, best first.
+        score is 1.0 when the name trigrams match exactly. where is an optional predicate on a row.
+        """
+        snapshot = self._ensure_current().snapshot
+        query = trigrams(normalize_name(name))
+        postings = [snapshot.postings[t] for t in query if t in snapshot.postings]
+        if not postings:
+            return []
+        counts = np.bincount(np.concatenate(postings), minlength=len(snapshot.rows))
+        positions = np.flatnonzero(counts)
+        scanned = len(positions)
+        scores = 2.0 * counts[positions] / (len(query) + snapshot.sizes[positions])
+        keep = scores >= MIN_SCORE
+        positions, scores = positions[keep], scores[keep]
+        # Best first, ties in table order
+        order = np.lexsort((snapshot.rowids[positions], -scores))
+        hits = []
+        for i in order.tolist():
+            row = snapshot.rows[positions[i]]
+            if where is not None and not where(row):
+                continue
+            hits.append((row.pop("_rowid"), row, round(float(scores[i]), 3)))
+            if len(hits) >= limit:
+                break
+        count_rows(scanned, len(hits))
+        return hits
+
+
+class _State:
+    """The index at one database generation."""
+
+    def __init__(self, generation, version, snapshot):
+        self.generation = generation
+        self.version = version
+        self.snapshot = snapshot
+
+
+class _Snapshot:
+    """Postings of one index build: trigram -> array of row positions, plus trigram count per row."""
+
+    def __init__(self, rows, postings, sizes):
+        self.rows = rows
+        self.postings = postings
+        self.sizes = sizes
+        self.rowids = np.asarray(rows.column("_rowid"), dtype=np.int64)
+
+    def dump(self):
+        """(meta, arrays, blobs) for index_snapshot.save, the postings as one array with offsets."""
+        meta, arrays, blobs = self.rows.dump("row")
+        grams, offsets, postings = self._flat()
+        arrays.update(sizes=self.sizes, offsets=offsets, postings=postings)
+        blobs["grams"] = json.dumps(grams).encode("utf-8")
+        return meta, arrays, blobs
+
+    def _flat(self):
+        """(grams, offsets, postings): the postings of every gram as one array, gram i at offsets[i]:offsets[i + 1]."""
+        grams = list(self.postings)
+        lengths = [len(self.postings[gram]) for gram in grams]
+        return (grams, np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))),
+                np.concatenate([self.postings[gram] for gram in grams] or [np.empty(0, np.int32)]))
+
+    @classmethod
+    def mapped(cls, meta, arrays, blobs):
+        """A snapshot saved by dump(), memory-mapped."""
+        grams = json.loads(bytes(blobs["grams"]))
+        return cls(RowStore.mapped(meta, arrays, blobs), _postings(grams, arrays["offsets"], arrays["postings"]),
+                   arrays["sizes"])
+
+    @classmethod
+    def build(cls, rows, names):
+        postings = {}
+        sizes = np.empty(len(rows), dtype=np.int32)
+        for position, name in enumerate(names):
+            grams = trigrams(normalize_name(str(name)))
+            sizes[position] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+        return cls(rows, postings, sizes)
+
+    def patched(self, changed, rows, names):
+        """
+        This snapshot without the rows of the changed rowids, plus the given (reread) rows
+        after the others. Only the new names are split into trigrams, the postings of the
+        kept rows are renumbered with numpy.
+        """
+        kept = ~np.isin(self.rowids, changed)
+        renumbered = np.cumsum(kept) - 1
+        added = _Snapshot.build(rows, names)
+        grams, offsets, postings = self._flat()
+        gram_numbers = {gram: i for i, gram in enumerate(grams)}
+        for gram in added.postings:
+            gram_numbers.setdefault(gram, len(gram_numbers))
+        # (gram number, position) pairs of the kept rows then the added ones, sorted by gram
+        old_grams = np.repeat(np.arange(len(grams), dtype=np.int64), np.diff(offsets))
+        alive = kept[postings]
+        new_grams = [np.full(len(positions), gram_numbers[gram], dtype=np.int64)
+                     for gram, positions in added.postings.items()]
+        new_positions = [positions.astype(np.int64) + int(kept.sum()) for positions in added.postings.values()]
+        all_grams = np.concatenate([old_grams[alive]] + new_grams)
+        all_positions = np.concatenate([renumbered[postings[alive]]] + new_positions)
+        # Stable: the kept positions of each gram stay ascending, the added ones (all higher) after them
+        order = np.argsort(all_grams, kind="stable")
+        counts = np.bincount(all_grams, minlength=len(gram_numbers))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        return _Snapshot(RowStore.concat([(self.rows, np.flatnonzero(kept)), (rows, np.arange(len(rows)))]),
+                         _postings(list(gram_numbers), offsets, all_positions[order].astype(np.int32)),
+                         np.concatenate((self.sizes[kept], added.sizes)))
+
+
+def _postings(grams, offsets, postings):
+    """The gram -> positions dict of flat postings (see _Snapshot._flat), gram without positions left out."""
+    offsets = offsets.tolist()
+    return {gram: postings[offsets[i]:offsets[i + 1]] for i, gram in enumerate(grams) if offsets[i + 1] > offsets[i]}
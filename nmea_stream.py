@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+from functools import reduce
+from operator import xor
+
+# Longest valid NMEA 0183 sentence is 82 bytes; anything much longer without a
+# line end is noise and is dropped
+MAX_SENTENCE = 256
+# Sentence types gpsLogger.py uses, from any talker (GP, GN, GL, GA, BD, ...)
+DEFAULT_TYPES = (b"RMC", b"GGA")
+
+
+class NmeaFramer:
+    """
+    Splits a raw byte stream from the receiver into checked NMEA sentences.
+
+    Bytes are buffered and cut on line ends, and the sentence type is checked
+    (a slice compare, talker ignored) before the checksum is verified or
+    anything is decoded, so unwanted sentences cost almost nothing. Noise,
+    truncated sentences and bad checksums are counted and skipped; they never
+    raise, so the serial port does not need to be reopened.
+    """
+
+    def __init__(self, types=DEFAULT_TYPES):
+        self.types = frozenset(types)
+        self._pending = b""
+        self.sentences = 0
+        self.skipped = 0
+        self.bad = 0
+
+    def feed(self, data):
+        """Add received bytes and return the complete wanted sentences as (type, fields) with str fields."""
+        lines = (self._pending + data).split(b"\n")
+        pending = lines.pop()
+        if len(pending) > MAX_SENTENCE:
+            # No line end for too long, keep only from the last possible sentence start
+            dollar = pending.rfind(b"$")
+            pending = pending[dollar:] if dollar > 0 else b""
+            self.bad += 1
+        self._pending = pending
+        sentences = []
+        types = self.types
+        for line in lines:
+            dollar = line.rfind(b"$")
+            if dollar < 0:
+                self.bad += 1
+                continue
+            if line[dollar + 3:dollar + 6] not in types:
+                self.skipped += 1
+                continue
+            star = line.find(b"*", dollar)
+            body = line[dollar + 1:star]
+            try:
+                if star < 0 or reduce(xor, body, 0) != int(line[star + 1:star + 3], 16):
+                    self.bad += 1
+                    continue
+                fields = body.decode("ascii").split(",")
+            except (ValueError, UnicodeDecodeError):
+                self.bad += 1
+                continue
+            self.sentences += 1
+            sentences.append((fields[0][2:], fields))
+        return sentences
+
+
+def _degrees(value, hemisphere):
+    if not value:
+        return None
+    dot = value.find(".")
+    degrees_len = (dot if dot >= 0 else len(value)) - 2
+    degrees = float(value[:degrees_len]) + float(value[degrees_len:]) / 60
+    return -degrees if hemisphere in ("S", "W") else degrees
+
+
+def _float(value):
+    return float(value) if value else None
+
+
+def _int(value):
+    return int(value) if value else None
+
+
+def parse_rmc(fields):
+    """
+    Fields of an RMC sentence as a dict (datetime, latitude, longitude, speed_knots, course),
+    or None if the receiver has no valid fix.
+    """
+    try:
+        if len(fields) < 10 or fields[2] != "A" or not fields[1] or not fields[9]:
+            return None
+        time_field = fields[1]
+        date_field = fields[9]
+        seconds = float(time_field[4:])
+        fix_time = datetime(2000 + int(date_field[4:6]), int(date_field[2:4]), int(date_field[0:2]),
+                            int(time_field[0:2]), int(time_field[2:4]), int(seconds),
+                            int((seconds % 1) * 1e6), tzinfo=timezone.utc)
+        return {
+            "datetime": fix_time,
+            "latitude": _degrees(fields[3], fields[4]),
+            "longitude": _degrees(fields[5], fields[6]),
+            "speed_knots": _float(fields[7]),
+            "course": _float(fields[8])
+        }
+    except ValueError:
+        return None
+
+
+def parse_gga(fields):
+    """Fields of a GGA sentence as a dict (gps_qual, num_sats, altitude), or None if malformed."""
+    try:
+        if len(fields) < 10:
+            return None
+        return {
+            "gps_qual": _int(fields[6]),
+            "num_sats": _int(fields[7]),
+            "altitude": _float(fields[9])
+        }
+    except ValueError:
+        return None
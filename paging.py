@@ -0,0 +1,64 @@
+import base64
+import hashlib
+import json
+
+
+def _query_hash(query):
+    return hashlib.sha1(json.dumps(query).encode("utf-8")).hexdigest()[:12]
+
+
+def encode_cursor(query, offset):
+    """Make an opaque cursor for the page starting at offset of the given query."""
+    token = json.dumps({"q": _query_hash(query), "o": offset})
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, query):
+    """Return the offset stored in a cursor, checking it was issued for the same query."""
+    if not cursor:
+        return 0
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset = int(token["o"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if token.get("q") != _query_hash(query) or offset < 0:
+        raise ValueError("Cursor does not belong to this search, repeat the search without a cursor")
+    return offset
+
+
+def page_hits(hits, query, limit=0, cursor=""):
+    """Return (page, next_cursor) of a full list of hits: every hit when there is no limit."""
+    if limit <= 0:
+        return hits, None
+    offset = decode_cursor(cursor, query)
+    page = hits[offset:offset + limit]
+    next_cursor = encode_cursor(query, offset + limit) if len(hits) > offset + limit else None
+    return page, next_cursor
+
+
+def find_hits(index, latitude, longitude, miles, query, limit=0, sort_by_distance=False, cursor="", where=None):
+    """
+    Run a radius search on a SpatialIndex and return (hits, next_cursor).
+
+    Without a limit every hit is returned (table order, or closest first when
+    sort_by_distance). With a limit one page is returned plus the cursor of the
+    next page (None on the last page). Sorted pages use the index's widening
+    nearest search, so "the closest 5" does not scan the whole radius.
+    query identifies the search (all the arguments that change the results)
+    and ties cursors to it.
+    """
+    offset = decode_cursor(cursor, query)
+    if limit <= 0:
+        hits = index.within(latitude, longitude, miles, where)
+        if sort_by_distance:
+            hits.sort(key=lambda hit: hit[2])
+        return hits, None
+    if sort_by_distance:
+        # One extra hit tells us whether there is a next page
+        hits = index.nearest(latitude, longitude, offset + limit + 1, miles, where)
+    else:
+        hits = index.within(latitude, longitude, miles, where)
+    page = hits[offset:offset + limit]
+    next_cursor = encode_cursor(query, offset + limit) if len(hits) > offset + limit else None
+    return page, next_cursor
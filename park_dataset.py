@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from geo import lat_lon_range, lon_ranges, route_pieces
+from name_index import NameIndex, normalize_name
+from scamp_db import ScampDB
+from scamp_schema import DIRECTORY_FILE, MANIFEST_FILE, NAME_COLUMNS, SHARD_BITS, name_key_table, park_id
+from spatial_index import MAX_REGIONS, ROUTE_PIECE_MILES, SpatialIndex
+
+# Shards kept open (read-only connections and spatial index) at once, least recently used closed first
+MAX_OPEN_SHARDS = 8
+
+
+class ParkDataset:
+    """
+    One kind of park (e.g. state parks) stored in region shard files, searched like
+    a SpatialIndex (within, nearest, along_route, within_any, prefetch) with
+    details and name lookups on top.
+
+    The shards directory holds a scamp.db shaped file per region (see
+    build_db.build_shards), MANIFEST_FILE with each shard's bounding box and
+    DIRECTORY_FILE with the name columns of every park. A search only opens the
+    shards whose bounding box meets the searched area (their own connection and
+    spatial index, memory-mapped from snapshot_dir when saved there), and at most
+    max_open_shards stay open, so memory and build time follow the area searched
+    rather than the size of the national dataset. Name lookups use the directory,
+    then read the details from the one shard holding each park.
+
+    Park ids are park_id(shard number, rowid in the shard), so hits of different
+    shards never collide and sort by shard, then table order. Without a shards
+    directory the dataset is table of db as its only shard (ids are the rowids).
+    The manifest is reloaded when its file changes (written last by a rebuild),
+    which advances generation.
+    """
+
+    def __init__(self, db, table, columns, directory=None, max_open_shards=MAX_OPEN_SHARDS, snapshot_dir=None):
+        self.db = db
+        self.table = table
+        self.columns = columns
+        self.directory = directory
+        self.max_open_shards = max_open_shards
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        self._open = OrderedDict()
+        self._manifest_signature = None
+        self._manifest_generation = 0
+        self._shards = []
+        self._regions = []
+        self.opened = 0
+        self.evicted = 0
+        if directory is None:
+            self.names_db = db
+            self._shards = [_Shard(0, table, None, None)]
+            self._open[0] = SpatialIndex(db, table, columns, snapshot_dir=snapshot_dir)
+        else:
+            self.names_db = ScampDB(os.path.join(directory, DIRECTORY_FILE))
+        self.name_index = NameIndex(self.names_db, table, NAME_COLUMNS[table], snapshot_dir=snapshot_dir)
+
+    def _current_shards(self):
+        """The shards of the manifest, reloaded (closing the open shards) when the file has changed."""
+        if self.directory is None:
+            return self._shards
+        manifest_file = os.path.join(self.directory, MANIFEST_FILE)
+        try:
+            st = os.stat(manifest_file)
+            signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            signature = None
+        if signature != self._manifest_signature:
+            with self._lock:
+                if signature != self._manifest_signature:
+                    shards = []
+                    if signature is not None:
+                        with open(manifest_file) as f:
+                            manifest = json.load(f)
+                        shards = [_Shard(number, shard["name"], os.path.join(self.directory, shard["file"]),
+                                         shard.get("bbox")) for number, shard in enumerate(manifest["shards"])]
+                    self._shards = shards
+                    self._open.clear()
+                    self._manifest_signature = signature
+                    self._manifest_generation += 1
+        return self._shards
+
+    @property
+    def generation(self):
+        """Number of manifest loads, so results cached from the shards are dropped when they are replaced."""
+        self._current_shards()
+        return self._manifest_generation
+
+    def _index(self, shard):
+        """The spatial index of a shard, opening the shard (and closing the least recently used one) if needed."""
+        with self._lock:
+            index = self._open.get(shard.number)
+            if index is not None:
+                self._open.move_to_end(shard.number)
+                return index
+            snapshot_dir = None if self.snapshot_dir is None else os.path.join(self.snapshot_dir, shard.name)
+            index = self._open[shard.number] = SpatialIndex(ScampDB(shard.file), self.table, self.columns,
+                                                            snapshot_dir=snapshot_dir)
+            self.opened += 1
+            while len(self._open) > self.max_open_shards:
+                # Searches still running on it keep their reference, its connections close with it
+                self._open.popitem(last=False)
+                self.evicted += 1
+            return index
+
+    def _shards_in_circles(self, circles):
+        """Shards whose bounding box meets the bounding box of any (latitude, longitude, miles) circle."""
+        boxes = []
+        for latitude, longitude, miles in circles:
+            min_lat, max_lat, min_lon, max_lon = lat_lon_range(latitude, longitude, miles)
+            boxes += [(min_lat, max_lat, lon_from, lon_to) for lon_from, lon_to in lon_ranges(min_lon, max_lon)]
+        return [shard for shard in self._current_shards() if any(shard.meets(box) for box in boxes)]
+
+    def within(self, latitude, longitude, miles, where=None):
+        """[(id, row, distance_miles)] within miles of the point in id order, like SpatialIndex.within."""
+        hits = []
+        for shard in self._shards_in_circles([(latitude, longitude, miles)]):
+            hits += [(shard.id(rowid), row, distance)
+                     for rowid, row, distance in self._index(shard).within(latitude, longitude, miles, where)]
+        return hits
+
+    def nearest(self, latitude, longitude, k, max_miles, where=None):
+        """The k closest [(id, row, distance_miles)] within max_miles, closest first, like SpatialIndex.nearest."""
+        hits = []
+        for shard in self._shards_in_circles([(latitude, longitude, max_miles)]):
+            hits += [(shard.id(rowid), row, distance)
+                     for rowid, row, distance in self._index(shard).nearest(latitude, longitude, k, max_miles, where)]
+        hits.sort(key=lambda hit: hit[2])
+        return hits[:k]
+
+    def along_route(self, points, miles, where=None, piece_miles=ROUTE_PIECE_MILES):
+        """[(id, row, distance_miles, route_miles)] along the route, like SpatialIndex.along_route."""
+        circles = [(mid_latitude, mid_longitude, length / 2 + miles)
+                   for _, _, mid_latitude, mid_longitude, _, length in route_pieces(points, piece_miles)]
+        hits = []
+        for shard in self._shards_in_circles(circles):
+            found = self._index(shard).along_route(points, miles, where, piece_miles)
+            hits += [(shard.id(rowid), row, distance, route_miles) for rowid, row, distance, route_miles in found]
+        hits.sort(key=lambda hit: (hit[3], hit[0]))
+        return hits
+
+    def within_any(self, points, miles, where=None):
+        """[(id, row, distances)] within miles of any point in id order, like SpatialIndex.within_any."""
+        hits = []
+        for shard in self._shards_in_circles([(latitude, longitude, miles) for latitude, longitude in points]):
+            hits += [(shard.id(rowid), row, distances)
+                     for rowid, row, distances in self._index(shard).within_any(points, miles, where)]
+        return hits
+
+    def details(self, ids):
+        """Full rows of the parks with the given ids, as a dict keyed on id."""
+        by_shard = {}
+        for park in ids:
+            by_shard.setdefault(park >> SHARD_BITS, []).append(park & ((1 << SHARD_BITS) - 1))
+        shards = self._current_shards()
+        details = {}
+        for number, rowids in by_shard.items():
+            if number >= len(shards):
+                continue
+            index = self._index(shards[number])
+            rows = index.db.query(f"SELECT rowid AS _rowid, * FROM {self.table} "
+                                  f"WHERE rowid IN (SELECT value FROM json_each(?))", (json.dumps(rowids),))
+            for row in rows:
+                park = dict(row)
+                details[park_id(number, park.pop("_rowid"))] = park
+        return details
+
+    def ids_by_name(self, name):
+        """Ids of the parks named name (ignoring case and punctuation when the names have a name key table)."""
+        if self.names_db.columns(name_key_table(self.table)):
+            rows = self.names_db.query(f"SELECT id FROM {name_key_table(self.table)} WHERE name_key = ? ORDER BY id",
+                                       (normalize_name(name),))
+        else:
+            rows = self.names_db.query(f"SELECT rowid FROM {self.table} WHERE name = ?", (name,))
+        return [row[0] for row in rows]
+
+    def prefetch(self, latitude, longitude, miles):
+        """Open the shards around the point and prefetch the region in each (see SpatialIndex.prefetch)."""
+        ids = [np.empty(0, dtype=np.int64)]
+        for shard in self._shards_in_circles([(latitude, longitude, miles)]):
+            ids.append(self._index(shard).prefetch(latitude, longitude, miles) + park_id(shard.number, 0))
+        with self._lock:
+            self._regions.append((latitude, longitude, miles))
+            del self._regions[:-MAX_REGIONS]
+        return np.concatenate(ids)
+
+    def regions(self):
+        with self._lock:
+            return list(self._regions)
+
+    def drop_regions(self, stale):
+        with self._lock:
+            self._regions = [region for region in self._regions if not stale(*region)]
+            indexes = list(self._open.values())
+        for index in indexes:
+            index.drop_regions(stale)
+
+    @property
+    def region_hits(self):
+        with self._lock:
+            return sum(index.region_hits for index in self._open.values())
+
+    def warm_up(self, background=True):
+        """Build the spatial indexes of the open shards (the only table of a dataset without shards)."""
+        with self._lock:
+            indexes = list(self._open.values())
+        for index in indexes:
+            index.warm_up(background)
+
+    def stats(self):
+        """Shard counts and index updates (see SpatialIndex.updates), for get_server_stats."""
+        shards = self._current_shards()
+        with self._lock:
+            stats = {"shards": len(shards), "open": [shards[number].name for number in self._open
+                                                     if number < len(shards)],
+                     "opened": self.opened, "evicted": self.evicted,
+                     "indexUpdates": {"names": dict(self.name_index.updates)}}
+            if self.directory is None:
+                stats["indexUpdates"]["spatial"] = dict(self._open[0].updates)
+            return stats
+
+
+class _Shard:
+    """One region file of a dataset, with the bounding box [min_lat, max_lat, min_lon, max_lon] of its parks."""
+
+    def __init__(self, number, name, file, bbox):
+        self.number = number
+        self.name = name
+        self.file = file
+        self.bbox = bbox
+
+    def id(self, rowid):
+        return park_id(self.number, rowid)
+
+    def meets(self, box):
+        """Whether a (min_lat, max_lat, min_lon, max_lon) box meets the shard's bounding box (always without one)."""
+        if self.bbox is None:
+            return True
+        min_lat, max_lat, min_lon, max_lon = box
+        return (min_lat <= self.bbox[1] and max_lat >= self.bbox[0] and
+                min_lon <= self.bbox[3] and max_lon >= self.bbox[2])
@@ -0,0 +1,134 @@
+import collections
+import math
+import threading
+import time
+from datetime import datetime
+
+from geo import bearing_between_points, destination_point, distance_between_points
+from metrics import log
+
+# Seconds between looks at the latest GPS fix
+POLL_SECONDS = 2.0
+# Fixes of the last this many seconds give the speed and heading
+HISTORY_SECONDS = 60
+# Moves shorter than this over the history (GPS jitter of a parked vehicle) give no heading
+MIN_MOVE_MILES = 0.05
+# Below this speed only the area around the vehicle is kept warm
+MIN_SPEED_MPH = 5
+# How far ahead regions are prefetched, in minutes of driving at the current speed
+LOOKAHEAD_MINUTES = 30
+# Regions are centered every this many miles along the heading
+STEP_MILES = 10
+# Radius of a region. The vehicle is always within STEP_MILES / 2 of a region
+# center, so "near me" searches up to REGION_MILES - STEP_MILES / 2 are answered from them.
+REGION_MILES = 60
+
+
+class Prefetcher:
+    """
+    Follows the GPS fix published by gpsLogger.py and keeps the parks ahead of the
+    vehicle warm in its spatial indexes.
+
+    Speed and heading come from the fixes of the last HISTORY_SECONDS. Every
+    POLL_SECONDS the indexes get a region (SpatialIndex.prefetch) around the
+    vehicle and every STEP_MILES along the heading for the next LOOKAHEAD_MINUTES
+    of driving. Regions the vehicle has left or passed are dropped, and each
+    index keeps at most MAX_REGIONS, so memory stays bounded.
+    """
+
+    def __init__(self, read_fix, indexes):
+        self.read_fix = read_fix
+        self.indexes = indexes
+        self.speed_mph = 0.0
+        self.heading = None
+        self.regions_built = 0
+        self._history = collections.deque()
+        self._last_fix = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Follow the fix in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.step()
+            except Exception as e:
+                log.warning("prefetch failed: %s", e)
+            self._stop.wait(POLL_SECONDS)
+
+    def step(self):
+        """Take the latest fix and prefetch the regions ahead that are not warm yet."""
+        fix = self.read_fix()
+        if fix is None or fix.get("latitude") is None or fix.get("longitude") is None:
+            return
+        latitude, longitude = float(fix["latitude"]), float(fix["longitude"])
+        key = (latitude, longitude, fix.get("timestamp"))
+        if key == self._last_fix:
+            return
+        self._last_fix = key
+        self._track(latitude, longitude, _fix_time(fix))
+
+        targets = [(latitude, longitude)]
+        if self.heading is not None and self.speed_mph >= MIN_SPEED_MPH:
+            ahead = self.speed_mph * LOOKAHEAD_MINUTES / 60
+            targets += [destination_point(latitude, longitude, self.heading, STEP_MILES * step)
+                        for step in range(1, math.ceil(ahead / STEP_MILES) + 1)]
+
+        def stale(center_latitude, center_longitude, miles):
+            distance = distance_between_points(latitude, longitude, center_latitude, center_longitude)
+            if distance > miles:
+                return True  # The vehicle has left it
+            if self.heading is None or self.speed_mph < MIN_SPEED_MPH or distance <= STEP_MILES:
+                return False
+            bearing = bearing_between_points(latitude, longitude, center_latitude, center_longitude)
+            return abs((bearing - self.heading + 180) % 360 - 180) > 90  # Passed, behind the vehicle
+
+        for index in self.indexes:
+            index.drop_regions(stale)
+            centers = [(center_latitude, center_longitude) for center_latitude, center_longitude, _ in index.regions()]
+            for target in targets:
+                if any(distance_between_points(*target, *center) <= STEP_MILES / 2 for center in centers):
+                    continue
+                index.prefetch(*target, REGION_MILES)
+                centers.append(target)
+                self.regions_built += 1
+
+    def _track(self, latitude, longitude, fix_time):
+        """Add a fix to the history and update the speed and heading."""
+        history = self._history
+        history.append((fix_time, latitude, longitude))
+        while history and fix_time - history[0][0] > HISTORY_SECONDS:
+            history.popleft()
+        first_time, first_latitude, first_longitude = history[0]
+        moved = distance_between_points(first_latitude, first_longitude, latitude, longitude)
+        if moved < MIN_MOVE_MILES or fix_time <= first_time:
+            self.speed_mph = 0.0
+            return
+        self.speed_mph = moved / ((fix_time - first_time) / 3600)
+        self.heading = bearing_between_points(first_latitude, first_longitude, latitude, longitude)
+
+    def stats(self):
+        """Current speed and heading estimate and the regions per index, for get_server_stats."""
+        return {
+            "speedMph": round(self.speed_mph, 1),
+            "heading": None if self.heading is None else round(self.heading),
+            "regionsBuilt": self.regions_built,
+            "regions": {index.table: len(index.regions()) for index in self.indexes},
+            "regionHits": {index.table: index.region_hits for index in self.indexes},
+        }
+
+
+def _fix_time(fix):
+    """Epoch seconds of a fix's timestamp, the current time when it has none."""
+    try:
+        return datetime.fromisoformat(str(fix["timestamp"])).timestamp()
+    except (KeyError, ValueError):
+        return time.time()
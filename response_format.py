@@ -0,0 +1,48 @@
+import orjson
+
+# Text values longer than this are cut (maxTextLength argument of the park tools, 0 is no limit)
+MAX_TEXT_LENGTH = 1000
+# Appended to text cut by MAX_TEXT_LENGTH
+TRUNCATED = "..."
+# Fields computed by the tools, kept whatever fields asks for
+COMPUTED_FIELDS = ("distance", "distances", "routeMiles", "matchScore")
+
+
+def encode(result):
+    """Compact JSON text of a tool result, with orjson (several times faster than json for large results)."""
+    return orjson.dumps(result).decode("utf-8")
+
+
+def shape_parks(parks, fields=None, max_text=MAX_TEXT_LENGTH):
+    """
+    Parks with only the requested fields (matched ignoring case, plus the computed
+    fields) and text longer than max_text cut to max_text characters. Parks with nothing
+    to drop or cut are returned as they are, not copied.
+    """
+    wanted = {field.lower() for field in fields} | set(f.lower() for f in COMPUTED_FIELDS) if fields else None
+    if wanted is None and max_text <= 0:
+        return parks
+    shaped = []
+    for park in parks:
+        if wanted is not None:
+            park = {key: value for key, value in park.items() if key.lower() in wanted}
+        if max_text > 0:
+            long = [key for key, value in park.items() if type(value) is str and len(value) > max_text]
+            if long:
+                park = park.copy() if wanted is None else park
+                for key in long:
+                    park[key] = park[key][:max_text] + TRUNCATED
+        shaped.append(park)
+    return shaped
+
+
+def columnar(parks):
+    """{"columns": names, "rows": [[values]]}: key names once instead of once per park."""
+    columns = []
+    seen = set()
+    for park in parks:
+        for key in park:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+    return {"columns": columns, "rows": [[park.get(column) for column in columns] for park in parks]}
@@ -0,0 +1,142 @@
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_SIZE = 512
+TTL_SECONDS = 3600
+# latitude/longitude arguments are rounded to this many decimals (about 0.07 miles)
+QUANTIZE_DECIMALS = 3
+COORDINATE_ARGUMENTS = ("latitude", "longitude")
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of tool results, with a time to live.
+
+    Keys are the tool name plus its bound arguments, with latitude/longitude
+    rounded to QUANTIZE_DECIMALS. The rounded values are also what the tool
+    runs with, so every caller in the same cell gets the same answer (and
+    paging cursors issued for it stay valid). When the database generation
+    changes the results of the tables changed by the deltas applied since
+    (ScampDB.changes) are dropped: the results of functions cached with
+    tables= reading other tables survive, anything else goes. Calls still
+    pinned to the previous generation during a swap neither read nor fill
+    the cache. Tables kept outside the database (sharded parks) are followed
+    through their own generation instead (see watch).
+    """
+
+    def __init__(self, db, max_entries=CACHE_SIZE, ttl_seconds=TTL_SECONDS):
+        self.db = db
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._version = None
+        self._watched = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, fn=None, tables=None):
+        """
+        Decorator caching the results of a tool function, as @cached or @cached(tables=[...])
+        naming the tables its results come from (kept when only other tables change).
+        """
+        if fn is None:
+            return lambda fn: self.cached(fn, tables)
+        tables = None if tables is None else frozenset(tables)
+        name = fn.__name__
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            for argument in COORDINATE_ARGUMENTS:
+                if argument in bound.arguments:
+                    bound.arguments[argument] = round(float(bound.arguments[argument]), QUANTIZE_DECIMALS)
+            key = name + json.dumps(bound.arguments, sort_keys=True, default=str)
+            found, result = self.get(key)
+            if not found:
+                result = fn(*bound.args, **bound.kwargs)
+                self.put(key, result, tables)
+            return result
+
+        return wrapper
+
+    def watch(self, table, generation):
+        """Also drop the results of table whenever generation() changes (e.g. ParkDataset.generation)."""
+        with self._lock:
+            self._watched[table] = [generation, generation()]
+
+    def _check_watched(self):
+        """Drop the entries of the watched tables whose generation has changed."""
+        for table, watched in self._watched.items():
+            generation = watched[0]()
+            if generation != watched[1]:
+                watched[1] = generation
+                for key in [key for key, entry in self._entries.items() if entry[2] is None or table in entry[2]]:
+                    del self._entries[key]
+
+    def _check_generation(self):
+        """Drop the entries a newer generation changed. False for a call pinned to an older one."""
+        generation = self.db.generation
+        if self._generation is not None and generation <= self._generation:
+            return generation == self._generation
+        changes = None if self._generation is None else self.db.changes(self._version)
+        if changes is None:
+            self._entries.clear()
+        else:
+            changed = set(changes)
+            for key in [key for key, entry in self._entries.items() if entry[2] is None or entry[2] & changed]:
+                del self._entries[key]
+        self._generation = generation
+        self._version = self.db.version
+        return True
+
+    def get(self, key):
+        """Return (True, result) on a hit, (False, None) on a miss."""
+        with self._lock:
+            self._check_watched()
+            if not self._check_generation():
+                self.misses += 1
+                return False, None
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, result, tables=None):
+        with self._lock:
+            self._check_watched()
+            if not self._check_generation():
+                return
+            self._entries[key] = (time.monotonic(), result, tables)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for tuning the cache size and TTL."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,275 @@
+import itertools
+import json
+from array import array
+
+import numpy as np
+
+# Rows read from the database per fetchmany() while loading
+FETCH_ROWS = 10_000
+
+
+class RowStore:
+    """
+    Compact, read-only rows of the light columns of a table, stored column by column.
+
+    Columns holding only floats or only ints become numpy arrays and columns
+    holding only strings one UTF-8 buffer plus offsets, so millions of rows
+    cost tens of bytes each instead of a dict each. Any other column (mixed
+    types, NULLs) stays a plain list. store[i] makes the dict of row i.
+    dump() and mapped() save the columns to and map them from an index snapshot.
+    """
+
+    def __init__(self, names, columns, length):
+        self.names = names
+        self._columns = columns
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        return {name: column[i] for name, column in zip(self.names, self._columns)}
+
+    def rows(self, positions):
+        """Dicts of the rows at positions (an array of row numbers), made column by column."""
+        positions = np.asarray(positions, dtype=np.int64)
+        values = [_take(column, positions) for column in self._columns]
+        return [dict(zip(self.names, row)) for row in zip(*values)]
+
+    def column(self, name):
+        """All values of one column as a numpy array (numbers) or list."""
+        column = self._columns[self.names.index(name)]
+        if isinstance(column, _Numbers):
+            return column.values
+        return [column[i] for i in range(self._length)]
+
+    def drop(self, names):
+        """The same rows without the given columns."""
+        kept = [i for i, name in enumerate(self.names) if name not in names]
+        return RowStore([self.names[i] for i in kept], [self._columns[i] for i in kept], self._length)
+
+    @classmethod
+    def load(cls, cursor):
+        """Build from an executed cursor of plain tuples, reading it in FETCH_ROWS batches."""
+        names = [description[0] for description in cursor.description]
+        builders = [_ColumnBuilder() for _ in names]
+        length = 0
+        while True:
+            batch = cursor.fetchmany(FETCH_ROWS)
+            if not batch:
+                break
+            for builder, values in zip(builders, zip(*batch)):
+                builder.extend(values)
+            length += len(batch)
+        return cls(names, [builder.finish() for builder in builders], length)
+
+    def dump(self, prefix):
+        """
+        (layout, arrays, blobs) of the columns for index_snapshot.save, named prefix + column
+        number. Strings are saved as their UTF-8 buffer and offsets, other lists as JSON.
+        """
+        layout = []
+        arrays = {}
+        blobs = {}
+        for i, column in enumerate(self._columns):
+            key = f"{prefix}{i}"
+            if isinstance(column, _Numbers):
+                arrays[key] = column.values
+                kind = column.python_type.__name__
+            else:
+                values = _take(column, np.arange(self._length, dtype=np.int64))
+                builder = _ColumnBuilder()
+                if values:
+                    builder.extend(values)
+                if builder.kind == "str":
+                    blobs[key] = bytes(builder.data)
+                    arrays[key + "_offsets"] = np.frombuffer(builder.offsets, dtype=np.int64)
+                    kind = "str"
+                else:
+                    blobs[key] = json.dumps(values).encode("utf-8")
+                    kind = "json"
+            layout.append([self.names[i], key, kind])
+        return {"length": self._length, "columns": layout}, arrays, blobs
+
+    @classmethod
+    def mapped(cls, layout, arrays, blobs):
+        """Rows of a dump() loaded by index_snapshot.load: numbers and strings stay memory-mapped."""
+        names = []
+        columns = []
+        for name, key, kind in layout["columns"]:
+            names.append(name)
+            if kind in _NUMBER_TYPES:
+                columns.append(_Numbers(arrays[key], _NUMBER_TYPES[kind]))
+            elif kind == "str":
+                columns.append(_Strings(blobs[key], arrays[key + "_offsets"]))
+            else:
+                columns.append(json.loads(bytes(blobs[key])))
+        return cls(names, columns, layout["length"])
+
+    @classmethod
+    def concat(cls, parts):
+        """
+        One compact store of the rows at positions of stores with the same columns, given as
+        [(store, positions)] in order. Numbers and strings are gathered with numpy, row by row
+        only for the other columns.
+        """
+        names = parts[0][0].names
+        columns = []
+        for i in range(len(names)):
+            pieces = [_gather(store._columns[i], np.asarray(positions, dtype=np.int64)) for store, positions in parts]
+            columns.append(_joined([piece for piece, (_, positions) in zip(pieces, parts) if len(positions)]))
+        return cls(names, columns, sum(len(positions) for _, positions in parts))
+
+    def take(self, order):
+        """Rows reordered by an array of row numbers, sharing this store's column data."""
+        order = np.asarray(order, dtype=np.int64)
+        columns = [_Numbers(column.values[order], column.python_type) if isinstance(column, _Numbers)
+                   else _Reordered(column, order) for column in self._columns]
+        return RowStore(self.names, columns, len(order))
+
+
+class _ColumnBuilder:
+    """Accumulates one column in the most compact form its values allow so far."""
+
+    def __init__(self):
+        self.kind = None
+        self.data = None
+        self.offsets = None
+
+    def extend(self, values):
+        """Append one batch of values."""
+        kinds = {_KINDS.get(type(value), "any") for value in values}
+        kind = kinds.pop() if len(kinds) == 1 else "any"
+        if self.kind is None:
+            self._start(kind)
+        elif kind != self.kind and self.kind != "any":
+            self._to_list()
+        if self.kind == "str":
+            encoded = [value.encode("utf-8") for value in values]
+            end = self.offsets[-1]
+            self.offsets.extend(end + total for total in itertools.accumulate(len(value) for value in encoded))
+            self.data += b"".join(encoded)
+        else:
+            self.data.extend(values)
+
+    def _start(self, kind):
+        self.kind = kind
+        if kind == "str":
+            self.data = bytearray()
+            self.offsets = array("q", [0])
+        elif kind == "float":
+            self.data = array("d")
+        elif kind == "int":
+            self.data = array("q")
+        else:
+            self.data = []
+
+    def _to_list(self):
+        values = self._values()
+        self.kind = "any"
+        self.data = values
+        self.offsets = None
+
+    def _values(self):
+        if self.kind == "str":
+            return [self.data[start:end].decode("utf-8") for start, end in zip(self.offsets, self.offsets[1:])]
+        return list(self.data)
+
+    def finish(self):
+        if self.kind == "str":
+            return _Strings(bytes(self.data), np.frombuffer(self.offsets, dtype=np.int64).copy())
+        if self.kind == "float":
+            return _Numbers(np.frombuffer(self.data, dtype=np.float64).copy(), float)
+        if self.kind == "int":
+            return _Numbers(np.frombuffer(self.data, dtype=np.int64).copy(), int)
+        return self.data or []
+
+
+# bool is a subclass of int but is kept as a Python value (kind "any")
+_KINDS = {str: "str", float: "float", int: "int"}
+# Python type of the saved number columns by kind name (see RowStore.dump)
+_NUMBER_TYPES = {"float": float, "int": int}
+
+
+class _Numbers:
+    def __init__(self, values, python_type):
+        self.values = values
+        self.python_type = python_type
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return self.python_type(self.values[i])
+
+    def take(self, positions):
+        return self.values[positions].tolist()
+
+
+class _Strings:
+    def __init__(self, data, offsets):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return self._data[self._offsets[i]:self._offsets[i + 1]].decode("utf-8")
+
+    def take(self, positions):
+        data = self._data
+        return [data[start:end].decode("utf-8")
+                for start, end in zip(self._offsets[positions].tolist(), self._offsets[positions + 1].tolist())]
+
+
+class _Reordered:
+    def __init__(self, column, order):
+        self._column = column
+        self._order = order
+
+    def __getitem__(self, i):
+        return self._column[int(self._order[i])]
+
+    def take(self, positions):
+        return _take(self._column, self._order[positions])
+
+
+def _take(column, positions):
+    if isinstance(column, list):
+        return [column[i] for i in positions.tolist()]
+    return column.take(positions)
+
+
+def _gather(column, positions):
+    """The values of a column at positions as a new compact column (or list)."""
+    while isinstance(column, _Reordered):
+        column, positions = column._column, column._order[positions]
+    if isinstance(column, _Numbers):
+        return _Numbers(column.values[positions], column.python_type)
+    if isinstance(column, _Strings):
+        starts = column._offsets[positions]
+        lengths = column._offsets[positions + 1] - starts
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Byte i of the result comes from byte i + (start - offset) of its string
+        index = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+        return _Strings(np.frombuffer(column._data, dtype=np.uint8)[index].tobytes(), offsets)
+    return _take(column, positions)
+
+
+def _joined(pieces):
+    """One column of gathered pieces, kept compact when they all have the same kind."""
+    if not pieces:
+        return []
+    if all(isinstance(piece, _Numbers) and piece.python_type is pieces[0].python_type for piece in pieces):
+        return _Numbers(np.concatenate([piece.values for piece in pieces]), pieces[0].python_type)
+    if all(isinstance(piece, _Strings) for piece in pieces):
+        shifts = np.cumsum([0] + [len(piece._data) for piece in pieces[:-1]])
+        offsets = np.concatenate([pieces[0]._offsets[:1]] + [piece._offsets[1:] + shift
+                                                             for piece, shift in zip(pieces, shifts.tolist())])
+        return _Strings(b"".join(piece._data for piece in pieces), offsets)
+    builder = _ColumnBuilder()
+    for piece in pieces:
+        builder.extend(_take(piece, np.arange(len(piece))))
+    return builder.finish()
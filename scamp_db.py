@@ -0,0 +1,211 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import urllib.parse
+
+from metrics import count_rows, phase
+from scamp_schema import CHANGES_TABLE, VERSIONS_TABLE
+
+# Number of compiled statements sqlite3 keeps per connection. The tools only
+# use a handful of fixed SQL strings so this is plenty.
+STATEMENT_CACHE_SIZE = 64
+
+
+class ScampDB:
+    """
+    Long-lived, read-only access to scamp.db.
+
+    Each thread gets its own connection (sqlite3 connections should not be
+    shared between threads) which is opened once with mode=ro and reused for
+    every query. All SQL is parameterized so sqlite3's statement cache can
+    reuse the compiled statement and names containing quotes are safe.
+
+    If the database file is replaced (different inode, size or mtime) the
+    per-thread connections are reopened on their next use. Inside pinned()
+    (one whole tool call, see WorkerPool) the thread keeps the connection and
+    generation it started with instead, so a call running while the file is
+    swapped (see scamp_delta.py) finishes on the old version: its file stays
+    readable while the connection is open.
+    """
+
+    def __init__(self, db_file, immutable=False):
+        self.db_file = db_file
+        self.immutable = immutable
+        self._local = threading.local()
+        self._signature = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._columns = {}
+        self._versions = {}
+
+    @property
+    def generation(self):
+        """Counter that increases every time the database file is seen to change (the pinned one in pinned())."""
+        pin = getattr(self._local, "pin", None)
+        if pin is not None:
+            return pin[1]
+        self._check_file()
+        return self._generation
+
+    def file_signature(self):
+        """
+        (inode, size, mtime) of the database file (of the pinned version in pinned()), None
+        when it is missing. Also keys the index snapshots.
+        """
+        pin = getattr(self._local, "pin", None)
+        if pin is not None:
+            return pin[2]
+        return self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.db_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _check_file(self):
+        signature = self._stat()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._signature = signature
+                    self._generation += 1
+
+    def _uri(self):
+        path = urllib.parse.quote(os.path.abspath(self.db_file))
+        uri = "file:" + path + "?mode=ro"
+        if self.immutable:
+            # Skips all file locking; only safe when the file is replaced
+            # (new inode) rather than modified in place.
+            uri += "&immutable=1"
+        return uri
+
+    def connection(self):
+        """Return this thread's read-only connection (the pinned one in pinned()), opening it if needed."""
+        pin = getattr(self._local, "pin", None)
+        if pin is not None and pin[0] is not None:
+            return pin[0]
+        self._check_file()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.generation == self._generation:
+            return conn
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(self._uri(), uri=True, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row  # Enables dict-like access to rows
+        self._local.conn = conn
+        self._local.generation = self._generation
+        self._local.signature = self._signature
+        return conn
+
+    @contextlib.contextmanager
+    def pinned(self):
+        """Keep this thread on the current version of the database until the block ends (nested blocks share it)."""
+        if getattr(self._local, "pin", None) is not None:
+            yield
+            return
+        try:
+            self._local.pin = (self.connection(), self._local.generation, self._local.signature)
+        except sqlite3.Error:
+            self._local.pin = None  # Missing database, its queries fail as usual
+        try:
+            yield
+        finally:
+            self._local.pin = None
+
+    @property
+    def version(self):
+        """Snapshot version of the database (PRAGMA user_version, see scamp_delta.py), 0 when unversioned."""
+        generation = self.generation
+        version = self._versions.get(generation)
+        if version is None:
+            try:
+                version = self.connection().execute("PRAGMA user_version").fetchone()[0]
+            except sqlite3.Error:
+                return 0
+            # The pinned generation before a swap may still ask for its own
+            self._versions = {**{g: v for g, v in self._versions.items() if g >= generation - 1},
+                              generation: version}
+        return version
+
+    def changes(self, since_version):
+        """
+        {table: set of rowids} inserted, updated or deleted by the deltas applied since the
+        database was at since_version, empty when it still is. None when that is not known
+        (unversioned, rebuilt, or older than the deltas logged), meaning anything may have changed.
+        """
+        version = self.version
+        if not version or not since_version:
+            return None
+        if since_version == version:
+            return {}
+        if not self.columns(VERSIONS_TABLE):
+            return None
+        bases = dict(self.query(f"SELECT version, base FROM {VERSIONS_TABLE} WHERE version > ?", (since_version,)))
+        chain = []
+        while version != since_version:
+            if version not in bases:
+                return None
+            chain.append(version)
+            version = bases[version]
+        changes = {}
+        for table, rowid in self.query(f'SELECT "table", id FROM {CHANGES_TABLE} '
+                                       f'WHERE version IN (SELECT value FROM json_each(?))', (json.dumps(chain),)):
+            changes.setdefault(table, set()).add(rowid)
+        return changes
+
+    def query(self, sql, params=()):
+        """Run a parameterized query and return all rows."""
+        with phase("db"):
+            result = self.connection().execute(sql, params).fetchall()
+        count_rows(len(result), len(result))
+        return result
+
+    def query_one(self, sql, params=()):
+        """Run a parameterized query and return the first row (or None)."""
+        with phase("db"):
+            row = self.connection().execute(sql, params).fetchone()
+        count_rows(1, 1 if row is not None else 0)
+        return row
+
+    def columns(self, table):
+        """
+        Lower case column names of a table, empty when the table does not exist.
+        Lets callers detect optional tables (see build_db.py); cached until the file changes.
+        """
+        generation = self.generation
+        columns = self._columns.get((generation, table))
+        if columns is None:
+            try:
+                rows = self.connection().execute("SELECT name FROM pragma_table_info(?)", (table,)).fetchall()
+            except sqlite3.Error:
+                rows = []  # Missing database file, retried once it changes
+            columns = frozenset(row[0].lower() for row in rows)
+            # Kept for this generation and the one before (calls pinned to it during a swap)
+            self._columns = {**{key: value for key, value in self._columns.items() if key[0] >= generation - 1},
+                             (generation, table): columns}
+        return columns
+
+    def close(self):
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def state_of(states, generation):
+    """
+    Of an index's states (objects with a generation, oldest first) the one of generation:
+    the newest for a generation older than any kept, None for a newer one (to be built).
+    """
+    for state in reversed(states):
+        if state.generation == generation:
+            return state
+    if states and generation < states[-1].generation:
+        return states[-1]
+    return None
@@ -0,0 +1,185 @@
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import time
+
+from build_db import declared_columns, finish_build, open_build, refresh_search_rows
+from scamp_schema import CHANGES_TABLE, COLUMN_TYPES, LOGGED_VERSIONS, SHARDED_TABLES, VERSIONS_TABLE
+
+# Updates scamp.db from delta packages without stopping the server. A delta
+# holds the rows inserted, updated and deleted in each table since one version
+# of the database (PRAGMA user_version, see build_db.py), as JSON (.gz compressed
+# when the file name ends in .gz):
+#
+#   {"base": 1767225600, "version": 1767312000,
+#    "tables": {"rv_park": {"insert": [{"Name": "...", "latitude": 40.1, ...}],
+#                           "update": [{"rowid": 12, "Name": "..."}],
+#                           "delete": [40, 41]}}}
+#
+# apply writes the new version offline to a copy of the database: the rows, their
+# search tables (R*Tree and name keys) and the log of the changed rowids
+# (VERSIONS_TABLE, CHANGES_TABLE), then syncs the copy to disk and renames it over
+# the database, so a power cut never leaves a half written scamp.db. A
+# running server switches to it on its next call while the calls already running
+# finish on the old file (see ScampDB.pinned), and its indexes and cached results
+# are updated for the changed rows only (see ScampDB.changes). make writes the
+# delta between two versions of the database, rows matched by rowid.
+#
+#   python scamp_delta.py make old/scamp.db new/scamp.db delta.json.gz
+#   python scamp_delta.py apply /home/pi/mcpScamp/scamp.db delta.json.gz
+
+
+def read_delta(path):
+    with (gzip.open if path.endswith(".gz") else open)(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_delta(delta, path):
+    with (gzip.open if path.endswith(".gz") else open)(path, "wt", encoding="utf-8") as f:
+        json.dump(delta, f)
+
+
+def make_delta(old_file, new_file):
+    """The delta turning the database old_file into new_file (same tables and columns)."""
+    conn = sqlite3.connect(new_file)
+    try:
+        conn.execute("ATTACH DATABASE ? AS old", (old_file,))
+        base = conn.execute("PRAGMA old.user_version").fetchone()[0]
+        version = conn.execute("PRAGMA main.user_version").fetchone()[0]
+        tables = {}
+        for table in COLUMN_TYPES:
+            if table in SHARDED_TABLES:
+                continue
+            old_columns = [row[1] for row in conn.execute(f'PRAGMA old.table_info("{table}")')]
+            new_columns = [row[1] for row in conn.execute(f'PRAGMA main.table_info("{table}")')]
+            if not old_columns and not new_columns:
+                continue
+            if old_columns != new_columns:
+                raise ValueError(f"{table}: the columns differ, rebuild the database instead (build_db.py)")
+            selected = ", ".join(f'"{column}"' for column in new_columns)
+            old_rowids = {row[0] for row in conn.execute(f'SELECT rowid FROM old."{table}"')}
+            changes = {"insert": [], "update": [], "delete": []}
+            for row in conn.execute(f'SELECT rowid, {selected} FROM main."{table}" '
+                                    f'EXCEPT SELECT rowid, {selected} FROM old."{table}" ORDER BY 1'):
+                changes["update" if row[0] in old_rowids else "insert"].append(
+                    dict(zip(["rowid"] + new_columns, row)))
+            changes["delete"] = [row[0] for row in conn.execute(
+                f'SELECT rowid FROM old."{table}" EXCEPT SELECT rowid FROM main."{table}" ORDER BY 1')]
+            if any(changes.values()):
+                tables[table] = changes
+    finally:
+        conn.close()
+    return {"base": base, "version": version if version > base else base + 1, "tables": tables}
+
+
+def apply_delta(db_file, delta, output=None):
+    """
+    Apply a delta to the database db_file, written to output (db_file itself by default)
+    by renaming a finished copy over it. Returns {table: rows changed}.
+    """
+    output = output or db_file
+    building = output + ".build"
+    conn = open_build(building, None, copy_of=db_file, durable=True)
+    try:
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        if delta["base"] != current:
+            raise ValueError(f"{db_file} is at version {current}, the delta applies to version {delta['base']}")
+        version = int(delta["version"])
+        if version <= current:
+            raise ValueError(f"delta version {version} is not after {current}")
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (version INTEGER PRIMARY KEY, "
+                     f"base INTEGER NOT NULL)")
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (version INTEGER NOT NULL, "table" TEXT NOT NULL, '
+                     f'id INTEGER NOT NULL, PRIMARY KEY (version, "table", id)) WITHOUT ROWID')
+        counts = {}
+        for table, changes in delta["tables"].items():
+            if table not in COLUMN_TYPES or table in SHARDED_TABLES:
+                raise ValueError(f"{table}: not a table of scamp.db")
+            rowids = _apply_changes(conn, table, declared_columns(conn, table), changes)
+            refresh_search_rows(conn, table, rowids)
+            conn.executemany(f'INSERT INTO {CHANGES_TABLE} VALUES (?, ?, ?)',
+                             [(version, table, rowid) for rowid in sorted(rowids)])
+            counts[table] = len(rowids)
+        conn.execute(f"INSERT INTO {VERSIONS_TABLE} VALUES (?, ?)", (version, current))
+        logged = f"SELECT version FROM {VERSIONS_TABLE} ORDER BY version DESC LIMIT {LOGGED_VERSIONS}"
+        conn.execute(f"DELETE FROM {CHANGES_TABLE} WHERE version NOT IN ({logged})")
+        conn.execute(f"DELETE FROM {VERSIONS_TABLE} WHERE version NOT IN ({logged})")
+        conn.execute(f"PRAGMA user_version = {version}")
+        finish_build(conn, building, output, compact=False)
+    except BaseException:
+        conn.close()
+        if os.path.exists(building):  # Already renamed when the failure came after finish_build
+            os.remove(building)
+        raise
+    return counts
+
+
+def _apply_changes(conn, table, declared, changes):
+    """Delete, update then insert the rows of one table of a delta. Returns the rowids changed."""
+    if not declared:
+        raise ValueError(f"{table}: no such table in the database")
+    rowids = set()
+    for rowid in changes.get("delete", []):
+        conn.execute(f'DELETE FROM "{table}" WHERE rowid = ?', (int(rowid),))
+        rowids.add(int(rowid))
+    for row in changes.get("update", []):
+        row = dict(row)
+        rowid = int(row.pop("rowid"))
+        columns = _column_names(table, declared, row)
+        cursor = conn.execute(f'UPDATE "{table}" SET {", ".join(f"{column} = ?" for column in columns)} '
+                              f'WHERE rowid = ?', list(row.values()) + [rowid])
+        if cursor.rowcount != 1:
+            raise ValueError(f"{table}: no row {rowid} to update")
+        rowids.add(rowid)
+    for row in changes.get("insert", []):
+        row = dict(row)
+        rowid = row.pop("rowid", None)
+        columns = _column_names(table, declared, row)
+        if rowid is not None:
+            columns.insert(0, "rowid")
+            row = {"rowid": int(rowid), **row}
+        cursor = conn.execute(f'INSERT INTO "{table}" ({", ".join(columns)}) '
+                              f'VALUES ({",".join("?" * len(columns))})', list(row.values()))
+        rowids.add(cursor.lastrowid)
+    return rowids
+
+
+def _column_names(table, declared, row):
+    """Quoted declared names of the columns of a delta row, in its order."""
+    if not row:
+        raise ValueError(f"{table}: a delta row without columns")
+    unknown = [name for name in row if name.lower() not in declared]
+    if unknown:
+        raise ValueError(f"{table}: no column {', '.join(unknown)}")
+    return [f'"{declared[name.lower()]}"' for name in row]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Make and apply scamp.db delta packages")
+    commands = parser.add_subparsers(dest="command", required=True)
+    make = commands.add_parser("make", help="write the delta from one database version to another")
+    make.add_argument("old", help="database the delta applies to")
+    make.add_argument("new", help="database the delta turns it into")
+    make.add_argument("delta", help="delta file to write (.json or .json.gz)")
+    apply = commands.add_parser("apply", help="apply deltas to a database, replacing it when done")
+    apply.add_argument("database")
+    apply.add_argument("deltas", nargs="+", help="delta files, applied in order")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    if args.command == "make":
+        delta = make_delta(args.old, args.new)
+        write_delta(delta, args.delta)
+        print(f"{args.delta}: version {delta['base']} -> {delta['version']}, " +
+              ", ".join(f"{table} {len(changes['insert'])} inserted, {len(changes['update'])} updated, "
+                        f"{len(changes['delete'])} deleted" for table, changes in delta["tables"].items()))
+    else:
+        for delta_file in args.deltas:
+            counts = apply_delta(args.database, read_delta(delta_file))
+            print(f"{delta_file}: {counts} rows changed")
+    print(f"done in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# Layout of scamp.db shared by the server (mcpScamp.py) and the offline build (build_db.py)
+
+# Declared types of the source table columns. Columns not listed are loaded without a type.
+COLUMN_TYPES = {
+    "rv_park": {"UID": "INTEGER", "Name": "TEXT", "Est": "TEXT", "Address": "TEXT", "City": "TEXT", "St": "TEXT",
+                "zip": "TEXT", "Phone": "TEXT", "latitude": "REAL", "longitude": "REAL", "Amenities": "TEXT",
+                "RecordID": "INTEGER", "Web": "TEXT", "Booking": "TEXT", "Comments": "TEXT", "Rating": "REAL",
+                "Reviews": "TEXT"},
+    "pa_state_park": {"name": "TEXT", "address": "TEXT", "city": "TEXT", "zip": "INTEGER", "latitude": "REAL",
+                      "longitude": "REAL", "hasRVCamping": "INTEGER", "hasOvernight": "INTEGER",
+                      "hasPavilion": "INTEGER", "overview": "TEXT", "url": "TEXT"},
+    "US": {"U": "INTEGER", "name": "TEXT", "state": "TEXT", "latitude": "REAL", "longitude": "REAL"},
+    "state_park": {"name": "TEXT", "state": "TEXT", "address": "TEXT", "city": "TEXT", "zip": "INTEGER",
+                   "latitude": "REAL", "longitude": "REAL", "hasRVCamping": "INTEGER", "hasOvernight": "INTEGER",
+                   "hasPavilion": "INTEGER", "overview": "TEXT", "url": "TEXT"},
+}
+
+# Tables kept in region shard files (one per state, see park_dataset.py) instead of scamp.db
+SHARDED_TABLES = ["state_park"]
+# Files of a sharded dataset directory besides the shard files: the shard list with
+# bounding boxes, and the names of every park for lookups by name
+MANIFEST_FILE = "manifest.json"
+DIRECTORY_FILE = "directory.db"
+# Park ids of a sharded dataset are shard number << SHARD_BITS | rowid in the shard file
+SHARD_BITS = 32
+
+# Light (summary) columns of each table used by the radius searches. build_db.py
+# stores them in the table's R*Tree so a search never reads the full rows.
+SUMMARY_COLUMNS = {
+    "rv_park": ["name", "longitude", "latitude", "city", "st"],
+    "pa_state_park": ["name", "longitude", "latitude", "hasRVCamping"],
+    "US": ["name", "state", "latitude", "longitude"],
+    "state_park": ["name", "longitude", "latitude", "hasRVCamping", "state"],
+}
+
+# Columns of the fuzzy name indexes, name first. build_db.py adds a covering index over them.
+NAME_COLUMNS = {
+    "pa_state_park": ["name"],
+    "rv_park": ["name", "city", "st"],
+    "US": ["name", "state", "latitude", "longitude"],
+    "state_park": ["name", "state"],
+}
+
+# Snapshot versions (see scamp_delta.py). PRAGMA user_version of scamp.db is its version
+# (0: unversioned), each delta applied to it adds a VERSIONS_TABLE row (version, base) and
+# CHANGES_TABLE rows (version, "table", id) for every inserted, updated or deleted row,
+# so the server can update its indexes for the changed rows only.
+VERSIONS_TABLE = "scamp_version"
+CHANGES_TABLE = "scamp_change"
+# Deltas whose changed rows are kept in CHANGES_TABLE, older ones are dropped
+LOGGED_VERSIONS = 16
+
+# Precomputed geometry stored next to each point in the R*Tree: radians, cosine of
+# the latitude and the unit vector (x, y, z) of the point on the sphere
+GEOMETRY_COLUMNS = ["lat_rad", "lon_rad", "cos_lat", "x", "y", "z"]
+
+
+def rtree_table(table):
+    """R*Tree (virtual table) over the points of a table: id, min/max latitude and longitude."""
+    return table + "_rtree"
+
+
+def name_key_table(table):
+    """Normalized name (name_key) to rowid of a table, see name_index.normalize_name."""
+    return table + "_name_key"
+
+
+def park_id(shard_number, rowid):
+    """Id of a park across the shards of a dataset."""
+    return (shard_number << SHARD_BITS) | rowid
@@ -0,0 +1,530 @@
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+import index_snapshot
+from geo import (EARTH_RADIUS_MILES, distance_between_points, distance_to_arc_miles, haversine_miles_radians,
+                 lat_lon_range, lon_ranges, route_pieces)
+from metrics import count_rows, phase
+from row_store import RowStore
+from scamp_db import state_of
+from scamp_schema import GEOMETRY_COLUMNS, rtree_table
+
+# Tables with more rows than this are searched through their R*Tree (when the
+# database has one) instead of being loaded into memory. Reading the light columns
+# from the R*Tree costs about 5 us a row, the in-memory grid is several times faster.
+MAX_MEMORY_ROWS = 250_000
+# Routes are searched in great-circle pieces of at most this length, each piece
+# only visiting the grid cells (or R*Tree boxes) around it
+ROUTE_PIECE_MILES = 10
+# Slack on the unit vector (dot product) filter of R*Tree searches, the exact
+# distance check is done afterwards
+DOT_TOLERANCE = 1e-9
+# Prefetched regions kept per index (see prefetch.py), least recently used dropped first
+MAX_REGIONS = 8
+# A search is answered from a region only when its circle is inside the region by this margin (rounding)
+REGION_MARGIN_MILES = 0.01
+# A new database version changing at most this fraction of the rows patches the grid
+# (rereading only the changed rows), more is a full rebuild
+MAX_PATCH_FRACTION = 0.2
+
+
+class SpatialIndex:
+    """
+    In-memory grid index over the latitude/longitude of one park table.
+
+    Rows are bucketed into cells of cell_degrees x cell_degrees and stored
+    sorted by cell, so each cell is a contiguous slice of the coordinate
+    arrays. A radius search only visits the cells overlapping the search
+    circle's bounding box and computes the great-circle distances of all their
+    rows in one vectorized call, keeping the rows within the radius.
+
+    The light (summary) columns of every row are held in memory (in a compact
+    RowStore) so summary searches never touch the database. The index is brought up to date on the
+    next search whenever the database generation changes: kept as is when the deltas applied
+    since (ScampDB.changes) left the table alone, patched with only the changed rows when
+    they changed a few, rebuilt otherwise. The state of the previous generation is kept
+    too, for the calls still pinned to it (ScampDB.pinned) while the new one is swapped in.
+
+    Tables over max_memory_rows are not loaded into memory when the database
+    has their R*Tree with the light columns and precomputed geometry (see
+    build_db.py): each search then reads the rows in the bounding box from the
+    R*Tree, filtered on the unit vectors by SQLite, and only the distances are
+    computed here.
+
+    With a snapshot_dir the in-memory arrays and rows are saved there after a
+    build and memory-mapped from there (instead of rebuilt) while the database
+    file is unchanged, see index_snapshot.py.
+
+    prefetch() keeps the rows around a point (ahead of the vehicle, see
+    prefetch.py) as a region; searches inside a region only compute the
+    distances of its rows, with no grid cells or R*Tree query.
+    """
+
+    def __init__(self, db, table, columns, cell_degrees=0.25, max_memory_rows=MAX_MEMORY_ROWS, snapshot_dir=None):
+        self.db = db
+        self.table = table
+        self.columns = columns
+        self.cell_degrees = cell_degrees
+        self.max_memory_rows = max_memory_rows
+        self.snapshot_dir = snapshot_dir
+        self.max_regions = MAX_REGIONS
+        self._regions = []
+        self._regions_lock = threading.Lock()
+        self.region_hits = 0
+        self._lon_cell_count = round(360 / cell_degrees)
+        self._lock = threading.Lock()
+        # _States of the newest generation and the one before, swapped as one list so a
+        # search running during an update always sees a consistent state
+        self._states = []
+        # Updates to a new generation by kind: "built", "patched" or "unchanged"
+        self.updates = {"built": 0, "patched": 0, "unchanged": 0}
+
+    def __len__(self):
+        state = self._ensure_current()
+        if state.rtree_sql is not None:
+            return self.db.query_one("SELECT count(*) FROM " + rtree_table(self.table))[0]
+        return len(state.snapshot.rowids)
+
+    def build(self):
+        """(Re)load the table from the database and rebuild the grid."""
+        with self._lock:
+            self._states = [self._build()]
+            self.updates["built"] += 1
+
+    def warm_up(self, background=True):
+        """Build the index (unless it is current) in a background thread, or in this one."""
+        if not background:
+            self._ensure_current()
+            return
+        threading.Thread(target=self._ensure_current, name=f"{self.table}-spatial-index", daemon=True).start()
+
+    def _ensure_current(self):
+        """The _State for the calling thread's database generation, updating the index when it is newer."""
+        generation = self.db.generation
+        state = state_of(self._states, generation)
+        if state is None:
+            with self._lock:
+                state = state_of(self._states, generation)
+                if state is None:
+                    state = self._update(self._states[-1] if self._states else None)
+                    self._states = (self._states + [state])[-2:]
+                    with self._regions_lock:
+                        self._regions = [region for region in self._regions if region.source is state.snapshot]
+        return state
+
+    def _update(self, previous):
+        """The _State of the current generation, from the previous one when the changes since allow."""
+        if previous is not None and previous.rtree_sql is None:
+            changes = self.db.changes(previous.version)
+            changed = None if changes is None else changes.get(self.table, set())
+            if changed is not None and not changed:
+                self.updates["unchanged"] += 1
+                return _State(self.db.generation, self.db.version, previous.snapshot)
+            if changed is not None and len(changed) <= len(previous.snapshot.rowids) * MAX_PATCH_FRACTION:
+                state = self._patch(previous, changed)
+                if state is not None:
+                    self.updates["patched"] += 1
+                    return state
+        self.updates["built"] += 1
+        return self._build()
+
+    def _uses_rtree(self):
+        """True when the table's R*Tree has the columns searched and more than max_memory_rows rows."""
+        rtree = rtree_table(self.table)
+        return ({column.lower() for column in self.columns + GEOMETRY_COLUMNS} <= self.db.columns(rtree) and
+                self.db.query_one("SELECT count(*) FROM " + rtree)[0] > self.max_memory_rows)
+
+    def _build(self):
+        generation = self.db.generation
+        version = self.db.version
+        signature = self.db.file_signature()
+        if self._uses_rtree():
+            return _State(generation, version, _Snapshot.empty(),
+                          "SELECT id AS _rowid, lat_rad, lon_rad, cos_lat, " + ",".join(self.columns) +
+                          " FROM " + rtree_table(self.table) + " WHERE min_lat <= ? AND max_lat >= ? AND"
+                          " min_lon <= ? AND max_lon >= ? AND x * ? + y * ? + z * ? >= ?")
+        key = self._snapshot_key(signature)
+        if key is not None:
+            saved = index_snapshot.load(self._snapshot_path(), key)
+            if saved is not None:
+                return _State(generation, version, _Snapshot.mapped(*saved))
+        rowids, light_rows, lats, lons = self._load()
+        snapshot = _Snapshot.build(rowids, light_rows, lats, lons, self.cell_degrees, self._lon_cell_count)
+        if key is not None:
+            index_snapshot.save(self._snapshot_path(), key, *snapshot.dump())
+        return _State(generation, version, snapshot)
+
+    def _patch(self, previous, changed):
+        """
+        The previous state's snapshot with the changed rowids reread from the database (dropped
+        when deleted), or None when the table has grown past max_memory_rows into its R*Tree.
+        """
+        generation = self.db.generation
+        version = self.db.version
+        rowids, light_rows, lats, lons = self._load(sorted(changed))
+        if len(previous.snapshot.rowids) + len(rowids) > self.max_memory_rows and self._uses_rtree():
+            return None
+        snapshot = previous.snapshot.patched(np.array(sorted(changed), dtype=np.int64), rowids, light_rows, lats,
+                                             lons, self.cell_degrees, self._lon_cell_count)
+        key = self._snapshot_key(self.db.file_signature())
+        if key is not None:
+            index_snapshot.save(self._snapshot_path(), key, *snapshot.dump())
+        return _State(generation, version, snapshot)
+
+    def _load(self, rowids=None):
+        """(rowids, light rows, latitudes, longitudes) of the located rows of the table, or of the given rowids only."""
+        cursor = self.db.connection().cursor()
+        cursor.row_factory = None
+        sql = ("SELECT rowid AS _rowid, latitude AS _latitude, longitude AS _longitude, " + ",".join(self.columns) +
+               " FROM " + self.table + " WHERE latitude IS NOT NULL AND longitude IS NOT NULL")
+        if rowids is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql + " AND rowid IN (SELECT value FROM json_each(?))", (json.dumps(rowids),))
+        store = RowStore.load(cursor)
+        return (np.asarray(store.column("_rowid"), dtype=np.int64), store.drop(["_rowid", "_latitude", "_longitude"]),
+                np.asarray(store.column("_latitude"), dtype=np.float64),
+                np.asarray(store.column("_longitude"), dtype=np.float64))
+
+    def _snapshot_key(self, signature):
+        if self.snapshot_dir is None or signature is None:
+            return None
+        return {"db": list(signature), "table": self.table, "columns": self.columns, "cell_degrees": self.cell_degrees}
+
+    def _snapshot_path(self):
+        return os.path.join(self.snapshot_dir, self.table + ".spatial")
+
+    def prefetch(self, latitude, longitude, miles):
+        """
+        Keep the rows within miles of the point, closest first, as a region that later
+        searches inside it are answered from. Returns the rowids of the region.
+        """
+        state = self._ensure_current()
+        snapshot, positions, distances = self._search(state, latitude, longitude, miles)
+        region = _Region(latitude, longitude, miles, state.snapshot,
+                         snapshot.subset(positions[np.argsort(distances, kind="stable")]))
+        with self._regions_lock:
+            self._regions.append(region)
+            del self._regions[:-self.max_regions]
+        return region.snapshot.rowids
+
+    def regions(self):
+        """(latitude, longitude, miles) of the prefetched regions."""
+        with self._regions_lock:
+            return [(region.latitude, region.longitude, region.miles) for region in self._regions]
+
+    def drop_regions(self, stale):
+        """Drop the prefetched regions for which stale(latitude, longitude, miles) is true."""
+        with self._regions_lock:
+            self._regions = [region for region in self._regions
+                             if not stale(region.latitude, region.longitude, region.miles)]
+
+    def _region(self, state, latitude, longitude, miles):
+        """The prefetched region of the state containing the search circle, or None."""
+        with self._regions_lock:
+            for i, region in enumerate(self._regions):
+                if region.source is not state.snapshot:
+                    continue
+                if (distance_between_points(latitude, longitude, region.latitude, region.longitude) + miles +
+                        REGION_MARGIN_MILES <= region.miles):
+                    self._regions.append(self._regions.pop(i))
+                    self.region_hits += 1
+                    return region
+        return None
+
+    def _candidates(self, snapshot, latitude, longitude, miles):
+        min_lat, max_lat, min_lon, max_lon = lat_lon_range(latitude, longitude, miles)
+        lat_cells = range(math.floor(min_lat / self.cell_degrees), math.floor(max_lat / self.cell_degrees) + 1)
+        if max_lon - min_lon >= 360:
+            lon_cells = range(self._lon_cell_count)
+        else:
+            lon_cells = {c % self._lon_cell_count for c in range(math.floor(min_lon / self.cell_degrees),
+                                                                math.floor(max_lon / self.cell_degrees) + 1)}
+        slices = []
+        for lat_cell in lat_cells:
+            for lon_cell in lon_cells:
+                cell = snapshot.cells.get((lat_cell, lon_cell))
+                if cell is not None:
+                    slices.append(np.arange(cell[0], cell[1]))
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def _rtree_rows(self, state, latitude, longitude, miles):
+        """Rows of the R*Tree within miles of the point (plus the DOT_TOLERANCE slack) as a snapshot."""
+        min_lat, max_lat, min_lon, max_lon = lat_lon_range(latitude, longitude, miles)
+        lat1 = math.radians(latitude)
+        lon1 = math.radians(longitude)
+        unit = (math.cos(lat1) * math.cos(lon1), math.cos(lat1) * math.sin(lon1), math.sin(lat1))
+        min_dot = math.cos(min(miles / EARTH_RADIUS_MILES, math.pi)) - DOT_TOLERANCE
+        rows = []
+        # Rows are counted by search(), so not through db.query
+        with phase("db"):
+            cursor = self.db.connection().cursor()
+            cursor.row_factory = None  # Plain tuples, the light rows are made below
+            for lon_from, lon_to in lon_ranges(min_lon, max_lon):
+                rows += cursor.execute(state.rtree_sql, (max_lat, min_lat, lon_to, lon_from, *unit,
+                                                         min_dot)).fetchall()
+            keys = [description[0] for description in cursor.description[4:]]
+        if not rows:
+            return _Snapshot.empty()
+        geometry = np.array([row[:4] for row in rows], dtype=np.float64)
+        light_rows = [dict(zip(keys, row[4:])) for row in rows]
+        return _Snapshot(geometry[:, 0].astype(np.int64), light_rows, geometry[:, 1], geometry[:, 2],
+                         geometry[:, 3], {})
+
+    def search(self, latitude, longitude, miles, where=None):
+        """
+        Return (snapshot, positions, distances) for every row within miles of the point,
+        in table (rowid) order. positions index the snapshot's arrays and rows.
+        where is an optional predicate on the light columns of a row.
+        """
+        return self._search(self._ensure_current(), latitude, longitude, miles, where)
+
+    def _search(self, state, latitude, longitude, miles, where=None):
+        region = self._region(state, latitude, longitude, miles) if self._regions else None
+        if region is not None:
+            snapshot = region.snapshot
+            candidates = np.arange(len(snapshot.rowids))
+        elif state.rtree_sql is not None:
+            snapshot = self._rtree_rows(state, latitude, longitude, miles)
+            candidates = np.arange(len(snapshot.rowids))
+        else:
+            snapshot = state.snapshot
+            candidates = self._candidates(snapshot, latitude, longitude, miles)
+        lat1 = math.radians(latitude)
+        distances = haversine_miles_radians(lat1, math.radians(longitude), math.cos(lat1),
+                                            snapshot.lat_rad[candidates], snapshot.lon_rad[candidates],
+                                            snapshot.cos_lat[candidates])
+        keep = distances <= miles
+        positions = candidates[keep]
+        distances = distances[keep]
+        if where is not None:
+            keep = np.array([where(row) for row in _rows(snapshot.rows, positions)], dtype=bool)
+            positions = positions[keep]
+            distances = distances[keep]
+        order = np.argsort(snapshot.rowids[positions], kind="stable")
+        count_rows(len(candidates), len(positions))
+        return snapshot, positions[order], distances[order]
+
+    def within_any(self, points, miles, where=None):
+        """
+        Return [(rowid, row, distances)] for every row within miles of any of the points
+        [(latitude, longitude)], in table order. distances has one entry per point: the
+        distance in miles, or None when the row is beyond miles of that point.
+
+        All points are answered in one pass: the candidate cells (or R*Tree rows) of
+        overlapping circles are fetched once and every distance is computed in one call.
+        """
+        state = self._ensure_current()
+        if not points:
+            return []
+        if state.rtree_sql is not None:
+            snapshot = _Snapshot.union([self._rtree_rows(state, latitude, longitude, miles)
+                                        for latitude, longitude in points])
+            candidates = np.arange(len(snapshot.rowids))
+        else:
+            snapshot = state.snapshot
+            candidates = np.unique(np.concatenate([self._candidates(snapshot, latitude, longitude, miles)
+                                                   for latitude, longitude in points]))
+        lat1 = np.radians([latitude for latitude, longitude in points])[:, np.newaxis]
+        lon1 = np.radians([longitude for latitude, longitude in points])[:, np.newaxis]
+        distances = haversine_miles_radians(lat1, lon1, np.cos(lat1), snapshot.lat_rad[candidates][np.newaxis, :],
+                                            snapshot.lon_rad[candidates][np.newaxis, :],
+                                            snapshot.cos_lat[candidates][np.newaxis, :])
+        inside = distances <= miles
+        keep = inside.any(axis=0)
+        positions = candidates[keep]
+        rows = _rows(snapshot.rows, positions)
+        distances = np.where(inside[:, keep], distances[:, keep], np.nan).T.tolist()
+        rowids = snapshot.rowids[positions].tolist()
+        count_rows(len(candidates), len(positions))
+        hits = sorted(zip(rowids, rows, distances), key=lambda hit: hit[0])
+        return [(rowid, row, [None if math.isnan(d) else d for d in row_distances])
+                for rowid, row, row_distances in hits if where is None or where(row)]
+
+    def within(self, latitude, longitude, miles, where=None):
+        """
+        Return [(rowid, row, distance_miles)] for every row within miles of the point, in table order.
+        row is a copy of the light columns.
+        """
+        snapshot, positions, distances = self.search(latitude, longitude, miles, where)
+        return _hits(snapshot, positions, distances)
+
+    def nearest(self, latitude, longitude, k, max_miles, where=None, start_miles=5):
+        """
+        Return the k closest rows within max_miles as [(rowid, row, distance_miles)], closest first.
+
+        The search radius starts at start_miles and doubles until k rows are
+        found or max_miles is reached, so a nearby answer never scans the full radius.
+        Every row inside the final radius has been seen, which makes the k closest exact.
+        """
+        radius = min(start_miles, max_miles)
+        while True:
+            snapshot, positions, distances = self.search(latitude, longitude, radius, where)
+            if len(positions) >= k or radius >= max_miles:
+                break
+            radius = min(radius * 2, max_miles)
+        order = np.argsort(distances, kind="stable")[:k]
+        return _hits(snapshot, positions[order], distances[order])
+
+    def along_route(self, points, miles, where=None, piece_miles=ROUTE_PIECE_MILES):
+        """
+        Return [(rowid, row, distance_miles, route_miles)] for every row within miles of the
+        route polyline [(latitude, longitude)], ordered by route_miles: the distance along the
+        route to the row's closest approach. Each row appears once, at its closest approach.
+        """
+        closest = {}
+        for start, end, mid_latitude, mid_longitude, start_miles, length in route_pieces(points, piece_miles):
+            # Every row within miles of the piece is within this circle around its middle
+            snapshot, positions, _ = self.search(mid_latitude, mid_longitude, length / 2 + miles, where)
+            if not len(positions):
+                continue
+            distances, along = distance_to_arc_miles(start, end, snapshot.lat_rad[positions],
+                                                     snapshot.lon_rad[positions], snapshot.cos_lat[positions])
+            keep = distances <= miles
+            for p, distance, offset in zip(positions[keep].tolist(), distances[keep].tolist(),
+                                           along[keep].tolist()):
+                rowid = int(snapshot.rowids[p])
+                hit = closest.get(rowid)
+                if hit is None or distance < hit[2]:
+                    closest[rowid] = (rowid, snapshot.rows[p], distance, start_miles + offset)
+        hits = sorted(closest.values(), key=lambda hit: (hit[3], hit[0]))
+        return [(rowid, dict(row), distance, route_miles) for rowid, row, distance, route_miles in hits]
+
+
+def _hits(snapshot, positions, distances):
+    return list(zip(snapshot.rowids[positions].tolist(), _rows(snapshot.rows, positions), distances.tolist()))
+
+
+def _rows(rows, positions):
+    """Copies of the light rows at positions, from a RowStore or a list of dicts."""
+    if isinstance(rows, RowStore):
+        return rows.rows(positions)
+    return [dict(rows[p]) for p in positions.tolist()]
+
+
+class _State:
+    """The index at one database generation: its snapshot, or the R*Tree query when searched through it."""
+
+    def __init__(self, generation, version, snapshot, rtree_sql=None):
+        self.generation = generation
+        self.version = version
+        self.snapshot = snapshot
+        self.rtree_sql = rtree_sql
+
+
+class _Region:
+    """Rows within miles of a prefetched point, as a snapshot taken from the source snapshot."""
+
+    def __init__(self, latitude, longitude, miles, source, snapshot):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.miles = miles
+        self.source = source
+        self.snapshot = snapshot
+
+
+class _Snapshot:
+    """Arrays of one index build, sorted by grid cell."""
+
+    def __init__(self, rowids, rows, lat_rad, lon_rad, cos_lat, cells):
+        self.rowids = rowids
+        self.rows = rows
+        self.lat_rad = lat_rad
+        self.lon_rad = lon_rad
+        self.cos_lat = cos_lat
+        self.cells = cells
+
+    @classmethod
+    def empty(cls):
+        empty = np.empty(0, dtype=np.float64)
+        return cls(np.empty(0, dtype=np.int64), [], empty, empty, empty, {})
+
+    @classmethod
+    def union(cls, snapshots):
+        """One snapshot of the rows of several (R*Tree) snapshots, each row once."""
+        rowids = np.concatenate([snapshot.rowids for snapshot in snapshots])
+        rowids, first = np.unique(rowids, return_index=True)
+        rows = [row for snapshot in snapshots for row in snapshot.rows]
+        return cls(rowids, [rows[i] for i in first.tolist()],
+                   np.concatenate([snapshot.lat_rad for snapshot in snapshots])[first],
+                   np.concatenate([snapshot.lon_rad for snapshot in snapshots])[first],
+                   np.concatenate([snapshot.cos_lat for snapshot in snapshots])[first], {})
+
+    def subset(self, positions):
+        """The rows at positions, in that order (no grid cells), each row made a dict once."""
+        rows = _rows(self.rows, positions)
+        return _Snapshot(self.rowids[positions], rows, self.lat_rad[positions], self.lon_rad[positions],
+                         self.cos_lat[positions], {})
+
+    def dump(self):
+        """(meta, arrays, blobs) for index_snapshot.save."""
+        meta, arrays, blobs = self.rows.dump("row")
+        cells = np.array([key + value for key, value in self.cells.items()], dtype=np.int64).reshape(-1, 4)
+        arrays.update(rowids=self.rowids, lat_rad=self.lat_rad, lon_rad=self.lon_rad, cos_lat=self.cos_lat,
+                      cells=cells)
+        return meta, arrays, blobs
+
+    @classmethod
+    def mapped(cls, meta, arrays, blobs):
+        """A snapshot saved by dump(), memory-mapped."""
+        cells = {(lat_cell, lon_cell): (start, end) for lat_cell, lon_cell, start, end in arrays["cells"].tolist()}
+        return cls(arrays["rowids"], RowStore.mapped(meta, arrays, blobs), arrays["lat_rad"], arrays["lon_rad"],
+                   arrays["cos_lat"], cells)
+
+    @classmethod
+    def build(cls, rowids, rows, lats, lons, cell_degrees, lon_cell_count):
+        lat_cells, lon_cells = _cells_of(lats, lons, cell_degrees, lon_cell_count)
+        lat_rad = np.radians(lats)
+        return cls._sorted(rowids, rows, lat_rad, np.radians(lons), np.cos(lat_rad), lat_cells, lon_cells)
+
+    def patched(self, changed, rowids, rows, lats, lons, cell_degrees, lon_cell_count):
+        """
+        This snapshot without the rows of the changed rowids, plus the given (reread) rows.
+        Only the new rows' cells and radians are computed, the result equals a full build.
+        """
+        kept = np.flatnonzero(~np.isin(self.rowids, changed))
+        lat_cells, lon_cells = self._cell_numbers()
+        new_lat_cells, new_lon_cells = _cells_of(lats, lons, cell_degrees, lon_cell_count)
+        lat_rad = np.radians(lats)
+        return _Snapshot._sorted(np.concatenate((self.rowids[kept], rowids)),
+                                 RowStore.concat([(self.rows, kept), (rows, np.arange(len(rowids)))]),
+                                 np.concatenate((self.lat_rad[kept], lat_rad)),
+                                 np.concatenate((self.lon_rad[kept], np.radians(lons))),
+                                 np.concatenate((self.cos_lat[kept], np.cos(lat_rad))),
+                                 np.concatenate((lat_cells[kept], new_lat_cells)),
+                                 np.concatenate((lon_cells[kept], new_lon_cells)))
+
+    def _cell_numbers(self):
+        """(latitude cells, longitude cells) of every position, from the cell slices."""
+        lat_cells = np.empty(len(self.rowids), dtype=np.int64)
+        lon_cells = np.empty(len(self.rowids), dtype=np.int64)
+        for (lat_cell, lon_cell), (start, end) in self.cells.items():
+            lat_cells[start:end] = lat_cell
+            lon_cells[start:end] = lon_cell
+        return lat_cells, lon_cells
+
+    @classmethod
+    def _sorted(cls, rowids, rows, lat_rad, lon_rad, cos_lat, lat_cells, lon_cells):
+        """A snapshot of the rows sorted by cell (then rowid) with the cell slices."""
+        order = np.lexsort((rowids, lon_cells, lat_cells))
+        lat_cells, lon_cells = lat_cells[order], lon_cells[order]
+        cells = {}
+        if len(order):
+            boundaries = np.flatnonzero((np.diff(lat_cells) != 0) | (np.diff(lon_cells) != 0)) + 1
+            starts = np.concatenate(([0], boundaries))
+            ends = np.concatenate((boundaries, [len(order)]))
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                cells[(int(lat_cells[start]), int(lon_cells[start]))] = (start, end)
+        return cls(rowids[order], rows.take(order), lat_rad[order], lon_rad[order], cos_lat[order], cells)
+
+
+def _cells_of(lats, lons, cell_degrees, lon_cell_count):
+    """Grid (latitude, longitude) cell numbers of coordinates in degrees."""
+    return (np.floor(lats / cell_degrees).astype(np.int64),
+            np.floor(lons / cell_degrees).astype(np.int64) % lon_cell_count)
@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+
+# Timezone names are cached per grid cell of 10**-QUANTIZE_DECIMALS degrees (about 0.7 miles)
+QUANTIZE_DECIMALS = 2
+CACHE_SIZE = 4096
+
+
+class TimezoneLookup:
+    """
+    Coordinate to timezone name lookups backed by one long-lived TimezoneFinder.
+
+    Building a TimezoneFinder loads its polygon data and takes about a second
+    on the Pi, so it is built once (in the background by warm_up()) and shared.
+    Results are kept in an LRU cache keyed on quantized latitude/longitude.
+    The finder is asked at the caller's point and its answer is reused for the
+    whole grid cell, so within a cell of a zone border (or coast) a point may
+    get the zone of the first point looked up in its cell.
+    """
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self._finder = None
+        self._finder_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def warm_up(self, background=True):
+        """Start building the TimezoneFinder in a background thread, or build it in this one."""
+        if not background:
+            self._get_finder()
+            return
+        threading.Thread(target=self._get_finder, name="timezone-warm-up", daemon=True).start()
+
+    def _get_finder(self):
+        if self._finder is None:
+            with self._finder_lock:
+                if self._finder is None:
+                    # Imported here so startup does not pay for it until needed
+                    from timezonefinder import TimezoneFinder
+                    self._finder = TimezoneFinder()
+        return self._finder
+
+    def timezone_at(self, latitude, longitude):
+        """Return the timezone name (e.g. America/New_York) at a point, or None if unknown."""
+        key = (round(latitude, QUANTIZE_DECIMALS), round(longitude, QUANTIZE_DECIMALS))
+        with self._cache_lock:
+            tz_name = self._cache.get(key)
+            if tz_name is not None:
+                self._cache.move_to_end(key)
+        if tz_name is None:
+            tz_name = self._get_finder().timezone_at(lng=longitude, lat=latitude)
+            if tz_name is None:
+                return None
+            with self._cache_lock:
+                self._cache[key] = tz_name
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return tz_name
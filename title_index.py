@@ -0,0 +1,201 @@
+import argparse
+import os
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+import index_snapshot
+
+# Saved under this key, so a directory that is not a title index is never loaded as one
+SNAPSHOT_KEY = "titles"
+# Most articles returned for a topic
+MAX_ARTICLES = 3
+# Titles starting with the topic looked at for the best few (all of them for a rare prefix)
+MAX_PREFIX_SCAN = 256
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_title(title):
+    """Case folded, without accents, with punctuation, underscores and repeated spaces collapsed to one space."""
+    decomposed = unicodedata.normalize("NFKD", title)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", stripped.casefold()).strip()
+
+
+class TitleIndex:
+    """
+    Article titles of one ZIM archive (e.g. the Wikipedia book served by Kiwix), for
+    turning a topic into direct article links without asking the Kiwix server.
+
+    build_title_index saves the normalized titles (and paths, "Tie-a-Tie" for "How
+    to Tie a Tie") sorted, with each article's path and title, as one
+    index_snapshot directory of blobs and offset arrays. They are
+    memory-mapped on first use, so a lookup is a binary search touching a few pages:
+    the exact normalized title first, then titles starting with it (whole words
+    first, shortest first). The files are mapped again when they are rebuilt.
+    A missing index (or path None) finds nothing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._titles = None
+
+    def _current(self):
+        if self.path is None:
+            return None
+        try:
+            st = os.stat(os.path.join(self.path, index_snapshot.META_FILE))
+            signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            signature = None
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    loaded = None if signature is None else index_snapshot.load(self.path, SNAPSHOT_KEY)
+                    self._titles = None if loaded is None else _Titles(*loaded)
+                    self._signature = signature
+        return self._titles
+
+    def __len__(self):
+        titles = self._current()
+        return 0 if titles is None else len(titles)
+
+    def lookup(self, topic, limit=MAX_ARTICLES):
+        """Up to limit [(path, title)] of the articles best matching topic, best first."""
+        titles = self._current()
+        key = normalize_title(topic)
+        if titles is None or not key or limit <= 0:
+            return []
+        encoded = key.encode("utf-8")
+        start = titles.first_at_least(encoded)
+        exact = []
+        prefixed = []
+        for position, found in enumerate(titles.prefixed(start, encoded, MAX_PREFIX_SCAN), start):
+            if found == encoded:
+                path, title = titles.article(position)
+                # The title written exactly as asked goes first ("Apple" before "APPLE")
+                exact.append((title != topic, position, path, title))
+            else:
+                prefixed.append((found[len(encoded):len(encoded) + 1] != b" ", len(found), position))
+        exact.sort()
+        prefixed.sort()
+        # An article is under its title and its path, both may match
+        best = {}
+        for path, title in ([(path, title) for _, _, path, title in exact] +
+                            [titles.article(position) for _, _, position in prefixed[:limit * 2]]):
+            best.setdefault(path, title)
+            if len(best) == limit:
+                break
+        return list(best.items())
+
+
+class _Titles:
+    """The mapped arrays of a title index: normalized keys in sorted order, then paths and titles in the same order."""
+
+    def __init__(self, meta, arrays, blobs):
+        self.keys = blobs["keys"]
+        self.key_offsets = arrays["key_offsets"]
+        self.paths = blobs["paths"]
+        self.path_offsets = arrays["path_offsets"]
+        self.titles = blobs["titles"]
+        self.title_offsets = arrays["title_offsets"]
+
+    def __len__(self):
+        return len(self.key_offsets) - 1
+
+    def key(self, position):
+        return self.keys[int(self.key_offsets[position]):int(self.key_offsets[position + 1])]
+
+    def prefixed(self, start, prefix, limit):
+        """Up to limit keys from position start on that start with prefix, read a slice of keys at a time."""
+        keys = []
+        batch = 8
+        while len(keys) < limit:
+            offsets = self.key_offsets[start + len(keys):start + len(keys) + batch + 1].tolist()
+            block = self.keys[offsets[0]:offsets[-1]] if len(offsets) > 1 else b""
+            for begin, end in zip(offsets, offsets[1:]):
+                key = block[begin - offsets[0]:end - offsets[0]]
+                if not key.startswith(prefix) or len(keys) == limit:
+                    return keys
+                keys.append(key)
+            if len(offsets) <= batch:
+                return keys
+            batch *= 4
+        return keys
+
+    def article(self, position):
+        path = self.paths[int(self.path_offsets[position]):int(self.path_offsets[position + 1])]
+        title = self.titles[int(self.title_offsets[position]):int(self.title_offsets[position + 1])]
+        return path.decode("utf-8"), title.decode("utf-8")
+
+    def first_at_least(self, key):
+        """Position of the first normalized title not sorting before key (bytes)."""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+def _pack(encoded):
+    """Concatenation of a list of bytes and the offsets of each (one more than the list)."""
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    if offsets[-1] < 2 ** 32:
+        offsets = offsets.astype(np.uint32)
+    return b"".join(encoded), offsets
+
+
+def read_titles(lines):
+    """(path, title) of each "path" or "path<TAB>title" line. The title defaults to the path with spaces for underscores."""
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line:
+            continue
+        path, _, title = line.partition("\t")
+        yield path, title or path.replace("_", " ")
+
+
+def build_title_index(titles_file, path):
+    """Build the title index of path from a file of article paths (and titles), see read_titles. Returns the keys indexed."""
+    with open(titles_file, encoding="utf-8") as f:
+        entries = {}
+        for article_path, title in read_titles(f):
+            for key in {normalize_title(title), normalize_title(article_path)}:
+                if key:
+                    entries.setdefault((key.encode("utf-8"), article_path), title)
+    ordered = sorted(entries.items())
+    keys, key_offsets = _pack([key for (key, _), _ in ordered])
+    paths, path_offsets = _pack([article_path.encode("utf-8") for (_, article_path), _ in ordered])
+    titles, title_offsets = _pack([title.encode("utf-8") for _, title in ordered])
+    if not index_snapshot.save(path, SNAPSHOT_KEY, {"keys": len(ordered)},
+                               {"key_offsets": key_offsets, "path_offsets": path_offsets,
+                                "title_offsets": title_offsets},
+                               {"keys": keys, "paths": paths, "titles": titles}):
+        raise OSError(f"could not write {path}")
+    return len(ordered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the title index of a ZIM archive for get_wikipedia_url / "
+                                                 "get_wikihow_url")
+    parser.add_argument("titles", help="article paths, one per line, optionally a tab and the title "
+                                       "(e.g. the output of zimdump list)")
+    parser.add_argument("output", help="index directory, <title_index_dir>/<book name>.titles")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    count = build_title_index(args.titles, args.output)
+    print(f"{args.output}: {count} titles and paths indexed in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+import math
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from geo import bearing_between_points, distance_between_points, haversine_miles
+
+# Summary bucket sizes kept alongside the raw fixes (minute, hour, day)
+BUCKET_SECONDS = (60, 3600, 86400)
+# Fixes are committed in batches: whichever of these comes first
+BATCH_SIZE = 60
+FLUSH_SECONDS = 30
+# A gap longer than this (logger stopped, no fix) starts a new track segment
+# and its leg is not counted in the distance traveled
+GAP_SECONDS = 120
+# Windows up to this long are answered from the raw fixes
+RAW_WINDOW_SECONDS = 1800
+# Otherwise the finest bucket size that needs at most this many rows is used
+MAX_BUCKET_ROWS = 2000
+# Heading is the bearing to the latest point from the last point at least this far away
+HEADING_MILES = 0.05
+# GPS jitter of a parked vehicle is not counted in the distance or moving time: a leg
+# counts when the receiver reports at least this speed at its later fix...
+MIN_MOVING_MPH = 1.0
+MPH_PER_KNOT = 1.15078
+# ...or, for fixes without a speed, once the position is this far (about 16 m) from
+# where the vehicle was last seen moving
+MIN_MOVE_MILES = 0.01
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fix (ts REAL NOT NULL, latitude REAL NOT NULL, longitude REAL NOT NULL, altitude REAL,
+                                speed_knots REAL, course REAL, num_sats INTEGER, gps_qual INTEGER);
+CREATE INDEX IF NOT EXISTS fix_ts ON fix (ts);
+CREATE TABLE IF NOT EXISTS track_bucket (seconds INTEGER NOT NULL, bucket_start INTEGER NOT NULL,
+                                         fix_count INTEGER NOT NULL, first_ts REAL NOT NULL, last_ts REAL NOT NULL,
+                                         latitude REAL NOT NULL, longitude REAL NOT NULL, altitude REAL,
+                                         distance_miles REAL NOT NULL, moving_seconds REAL NOT NULL,
+                                         PRIMARY KEY (seconds, bucket_start)) WITHOUT ROWID;
+"""
+
+SQL_INSERT_FIX = "INSERT INTO fix VALUES (?,?,?,?,?,?,?,?)"
+# Buckets are flushed as deltas so a bucket split over several batches (or a logger restart) adds up
+SQL_UPSERT_BUCKET = """
+INSERT INTO track_bucket VALUES (?,?,?,?,?,?,?,?,?,?)
+ON CONFLICT (seconds, bucket_start) DO UPDATE SET
+    fix_count = fix_count + excluded.fix_count,
+    first_ts = min(first_ts, excluded.first_ts),
+    last_ts = excluded.last_ts,
+    latitude = excluded.latitude,
+    longitude = excluded.longitude,
+    altitude = excluded.altitude,
+    distance_miles = distance_miles + excluded.distance_miles,
+    moving_seconds = moving_seconds + excluded.moving_seconds
+"""
+SQL_LAST_FIX = "SELECT ts, latitude, longitude FROM fix ORDER BY ts DESC LIMIT 1"
+SQL_FIXES = ("SELECT ts, ts, latitude, longitude, altitude, speed_knots FROM fix WHERE ts >= ? AND ts <= ? "
+             "ORDER BY ts")
+SQL_BUCKETS = ("SELECT first_ts, last_ts, latitude, longitude, altitude, distance_miles, moving_seconds "
+               "FROM track_bucket WHERE seconds = ? AND bucket_start >= ? AND bucket_start <= ? ORDER BY bucket_start")
+
+
+class TrackWriter:
+    """
+    Appends GPS fixes to a SQLite (WAL) track database.
+
+    Fixes are held in memory and committed in batches, so the SSD sees one
+    write every BATCH_SIZE fixes or FLUSH_SECONDS rather than one per sentence.
+    Per minute/hour/day summary buckets (last position, distance, moving time)
+    are maintained as fixes arrive so long windows never scan the raw fixes.
+    Jitter while parked counts in neither distance nor moving time (see _Odometer).
+    """
+
+    def __init__(self, db_file, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._conn = sqlite3.connect(db_file)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._fixes = []
+        self._buckets = {}
+        self._last = self._conn.execute(SQL_LAST_FIX).fetchone()
+        self._odometer = _Odometer(self._last)
+        self._last_flush = time.monotonic()
+
+    def add(self, timestamp, latitude, longitude, altitude=None, speed_knots=None, course=None,
+            num_sats=None, gps_qual=None):
+        """Add a fix. timestamp is a timezone aware datetime; repeated or out of order fixes are ignored."""
+        ts = timestamp.timestamp()
+        last = self._last
+        if last is not None and ts <= last[0]:
+            return
+        distance, duration = self._odometer.add(ts, latitude, longitude, speed_knots)
+        self._fixes.append((ts, latitude, longitude, altitude, speed_knots, course, num_sats, gps_qual))
+        for seconds in BUCKET_SECONDS:
+            key = (seconds, int(ts // seconds) * seconds)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = [1, ts, ts, latitude, longitude, altitude, distance, duration]
+            else:
+                bucket[0] += 1
+                bucket[2:6] = [ts, latitude, longitude, altitude]
+                bucket[6] += distance
+                bucket[7] += duration
+        self._last = (ts, latitude, longitude)
+        if len(self._fixes) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Commit the pending fixes and bucket updates in one transaction."""
+        if self._fixes:
+            with self._conn:
+                self._conn.executemany(SQL_INSERT_FIX, self._fixes)
+                self._conn.executemany(SQL_UPSERT_BUCKET, [key + tuple(bucket) for key, bucket in self._buckets.items()])
+            self._fixes = []
+            self._buckets = {}
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+class _Odometer:
+    """
+    Distance and moving time of successive fixes, without the jitter of a parked vehicle.
+    A leg counts when its fix reports a speed of at least MIN_MOVING_MPH; fixes without
+    a speed count once the position is MIN_MOVE_MILES from the last point moved to,
+    as one leg from there. Gaps over GAP_SECONDS are never counted.
+    """
+
+    def __init__(self, last=None):
+        # (ts, latitude, longitude) of the previous fix and of the last point moved to
+        self._last = last
+        self._anchor = last
+
+    def add(self, ts, latitude, longitude, speed_knots=None):
+        """(miles, seconds) moving since the previous fix."""
+        last, anchor = self._last, self._anchor
+        self._last = (ts, latitude, longitude)
+        if last is None or ts - last[0] > GAP_SECONDS:
+            self._anchor = self._last
+            return 0.0, 0.0
+        if speed_knots is not None:
+            self._anchor = self._last
+            if speed_knots * MPH_PER_KNOT < MIN_MOVING_MPH:
+                return 0.0, 0.0
+            return distance_between_points(last[1], last[2], latitude, longitude), ts - last[0]
+        moved = distance_between_points(anchor[1], anchor[2], latitude, longitude)
+        if moved < MIN_MOVE_MILES:
+            return 0.0, 0.0
+        self._anchor = self._last
+        # Only the time since the previous fix after a long stop at the anchor
+        return moved, ts - anchor[0] if ts - anchor[0] <= GAP_SECONDS else ts - last[0]
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+class TrackHistory:
+    """
+    Read side of the track database, used by the MCP server through a read-only ScampDB.
+
+    Short windows are answered from the raw fixes, longer ones from the
+    finest summary bucket size that keeps the row count small, so a query
+    over months of 1 Hz data reads at most a few thousand rows.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def _rows(self, start_ts, end_ts):
+        """Return (resolution, rows, distance, moving_seconds); rows are (first_ts, last_ts, lat, lon, alt)."""
+        window = end_ts - start_ts
+        if window <= RAW_WINDOW_SECONDS:
+            rows = self.db.query(SQL_FIXES, (start_ts, end_ts))
+            if len(rows) < 2:
+                return "fix", rows, 0.0, 0.0
+            # Counted like TrackWriter counts the buckets
+            odometer = _Odometer()
+            legs = [odometer.add(row[0], row[2], row[3], row[5]) for row in rows]
+            return "fix", rows, sum(leg[0] for leg in legs), sum(leg[1] for leg in legs)
+        seconds = next((s for s in BUCKET_SECONDS if window / s <= MAX_BUCKET_ROWS), BUCKET_SECONDS[-1])
+        first_bucket = int(start_ts // seconds) * seconds
+        rows = self.db.query(SQL_BUCKETS, (seconds, first_bucket, end_ts))
+        distance = sum(row[5] for row in rows)
+        moving = sum(row[6] for row in rows)
+        return f"{seconds}s", rows, distance, moving
+
+    def track(self, start_ts, end_ts, max_points=100):
+        """Summarize the track between two epoch times as a dict (see get_recent_track)."""
+        try:
+            resolution, rows, distance, moving = self._rows(start_ts, end_ts)
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"No GPS track history is available ({e})")
+
+        # Split into segments where the logger had no fix for a while
+        segments = []
+        for row in rows:
+            if not segments or row[0] - segments[-1][-1][1] > GAP_SECONDS:
+                segments.append([])
+            segments[-1].append(row)
+
+        # Every segment keeps its last point, leave room for those
+        step = max(1, math.ceil(len(rows) / max(1, max_points - len(segments))))
+        track_segments = []
+        for segment in segments:
+            kept = segment[::step]
+            if kept[-1] is not segment[-1]:
+                kept.append(segment[-1])
+            track_segments.append({
+                "start": _iso(segment[0][0]),
+                "end": _iso(segment[-1][1]),
+                "points": [[round(row[2], 5), round(row[3], 5), row[4], _iso(row[1])] for row in kept]
+            })
+
+        heading = None
+        if segments:
+            last = segments[-1]
+            latest = last[-1]
+            distances = haversine_miles(latest[2], latest[3], [row[2] for row in last], [row[3] for row in last])
+            far = np.nonzero(distances >= HEADING_MILES)[0]
+            if len(far):
+                origin = last[far[-1]]
+                heading = round(bearing_between_points(origin[2], origin[3], latest[2], latest[3]))
+
+        return {
+            "start": _iso(start_ts),
+            "end": _iso(end_ts),
+            "resolution": resolution,
+            "distanceMiles": round(distance, 2),
+            "averageSpeedMph": round(distance / (moving / 3600), 1) if moving > 0 else 0.0,
+            "heading": heading,
+            "segments": track_segments
+        }
@@ -0,0 +1,76 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads available for blocking tool work (SQLite, file and TimezoneFinder calls)
+MAX_WORKERS = 8
+# Default number of calls of one tool that may run at the same time
+TOOL_CONCURRENCY = 4
+
+
+class WorkerPool:
+    """
+    Runs blocking tool functions on a bounded thread pool so the event loop serving
+    MCP requests is never blocked and a slow tool does not hold up the others.
+
+    Each tool has its own concurrency limit. Identical calls (same tool and
+    arguments) that arrive while one is already running wait for and share its
+    result instead of running again. Every call runs inside call_context() when
+    given (e.g. ScampDB.pinned, so a call sees one database version throughout).
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, call_context=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._call_context = call_context
+        self._limits = {}
+        self._in_flight = {}
+
+    def tool(self, concurrency=TOOL_CONCURRENCY):
+        """
+        Decorator turning a blocking function into an async tool handler that runs on the pool.
+        The blocking function stays available as .sync for calls from other tools.
+        """
+        def decorator(fn):
+            name = fn.__name__
+            signature = inspect.signature(fn)
+            self._limits[name] = concurrency
+
+            @functools.wraps(fn)
+            async def handler(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = name + json.dumps(bound.arguments, sort_keys=True, default=str)
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = asyncio.ensure_future(self._run(name, functools.partial(fn, *args, **kwargs)))
+                    self._in_flight[key] = future
+                    future.add_done_callback(lambda done: self._in_flight.pop(key, None))
+                # shield: a caller that goes away must not cancel the call others are waiting on
+                return await asyncio.shield(future)
+
+            handler.sync = fn
+            return handler
+        return decorator
+
+    async def _run(self, name, call):
+        limit = self._limits[name]
+        if not isinstance(limit, asyncio.Semaphore):
+            # Created on first use so it belongs to the server's event loop
+            limit = self._limits[name] = asyncio.Semaphore(limit)
+        async with limit:
+            # Run in a copy of this context so per-call state (metrics) follows the call onto the thread
+            context = contextvars.copy_context()
+            if self._call_context is not None:
+                call = functools.partial(_run_in, self._call_context, call)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, call)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def _run_in(call_context, call):
+    with call_context():
+        return call()